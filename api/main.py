@@ -1,20 +1,44 @@
 
-import os
+import os, sys, math, asyncio, json, time
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv; load_dotenv()
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from capintel.signal_engine import build_signal
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from typing import List, Literal, Optional
+from pydantic import BaseModel, Field
+# numpy/pandas (стратегия, SSE, бэктест) и httpx грузятся при первом обращении — холодный старт воркера
+# без них ~в 2 раза быстрее (python -m benchmarks.coldstart); CAPINTEL_WARMUP=1 — прогреть до приёма запросов
+from capintel.signal_engine import build_record, signal_cache
 from capintel.schemas import Signal, AssetClass, Horizon
-from capintel.backtest import toy_backtest
-from capintel.providers.polygon_client import get_last_price, PolygonError
+from capintel.visuals_svg import gauge_svg_document
+from capintel import export, metrics, warmup
+from capintel.jsonfast import dumps
+from capintel.providers import stream
+from capintel.providers.polygon_client import (aget_last_price, aget_last_prices, PolygonError, RateLimitExceeded,
+                                               close_clients, aclose_clients, price_cache)
 
-app = FastAPI(title="CapIntel Signals API", version="0.2.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # POLYGON_STREAM_EQUITY / POLYGON_STREAM_CRYPTO — WebSocket-поток цен для /price (иначе только REST)
+    if os.getenv("CAPINTEL_WARMUP", "0").lower() in ("1", "true", "yes"):
+        await run_in_threadpool(warmup.warmup)
+    streams = stream.start_from_env()
+    yield
+    for s in streams:
+        s.stop()
+    # пул соединений к Polygon живёт весь процесс — закрываем при остановке
+    await aclose_clients()
+    close_clients()
+
+app = FastAPI(title="CapIntel Signals API", version="0.2.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware, allow_origins=["*"], allow_credentials=True,
     allow_methods=["*"], allow_headers=["*"],
 )
+app.add_middleware(metrics.MetricsMiddleware)
 
 class SignalRequest(BaseModel):
     ticker: str
@@ -22,20 +46,189 @@ class SignalRequest(BaseModel):
     horizon: Horizon
     last_price: float
 
+class BatchItem(BaseModel):
+    ticker: str
+    asset_class: AssetClass
+    horizon: Horizon
+    last_price: Optional[float] = None   # если не задана — тянем из Polygon
+
+class BatchRequest(BaseModel):
+    items: List[BatchItem] = Field(..., min_items=1, max_items=1000)
+
+class ExportRequest(BaseModel):
+    items: List[BatchItem] = Field(..., min_items=1, max_items=100_000)
+
+class BatchResult(BaseModel):
+    ticker: str
+    asset_class: AssetClass
+    horizon: Horizon
+    signal: Optional[Signal] = None
+    error: Optional[str] = None
+
+class BatchResponse(BaseModel):
+    results: List[BatchResult]
+    ok: int
+    errors: int
+
 @app.get("/health")
 def health(): return {"status":"ok"}
 
+@app.get("/cache/stats")
+def cache_stats():
+    out = {"price": price_cache.stats(), "signal": signal_cache.stats()}
+    ms = sys.modules.get("capintel.strategy.my_strategy")   # не загружена — её кэши пусты, не импортируем ради статистики
+    if ms is not None:
+        out.update(bands=ms.bands_cache.stats(), spec=ms.spec_cache.stats(), pivots=ms.pivot_index.stats())
+    return out
+
+@app.get("/metrics")
+def metrics_text():
+    # Prometheus text format; пусто по значениям при CAPINTEL_METRICS=0
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+# async-маршруты: ожидание Polygon не занимает поток; исходящие запросы ограничены polygon_limiter
 @app.get("/price")
-def price(asset_class: AssetClass, ticker: str):
+async def price(asset_class: AssetClass, ticker: str):
     try:
-        return {"ticker": ticker.upper(), "asset_class": asset_class, "last_price": get_last_price(asset_class, ticker)}
+        return {"ticker": ticker.upper(), "asset_class": asset_class, "last_price": await aget_last_price(asset_class, ticker)}
+    except RateLimitExceeded as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(math.ceil(e.retry_after))})
     except PolygonError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.post("/signal", response_model=Signal)
-def signal(req: SignalRequest):
-    return build_signal(req.ticker, req.asset_class, req.horizon, req.last_price)
+async def signal(req: SignalRequest):
+    # запись движка → dict; валидация в Signal — одна, на выходе (response_model)
+    return build_record(req.ticker, req.asset_class, req.horizon, req.last_price).to_dict()
+
+@app.post("/signals/batch", response_model=BatchResponse)
+async def signals_batch(req: BatchRequest):
+    # цены — конкурентно в event loop (уникальные тикеры), сигналы — одним заходом в threadpool (CPU)
+    prices = await aget_last_prices((it.asset_class, it.ticker) for it in req.items if it.last_price is None)
+    return await run_in_threadpool(_batch_response, req.items, prices)
+
+def _batch_response(items: List[BatchItem], prices) -> Response:
+    # схема BatchResponse, но без pydantic на каждый сигнал: записи движка → dict → orjson
+    results, n_err = [], 0
+    for it in items:
+        res = {"ticker": it.ticker.upper(), "asset_class": it.asset_class, "horizon": it.horizon,
+               "signal": None, "error": None}
+        px = it.last_price if it.last_price is not None else prices[(it.asset_class, it.ticker.upper())]
+        if isinstance(px, Exception):
+            res["error"] = str(px) or type(px).__name__
+        else:
+            try:
+                res["signal"] = build_record(it.ticker, it.asset_class, it.horizon, float(px)).to_dict()
+            except Exception as e:  # noqa
+                res["error"] = str(e) or type(e).__name__
+        n_err += res["error"] is not None
+        results.append(res)
+    return Response(content=dumps({"results": results, "ok": len(results) - n_err, "errors": n_err}),
+                    media_type="application/json")
+
+@app.post("/signals/export")
+async def signals_export(
+    req: ExportRequest,
+    format: Literal["ndjson", "arrow"] = "ndjson",
+    chunk: int = Query(1000, ge=1, le=10_000, description="сигналов в пачке"),
+):
+    """
+    Потоковая выгрузка сигналов (chunked): NDJSON или Arrow IPC stream, плоские колонки (см. capintel.export.COLUMNS).
+    Цены и сигналы считаются пачками по chunk — в памяти одновременно только одна пачка.
+    """
+    try:
+        enc = export.ENCODERS[format]()
+    except RuntimeError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+
+    def rows(part: List[BatchItem], prices):
+        return export.signal_rows(((it.ticker, it.asset_class, it.horizon,
+                                    it.last_price if it.last_price is not None else prices[(it.asset_class, it.ticker.upper())])
+                                   for it in part))
+
+    async def body():
+        head = enc.begin()
+        if head:
+            yield head
+        for part in export.chunks(req.items, chunk):
+            prices = await aget_last_prices((it.asset_class, it.ticker) for it in part if it.last_price is None)
+            yield await run_in_threadpool(lambda: enc.batch(list(rows(part, prices))))
+        tail = enc.end()
+        if tail:
+            yield tail
+
+    return StreamingResponse(body(), media_type=enc.media_type,
+                             headers={"Content-Disposition": f'attachment; filename="signals.{format}"'})
+
+def _sse(event: str, data: str) -> str:
+    return f"event: {event}\ndata: {data}\n\n"
+
+@app.get("/signals/stream")
+async def signals_stream(
+    request: Request,
+    tickers: str = Query(..., description="тикеры через запятую (до 50)"),
+    asset_class: AssetClass = "equity",
+    horizon: Horizon = "swing",
+    interval: float = Query(1.0, ge=0.05, le=60.0, description="период проверки цены, с"),
+    max_events: int = Query(0, ge=0, description="закрыть поток после N сигналов (0 — не закрывать)"),
+):
+    """
+    SSE: сигнал стратегии приходит только когда цена пересекла полосу решения (R2/R3/S2/S3 ± tol, R1/S1 старшего ТФ)
+    или появился новый дневной бар. События: signal (JSON Signal), error (тикер, текст); раз в 15 c — комментарий-пинг.
+    """
+    names = list(dict.fromkeys(t.strip().upper() for t in tickers.split(",") if t.strip()))
+    if not names or len(names) > 50:
+        raise HTTPException(status_code=422, detail="нужно от 1 до 50 тикеров")
+    from capintel.signal_stream import BandWatcher
+    watcher = BandWatcher(asset_class, horizon, names)
+
+    async def events():
+        sent, beat, errors = 0, time.monotonic(), {}
+        while not await request.is_disconnected():
+            await run_in_threadpool(watcher.refresh_all)        # полосы: загрузка баров — блокирующая
+            prices = await aget_last_prices((asset_class, t) for t in names)
+            for t in names:
+                px = prices.get((asset_class, t))
+                err = watcher.errors.get(t)
+                if err is None and isinstance(px, Exception):
+                    err = str(px) or type(px).__name__
+                if err is not None:
+                    if errors.get(t) != err:
+                        errors[t] = err
+                        yield _sse("error", json.dumps({"ticker": t, "error": err}, ensure_ascii=False))
+                    continue
+                errors.pop(t, None)
+                sig = watcher.on_price(t, float(px))
+                if sig is not None:
+                    yield _sse("signal", dumps(sig).decode())
+                    sent += 1
+                    if max_events and sent >= max_events:
+                        return
+            if time.monotonic() - beat >= 15.0:
+                beat = time.monotonic()
+                yield ": ping\n\n"
+            await asyncio.sleep(interval)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 @app.post("/backtest")
-def backtest(sig: Signal):
-    return toy_backtest(sig)
+def backtest(sig: Signal, paths: int = Query(0, ge=0, le=10_000)):
+    # paths > 0 → Monte Carlo по paths путям (распределение PnL), иначе — один путь
+    from capintel.backtest import toy_backtest, toy_backtest_mc
+    return toy_backtest_mc(sig, n_paths=paths) if paths else toy_backtest(sig)
+
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    # If-None-Match: слабое сравнение (W/"x" == "x"), поддержка списка и "*"
+    if not header:
+        return False
+    tags = [t.strip() for t in header.split(",")]
+    return "*" in tags or etag in (t[2:] if t.startswith("W/") else t for t in tags)
+
+@app.get("/gauge.svg")
+def gauge_svg(request: Request, score: float = Query(..., description="оценка -2..+2 (квантуется с шагом 0.05)")):
+    body, etag = gauge_svg_document(score)
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=86400"}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="image/svg+xml", headers=headers)
@@ -1,4 +1,4 @@
-import sys, os, json
+import sys, os
 from dotenv import load_dotenv; load_dotenv()
 
 # --- Import guard ---
@@ -9,26 +9,43 @@ if ROOT_DIR not in sys.path:
 import streamlit as st
 from streamlit.components.v1 import html as st_html
 
-from capintel.signal_engine import build_signal
+from capintel.signal_engine import build_record
+from capintel.jsonfast import dumps
 from capintel.backtest import toy_backtest
-from capintel.providers.polygon_client import get_last_price, PolygonError
+from capintel.providers.refresher import PriceRefresher
 from capintel.visuals_svg import render_gauge_svg  # SVG-прибор (адаптивный)
 
+# Цены наблюдаемых тикеров обновляет один фоновый поток на весь сервер (общий для всех сессий):
+# клик читает цену из его таблицы и не ждёт Polygon. Сигналы мемоизирует движок (signal_cache) — тоже на процесс.
+@st.cache_resource
+def price_refresher() -> PriceRefresher:
+    return PriceRefresher().start()
+
 # ------------ UI ------------
 st.set_page_config(page_title="CapIntel — Signals", page_icon="📈", layout="wide")
 st.title("📈 CapIntel — Идеи для Crypto & Equities (MVP)")
 st.caption("Формат: BUY / SHORT / CLOSE / WAIT + уровни входа/целей/стопа, confidence и сценарии.")
 
+refresher = price_refresher()
+
 # Безопасные дефолты (на случай первого рендера)
 go = False
 dev_mode = False
-show_gauge = True
+
+@st.fragment(run_every=refresher.interval)
+def price_metric(asset_class: str, ticker: str) -> None:
+    # перерисовывается сам по таймеру, без перезапуска всего скрипта
+    px = refresher.price(asset_class, ticker)
+    if px is not None:
+        st.session_state["last_price"] = px
+    age = refresher.age(asset_class, ticker)
+    st.metric("Цена (Polygon)", f"{st.session_state['last_price']:.4f}",
+              help=f"обновлена {age:.0f} c назад" if age is not None else "ещё не получена — показана последняя известная")
 
 # ------------ SIDEBAR ------------
 with st.sidebar:
     st.header("Параметры")
     dev_mode = st.toggle("Режим разработчика", value=False, help="Показать JSON и отладочные блоки")
-    show_gauge = st.toggle("Показывать индикатор", value=True)
 
     asset_class = st.selectbox("Класс актива", ["crypto", "equity"], index=0)
     horizon = st.selectbox("Горизонт", ["intraday", "swing", "position"], index=1)
@@ -37,17 +54,19 @@ with st.sidebar:
     # Последняя успешная цена из Polygon
     if "last_price" not in st.session_state:
         st.session_state["last_price"] = 65000.0 if asset_class == "crypto" else 230.0
+    refresher.watch(asset_class, ticker)
 
     colA, colB = st.columns(2)
     with colA:
         if st.button("Обновить цену из Polygon", use_container_width=True):
-            try:
-                st.session_state["last_price"] = float(get_last_price(asset_class, ticker))
-                st.success(f"Цена: {st.session_state['last_price']:.4f}")
-            except PolygonError as e:
-                st.error(str(e))
+            refresher.refresh([(asset_class, ticker)])   # явный запрос — ждём Polygon, таблица общая
+            err = refresher.errors.get(refresher.table.key(asset_class, ticker))
+            if err:
+                st.error(err)
+            else:
+                st.success(f"Цена: {refresher.price(asset_class, ticker):.4f}")
     with colB:
-        st.metric("Цена (Polygon)", f"{st.session_state['last_price']:.4f}")
+        price_metric(asset_class, ticker)
 
     st.write("---")
     # Статистика за сессию
@@ -60,15 +79,17 @@ with st.sidebar:
 
 # ------------ MAIN ------------
 if go:
-    # При генерации ещё раз пробуем подтянуть цену
-    price_for_signal = st.session_state["last_price"]
-    try:
-        price_for_signal = float(get_last_price(asset_class, ticker))
-        st.session_state["last_price"] = price_for_signal
-    except Exception:
-        pass  # остаёмся на последней цене
-
-    sig = build_signal(ticker, asset_class, horizon, price_for_signal)
+    # цена — из общей таблицы фонового обновления; Polygon ждём только для тикера, которого ещё нет в таблице
+    price_for_signal = refresher.price(asset_class, ticker)
+    if price_for_signal is None:
+        refresher.refresh([(asset_class, ticker)])
+        price_for_signal = refresher.price(asset_class, ticker)
+    if price_for_signal is None:
+        price_for_signal = st.session_state["last_price"]  # остаёмся на последней цене
+    st.session_state["last_price"] = price_for_signal
+
+    sig = build_record(ticker, asset_class, horizon, price_for_signal)
+    st.session_state["signal"] = sig   # карточка переживает перезапуски от других виджетов
 
     # Обновить статистику
     st.session_state["stats"]["total"] += 1
@@ -79,70 +100,85 @@ if go:
     else:
         st.session_state["stats"]["neutral"] += 1
 
-    # Чуть больше места под прибор справа
-    col1, col2 = st.columns([1.0, 1.15])
 
-    # --- Левая колонка: карточка идеи ---
-    with col1:
-        st.subheader(f"{sig.ticker} · {sig.asset_class.upper()} · {sig.horizon}")
-        st.markdown(f"### ➤ Действие: **{sig.action}**")
-        st.markdown(
-            f"""
+def signal_card(sig) -> None:
+    st.subheader(f"{sig.ticker} · {sig.asset_class.upper()} · {sig.horizon}")
+    st.markdown(f"### ➤ Действие: **{sig.action}**")
+    st.markdown(
+        f"""
 **Вход:** `{sig.entry}`  
 **Цели:** `TP1 {sig.take_profit[0]}` · `TP2 {sig.take_profit[1]}`  
 **Стоп:** `{sig.stop}`  
 **Уверенность:** `{int(sig.confidence * 100)}%`  
 **Размер позиции:** `{sig.position_size_pct_nav}% NAV`  
 """
+    )
+    st.info(sig.narrative_ru)
+
+    alt = sig.alternatives[0]
+    st.markdown("**Альтернативный план**")
+    st.markdown(
+        f"- {alt.if_condition}: **{alt.action}** от `{alt.entry}` → TP1 `{alt.take_profit[0]}`, "
+        f"TP2 `{alt.take_profit[1]}`, стоп `{alt.stop}`"
+    )
+
+    st.caption(
+        f"Сигнал создан: {sig.created_at.strftime('%Y-%m-%d %H:%M UTC')} · "
+        f"Истекает: {sig.expires_at.strftime('%Y-%m-%d %H:%M UTC')}"
+    )
+    st.caption(sig.disclaimer)
+
+@st.fragment
+def gauge_panel(sig) -> None:
+    # переключатель перезапускает только этот фрагмент, не карточку и не сайдбар
+    if not st.toggle("Показывать индикатор", value=True):
+        return
+    # Преобразуем действие+уверенность в шкалу [-2..+2]
+    score = 0.0
+    if sig.action == "BUY":
+        score = min(2.0, max(0.0, (sig.confidence - 0.5) / 0.4 * 2.0))
+    elif sig.action == "SHORT":
+        score = -min(2.0, max(0.0, (sig.confidence - 0.5) / 0.4 * 2.0))
+
+    # ---- Настройки размера прибора ----
+    MAX_W   = 660   # «потолок» ширины SVG (контейнер впишет в колонку)
+    SCALE   = 0.85  # общий масштаб прибора (0.70–1.00)
+    F_SCALE = 0.88  # масштаб шрифтов (0.70–1.10)
+
+    # SVG строится один раз на сигнал: тот же HTML при перезапуске — iframe не пересоздаётся и анимация не повторяется
+    gauge = st.session_state.get("gauge")
+    if gauge is None or gauge[0] != sig.id:
+        svg = render_gauge_svg(
+            score,
+            prev_score=st.session_state.get("prev_score"),
+            max_width=MAX_W,
+            scale=SCALE,
+            font_scale=F_SCALE,
+            animate=True,
+            duration_ms=900,
         )
-        st.info(sig.narrative_ru)
+        gauge = st.session_state["gauge"] = (sig.id, svg)
+        st.session_state["prev_score"] = score
+    # Высота iframe под наш аспект ~0.60 + небольшой запас
+    st_html(gauge[1], height=int(MAX_W * SCALE * 0.60 * 1.02))
 
-        alt = sig.alternatives[0]
-        st.markdown("**Альтернативный план**")
-        st.markdown(
-            f"- {alt.if_condition}: **{alt.action}** от `{alt.entry}` → TP1 `{alt.take_profit[0]}`, "
-            f"TP2 `{alt.take_profit[1]}`, стоп `{alt.stop}`"
-        )
 
-        st.caption(
-            f"Сигнал создан: {sig.created_at.strftime('%Y-%m-%d %H:%M UTC')} · "
-            f"Истекает: {sig.expires_at.strftime('%Y-%m-%d %H:%M UTC')}"
-        )
-        st.caption(sig.disclaimer)
+sig = st.session_state.get("signal")
+if sig is not None:
+    # Чуть больше места под прибор справа
+    col1, col2 = st.columns([1.0, 1.15])
+
+    # --- Левая колонка: карточка идеи ---
+    with col1:
+        signal_card(sig)
 
     # --- Правая колонка: прибор, JSON (dev), бэктест ---
     with col2:
-        # Преобразуем действие+уверенность в шкалу [-2..+2]
-        score = 0.0
-        if sig.action == "BUY":
-            score = min(2.0, max(0.0, (sig.confidence - 0.5) / 0.4 * 2.0))
-        elif sig.action == "SHORT":
-            score = -min(2.0, max(0.0, (sig.confidence - 0.5) / 0.4 * 2.0))
-
-        if show_gauge:
-            prev = st.session_state.get("prev_score")
-
-            # ---- Настройки размера прибора ----
-            MAX_W   = 660   # «потолок» ширины SVG (контейнер впишет в колонку)
-            SCALE   = 0.85  # общий масштаб прибора (0.70–1.00)
-            F_SCALE = 0.88  # масштаб шрифтов (0.70–1.10)
-
-            svg = render_gauge_svg(
-                score,
-                prev_score=prev,
-                max_width=MAX_W,
-                scale=SCALE,
-                font_scale=F_SCALE,
-                animate=True,
-                duration_ms=900,
-            )
-            # Высота iframe под наш аспект ~0.60 + небольшой запас
-            st_html(svg, height=int(MAX_W * SCALE * 0.60 * 1.02))
-            st.session_state["prev_score"] = score
+        gauge_panel(sig)
 
         if dev_mode:
             st.markdown("#### JSON")
-            st.code(json.dumps(sig.dict(), default=str, ensure_ascii=False, indent=2), language="json")
+            st.code(dumps(sig, indent=True).decode(), language="json")
 
         st.markdown("#### «Игрушечный» бэктест")
         if sig.action in ["BUY", "SHORT"]:
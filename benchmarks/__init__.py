@@ -0,0 +1 @@
+"""Офлайн-бенчмарки горячих путей (см. benchmarks/run.py)."""
@@ -0,0 +1,109 @@
+# benchmarks/coldstart.py
+"""
+Холодный старт: время импорта модулей в свежем процессе по `python -X importtime` (сеть не нужна).
+
+    python -m benchmarks.coldstart                               # все модули из BUDGETS, таблица + JSON в stdout
+    python -m benchmarks.coldstart -m api.main --budget 300      # свой бюджет, мс; код 1 при превышении
+    python -m benchmarks.coldstart --scale 1.5 --out cold.json   # бюджеты x1.5 (медленный CI-раннер)
+
+Метрика — медиана cumulative-времени модуля по --repeats процессам. Код 1 и при превышении бюджета,
+и если при импорте загрузилась ленивая тяжёлая зависимость из LAZY (это проверяется детерминированно).
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# бюджет импорта, мс (с запасом ~2x к одноядерной машине разработки)
+BUDGETS: Dict[str, float] = {
+    "api.main": 400.0,
+    "capintel.signal_engine": 160.0,
+    "capintel.providers.polygon_client": 100.0,
+}
+# не должны грузиться при импорте модуля — их подтягивает первое обращение (или capintel.warmup)
+LAZY: Dict[str, Tuple[str, ...]] = {
+    "api.main": ("numpy", "pandas", "httpx", "matplotlib"),
+    "capintel.signal_engine": ("numpy", "pandas", "httpx", "matplotlib"),
+    "capintel.providers.polygon_client": ("numpy", "pandas", "httpx"),
+}
+
+
+def parse_importtime(text: str) -> Dict[str, Tuple[int, int]]:
+    """Вывод -X importtime → {модуль: (self, cumulative)} в микросекундах."""
+    out: Dict[str, Tuple[int, int]] = {}
+    for line in text.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue   # заголовок "self [us] | cumulative | imported package"
+        out.setdefault(parts[2].strip(), (int(parts[0]), int(parts[1])))
+    return out
+
+def importtime(module: str, python: str = sys.executable) -> Dict[str, Tuple[int, int]]:
+    """Импорт module в свежем процессе (cwd — корень репо) → parse_importtime."""
+    r = subprocess.run([python, "-X", "importtime", "-c", f"import {module}"], cwd=ROOT,
+                       capture_output=True, text=True, env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"})
+    if r.returncode != 0:
+        raise RuntimeError(f"import {module}: {r.stderr.strip().splitlines()[-1] if r.stderr.strip() else r.returncode}")
+    return parse_importtime(r.stderr)
+
+def measure(module: str, repeats: int = 5, top: int = 10) -> Dict[str, Any]:
+    """repeats свежих процессов → медиана cumulative (мс), загруженные ленивые зависимости, top по self."""
+    runs = [importtime(module) for _ in range(repeats)]
+    times = [r[module][1] / 1e3 for r in runs]
+    last = runs[-1]
+    heavy = [m for m in LAZY.get(module, ()) if m in last]
+    slow = sorted(last.items(), key=lambda kv: -kv[1][0])[:top]
+    return {
+        "median_ms": statistics.median(times), "min_ms": min(times), "repeats": repeats,
+        "lazy_loaded": heavy, "top_self_ms": [[name, st / 1e3] for name, (st, _) in slow],
+    }
+
+def check(module: str, res: Dict[str, Any], budget_ms: Optional[float]) -> List[str]:
+    """Нарушения: превышение бюджета по медиане и ленивые зависимости, загруженные при импорте."""
+    problems = []
+    if budget_ms is not None and res["median_ms"] > budget_ms:
+        problems.append(f"{module}: {res['median_ms']:.0f} мс > бюджета {budget_ms:.0f} мс")
+    if res["lazy_loaded"]:
+        problems.append(f"{module}: при импорте загружены {', '.join(res['lazy_loaded'])}")
+    return problems
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m benchmarks.coldstart", description="Холодный старт: время импорта.")
+    ap.add_argument("-m", dest="modules", action="append", help="модуль (можно несколько; по умолчанию — BUDGETS)")
+    ap.add_argument("--budget", type=float, help="бюджет, мс (для всех -m; иначе — из BUDGETS)")
+    ap.add_argument("--scale", type=float, default=1.0, help="множитель бюджетов BUDGETS")
+    ap.add_argument("--repeats", type=int, default=5)
+    ap.add_argument("--out", default="-", help="JSON с результатами ('-' — stdout)")
+    args = ap.parse_args(argv)
+
+    report: Dict[str, Any] = {"results": {}, "problems": []}
+    for module in args.modules or list(BUDGETS):
+        budget = args.budget if args.budget is not None else (
+            BUDGETS[module] * args.scale if module in BUDGETS else None)
+        res = measure(module, args.repeats)
+        res["budget_ms"] = budget
+        report["results"][module] = res
+        report["problems"] += check(module, res, budget)
+        sys.stderr.write(f"{module:<40} {res['median_ms']:8.1f} ms  (бюджет {budget or '-'})"
+                         f"{'  lazy: ' + ','.join(res['lazy_loaded']) if res['lazy_loaded'] else ''}\n")
+    for p in report["problems"]:
+        sys.stderr.write(f"FAIL {p}\n")
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out == "-":
+        print(text)
+    else:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            fh.write(text + "\n")
+    return 1 if report["problems"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,378 @@
+# benchmarks/run.py
+"""
+Офлайн-бенчмарки горячих путей на синтетических барах (сеть не нужна).
+
+    python -m benchmarks.run                              # все кейсы, таблица + JSON в stdout
+    python -m benchmarks.run -k indicator --out cur.json  # фильтр по имени, результат в файл
+    python -m benchmarks.run --baseline base.json --threshold 0.15   # сравнение: код 1 при регрессии
+
+Метрика — медиана времени одного вызова по нескольким повторам (число вызовов в повторе
+подбирается так, чтобы повтор длился не меньше --min-time).
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import synthetic_daily
+
+Factory = Callable[[], Any]   # contextmanager-фабрика: with factory() as fn: fn()
+
+CASES: Dict[str, Factory] = {}
+
+def case(name: str):
+    def deco(gen):
+        CASES[name] = contextmanager(gen)
+        return gen
+    return deco
+
+
+# ------------------------- данные -------------------------
+
+def _signal(action: str = "BUY"):
+    from capintel.signal_engine import build_signal
+    sig = build_signal("AAPL", "equity", "swing", 100.0)
+    if action == "BUY":
+        return sig.copy(update=dict(action="BUY", entry=100.0, take_profit=[101.0, 102.0], stop=99.0))
+    return sig.copy(update=dict(action="SHORT", entry=100.0, take_profit=[99.0, 98.0], stop=101.0))
+
+@contextmanager
+def stub_fetch(daily: pd.DataFrame) -> Iterator[None]:
+    """_fetch_daily_bars → готовые бары (без Polygon и bar_store)."""
+    from capintel.strategy import my_strategy as ms
+    orig = ms._fetch_daily_bars
+    ms._fetch_daily_bars = lambda asset_class, ticker, days=500: daily
+    try:
+        yield
+    finally:
+        ms._fetch_daily_bars = orig
+
+
+# ------------------------- кейсы: сигнал -------------------------
+
+@case("signal.build_record")
+def _():
+    from capintel.signal_engine import _build_record   # без signal_cache
+    yield lambda: _build_record("AAPL", "equity", "swing", 190.0)
+
+@case("signal.build_record.cached")
+def _():
+    from capintel.signal_engine import build_record
+    yield lambda: build_record("AAPL", "equity", "swing", 190.0)
+
+@case("signal.build_signal.cached")
+def _():
+    from capintel.signal_engine import build_signal   # запись из кэша + валидация pydantic
+    yield lambda: build_signal("AAPL", "equity", "swing", 190.0)
+
+@case("signal.to_json.batch_100")
+def _():
+    from capintel.jsonfast import dumps
+    from capintel.signal_engine import _build_record
+    recs = [_build_record(f"T{i}", "equity", "swing", 100.0 + i) for i in range(100)]
+    yield lambda: dumps([r.to_dict() for r in recs])
+
+def _drop_signal_caches(ms) -> None:
+    ms.bands_cache.invalidate()
+    ms.spec_cache.invalidate()
+
+@case("signal.generate_signal_core.cold")
+def _():
+    from capintel.strategy import my_strategy as ms
+    daily = synthetic_daily()
+    def run():
+        ms.pivot_index.invalidate()
+        _drop_signal_caches(ms)
+        return ms.generate_signal_core("AAPL", "equity", "swing", float(daily["c"].iloc[-1]))
+    with stub_fetch(daily):
+        yield run
+
+@case("signal.generate_signal_core.warm")
+def _():
+    from capintel.strategy import my_strategy as ms
+    daily = synthetic_daily()
+    px = float(daily["c"].iloc[-1])
+    def run():
+        _drop_signal_caches(ms)   # тёплый PivotIndex, признаки и решение — заново
+        return ms.generate_signal_core("AAPL", "equity", "swing", px)
+    with stub_fetch(daily):
+        yield run
+
+@case("signal.generate_signal_core.cached")
+def _():
+    from capintel.strategy import my_strategy as ms
+    daily = synthetic_daily()
+    px = float(daily["c"].iloc[-1])
+    with stub_fetch(daily):
+        yield lambda: ms.generate_signal_core("AAPL", "equity", "swing", px)
+
+
+# ------------------------- кейсы: индикаторы my_strategy -------------------------
+
+def _indicator_case(name: str, call: Callable[[Any, pd.DataFrame], Any]) -> None:
+    @case(f"indicator.{name}")
+    def _():
+        from capintel.strategy import my_strategy as ms
+        b = synthetic_daily()
+        yield lambda: call(ms, b)
+
+_indicator_case("ema", lambda ms, b: ms._ema(b["c"], 20))
+_indicator_case("rsi_wilder", lambda ms, b: ms._rsi_wilder(b["c"], 14))
+_indicator_case("atr_wilder", lambda ms, b: ms._atr_wilder(b, 14))
+_indicator_case("macd_hist", lambda ms, b: ms._macd_hist(b["c"]))
+_indicator_case("heikin_ashi", lambda ms, b: ms._heikin_ashi(b))
+_indicator_case("last_streak_length", lambda ms, b: ms._last_streak_length(b["c"].diff(), True))
+_indicator_case("deceleration_abs", lambda ms, b: ms._deceleration_abs(b["c"].diff()))
+_indicator_case("fibo_pivots", lambda ms, b: ms._fibo_pivots(110.0, 90.0, 100.0))
+_indicator_case("period_hlc.M", lambda ms, b: ms._last_complete_period_hlc(b, "M"))
+_indicator_case("period_hlc.Y", lambda ms, b: ms._last_complete_period_hlc(b, "Y"))
+_indicator_case("bar_features", lambda ms, b: ms._bar_features(b))
+
+@case("indicator.stream_update")
+def _():
+    from capintel.strategy.indicators import IndicatorSet
+    ind = IndicatorSet()
+    b = synthetic_daily()
+    ind.seed(b)
+    row = tuple(float(x) for x in b[["o", "h", "l", "c"]].iloc[-1])
+    yield lambda: ind.update(*row)
+
+@case("indicator.panel_features_50")
+def _():
+    from capintel.strategy.panel import BarPanel, last_bar_features
+    panel = BarPanel.from_frames({f"T{i}": synthetic_daily(seed=i) for i in range(50)})
+    yield lambda: last_bar_features(panel)
+
+
+# ------------------------- кейсы: бэктест -------------------------
+
+@case("backtest.toy_backtest")
+def _():
+    from capintel.backtest import toy_backtest
+    sig = _signal()
+    yield lambda: toy_backtest(sig)
+
+@case("backtest.toy_backtest_mc_1000")
+def _():
+    from capintel.backtest import toy_backtest_mc
+    sig = _signal("SHORT")
+    yield lambda: toy_backtest_mc(sig, n_paths=1000)
+
+
+# ------------------------- кейсы: визуализация -------------------------
+
+@case("visual.render_gauge_svg")
+def _():
+    from capintel.visuals_svg import render_gauge_svg
+    yield lambda: render_gauge_svg(0.42, prev_score=0.10)
+
+@case("visual.render_sentiment_gauge")
+def _():
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+        from capintel.visuals import render_sentiment_gauge
+    except ImportError:
+        yield None   # без matplotlib — кейс пропускается
+        return
+    yield lambda: plt.close(render_sentiment_gauge(0.42))
+
+@case("visual.render_sentiment_gauge_png.uncached")
+def _():
+    try:
+        import matplotlib
+        matplotlib.use("Agg")
+        from capintel.visuals import _gauge_canvas
+    except ImportError:
+        yield None
+        return
+    canvas = _gauge_canvas("#0E1117", 150)
+    yield lambda: canvas.png(0.42)
+
+
+# ------------------------- кейсы: API через TestClient -------------------------
+
+@contextmanager
+def _client():
+    from fastapi.testclient import TestClient
+    import api.main as main
+    with TestClient(main.app) as client:
+        yield client
+
+@case("api.health")
+def _():
+    with _client() as c:
+        yield lambda: c.get("/health")
+
+@case("api.signal")
+def _():
+    body = {"ticker": "AAPL", "asset_class": "equity", "horizon": "swing", "last_price": 190.0}
+    with _client() as c:
+        yield lambda: c.post("/signal", json=body)
+
+@case("api.signals_batch_20")
+def _():
+    items = [{"ticker": f"T{i}", "asset_class": "equity", "horizon": "swing", "last_price": 100.0 + i}
+             for i in range(20)]
+    with _client() as c:
+        yield lambda: c.post("/signals/batch", json={"items": items})
+
+@case("api.backtest")
+def _():
+    body = json.loads(_signal().json())
+    with _client() as c:
+        yield lambda: c.post("/backtest", json=body)
+
+@case("api.gauge_svg")
+def _():
+    with _client() as c:
+        yield lambda: c.get("/gauge.svg", params={"score": 0.42})
+
+
+# ------------------------- прогон и сравнение -------------------------
+
+def measure(fn: Callable[[], Any], repeats: int = 5, min_time: float = 0.05) -> Dict[str, Any]:
+    """Калибровка числа вызовов (≥ min_time на повтор), затем repeats повторов; время — на один вызов, сек."""
+    fn()   # прогрев (импорты, lru_cache и т.п.)
+    loops = 1
+    while True:
+        t0 = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        dt = time.perf_counter() - t0
+        if dt >= min_time or loops >= 1 << 20:
+            break
+        loops *= 2 if dt <= 0 else max(2, min(10, int(min_time / dt) + 1))
+    times = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        times.append((time.perf_counter() - t0) / loops)
+    return {
+        "median_s": statistics.median(times), "min_s": min(times), "mean_s": statistics.fmean(times),
+        "stdev_s": statistics.stdev(times) if len(times) > 1 else 0.0, "loops": loops, "repeats": repeats,
+    }
+
+def _git_rev() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except Exception:  # noqa — не git-чекаут
+        return None
+
+def run(names: Optional[Sequence[str]] = None, repeats: int = 5, min_time: float = 0.05,
+        progress: Optional[Callable[[str, Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """Прогон кейсов (все или names) → {"meta": ..., "results": {имя: метрики}}; недоступные — {"skipped": причина}."""
+    results: Dict[str, Any] = {}
+    for name in (names if names is not None else CASES):
+        try:
+            with CASES[name]() as fn:
+                res = {"skipped": "нет зависимости"} if fn is None else measure(fn, repeats, min_time)
+        except Exception as e:  # noqa — упавший кейс не роняет прогон
+            res = {"error": f"{type(e).__name__}: {e}"}
+        results[name] = res
+        if progress:
+            progress(name, res)
+    return {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git": _git_rev(), "python": platform.python_version(), "platform": platform.platform(),
+            "numpy": np.__version__, "pandas": pd.__version__, "repeats": repeats, "min_time": min_time,
+        },
+        "results": results,
+    }
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float = 0.10) -> List[Dict[str, Any]]:
+    """
+    Построчное сравнение медиан: ratio = текущее / базовое.
+    status: "regression" (ratio > 1 + threshold), "improved" (ratio < 1 - threshold), "ok",
+    "new" (нет в базе), "failed" (кейс не отработал сейчас). Сравниваются только кейсы текущего прогона.
+    """
+    rows = []
+    cur, base = current["results"], baseline["results"]
+    for name in cur:
+        c, b = cur[name], base.get(name, {})
+        if "median_s" not in c:
+            rows.append({"name": name, "status": "failed", "ratio": None})
+            continue
+        if "median_s" not in b:
+            rows.append({"name": name, "status": "new", "ratio": None})
+            continue
+        ratio = c["median_s"] / b["median_s"] if b["median_s"] > 0 else float("inf")
+        status = "regression" if ratio > 1 + threshold else "improved" if ratio < 1 - threshold else "ok"
+        rows.append({"name": name, "status": status, "ratio": ratio,
+                     "baseline_s": b["median_s"], "current_s": c["median_s"]})
+    return rows
+
+def _fmt_time(s: float) -> str:
+    for unit, k in (("s", 1.0), ("ms", 1e-3), ("µs", 1e-6)):
+        if s >= k:
+            return f"{s / k:8.2f} {unit}"
+    return f"{s / 1e-9:8.1f} ns"
+
+def _print_result(name: str, res: Dict[str, Any]) -> None:
+    if "median_s" in res:
+        sys.stderr.write(f"{name:<48} {_fmt_time(res['median_s'])}  ±{res['stdev_s'] / res['median_s'] * 100 if res['median_s'] else 0:4.1f}%\n")
+    else:
+        sys.stderr.write(f"{name:<48} {res.get('skipped') or res.get('error')}\n")
+    sys.stderr.flush()
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m benchmarks.run", description="Офлайн-бенчмарки capintel.")
+    ap.add_argument("-k", dest="pattern", action="append", help="подстрока имени кейса (можно несколько)")
+    ap.add_argument("--list", action="store_true", help="только список кейсов")
+    ap.add_argument("--repeats", type=int, default=5)
+    ap.add_argument("--min-time", type=float, default=0.05, help="сек на один повтор")
+    ap.add_argument("--out", default="-", help="JSON с результатами ('-' — stdout)")
+    ap.add_argument("--baseline", help="JSON прошлого прогона для сравнения")
+    ap.add_argument("--threshold", type=float, default=0.10, help="допустимое замедление медианы (0.10 = +10%%)")
+    args = ap.parse_args(argv)
+
+    names = [n for n in CASES if not args.pattern or any(p in n for p in args.pattern)]
+    if args.list:
+        print("\n".join(names))
+        return 0
+    if not names:
+        ap.error("ни один кейс не подходит под -k")
+
+    report = run(names, args.repeats, args.min_time, progress=_print_result)
+    code = 0
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as fh:
+            rows = compare(report, json.load(fh), args.threshold)
+        report["compare"] = {"baseline": args.baseline, "threshold": args.threshold, "rows": rows}
+        sys.stderr.write("\n")
+        for r in rows:
+            ratio = f"{r['ratio']:.2f}x" if r["ratio"] is not None else "-"
+            sys.stderr.write(f"{r['name']:<48} {ratio:>8}  {r['status']}\n")
+        n_reg = sum(r["status"] == "regression" for r in rows)
+        sys.stderr.write(f"регрессий: {n_reg} (порог +{args.threshold:.0%})\n")
+        code = 1 if n_reg else 0
+    failed = [n for n, res in report["results"].items() if "error" in res]
+    if failed:
+        sys.stderr.write(f"упали: {', '.join(failed)}\n")
+        code = 1
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out == "-":
+        print(text)
+    else:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            fh.write(text + "\n")
+    return code
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,16 @@
+# benchmarks/synthetic.py
+"""Синтетические рыночные данные — общие для бенчмарков и тестов (tests/conftest.make_daily)."""
+
+import numpy as np
+import pandas as pd
+
+
+def synthetic_daily(n: int = 520, seed: int = 0, start: str = "2024-01-01", freq: str = "D",
+                    hour: int = 0) -> pd.DataFrame:
+    """Дневные бары o,h,l,c,v с UTC-индексом, как отдаёт _fetch_daily_bars; hour — сдвиг меток (у акций 05:00 UTC)."""
+    rng = np.random.default_rng(seed)
+    c = 100 * np.exp(np.cumsum(rng.normal(0, 0.015, n)))
+    o = np.r_[c[0], c[:-1]]
+    idx = pd.date_range(start, periods=n, freq=freq, tz="UTC", name="dt") + pd.Timedelta(hours=hour)
+    return pd.DataFrame({"o": o, "h": np.maximum(o, c) * 1.006, "l": np.minimum(o, c) * 0.994, "c": c, "v": 1e6},
+                        index=idx)
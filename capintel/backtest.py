@@ -23,3 +23,59 @@ def toy_backtest(signal: Signal, n_steps: int = 400, step_bp: float = 15.0, fee_
     pnl = 0.0 if action in ["WAIT","CLOSE"] else (exit_price-entry)/entry if action=="BUY" else (entry-exit_price)/entry
     fees = fee_bp/10000.0 * (1 if action in ["BUY","SHORT"] else 0)
     return {"steps": int(i), "exit_price": float(exit_price), "pnl": float(pnl - fees), "equity": float(1+pnl-fees)}
+
+def _first_hit(price: np.ndarray, action: str, tp1: float, tp2: float, stop: float):
+    """
+    Векторный поиск первого касания уровней по последней оси.
+    price: [..., n_steps]. Возвращает (idx, level), level: 0 — нет касания, 1 — TP1, 2 — TP2, 3 — стоп.
+    Порядок проверки внутри шага как в toy_backtest: TP2 → TP1 → стоп.
+    """
+    if action == "BUY":
+        hit2, hit1, hit_s = price >= tp2, price >= tp1, price <= stop
+    else:
+        hit2, hit1, hit_s = price <= tp2, price <= tp1, price >= stop
+    any_hit = hit1 | hit2 | hit_s
+    found = any_hit.any(axis=-1)
+    idx = np.where(found, any_hit.argmax(axis=-1), price.shape[-1] - 1)
+    at = lambda m: np.take_along_axis(m, idx[..., None], axis=-1)[..., 0]
+    level = np.select([at(hit2), at(hit1), at(hit_s)], [2, 1, 3], default=0)
+    return idx, np.where(found, level, 0)
+
+def toy_backtest_mc(signal: Signal, n_paths: int = 5000, n_steps: int = 400, step_bp: float = 15.0,
+                    fee_bp: float = 2.0, seed: int = 42, quantiles=(0.05, 0.25, 0.5, 0.75, 0.95),
+                    chunk: int = 2000):
+    """
+    Monte Carlo-версия toy_backtest: пути пачками [chunk, n_steps] (память не растёт с n_paths;
+    те же числа, что одним массивом) и статистика PnL. median_steps — только по путям с касанием уровня,
+    пути без касания — отдельно в unhit_paths.
+    """
+    entry = signal.entry; action = signal.action
+    tp1, tp2 = signal.take_profit; stop = signal.stop
+    qs = {f"p{int(round(q*100)):02d}": 0.0 for q in quantiles}
+    if action not in ("BUY", "SHORT"):
+        return {"paths": int(n_paths), "mean_pnl": 0.0, "std_pnl": 0.0, "quantiles": qs,
+                "hit_rates": {"tp1": 0.0, "tp2": 0.0, "stop": 0.0, "none": 1.0},
+                "median_steps": None, "unhit_paths": int(n_paths), "mean_equity": 1.0}
+
+    rng = np.random.default_rng(seed)
+    idx, level = np.empty(n_paths, dtype=np.int64), np.empty(n_paths, dtype=np.int64)
+    for a in range(0, n_paths, chunk):
+        b = min(a + chunk, n_paths)
+        price = np.cumsum(rng.normal(0.0, step_bp/10000.0, (b - a, n_steps)), axis=1); price *= entry; price += entry
+        idx[a:b], level[a:b] = _first_hit(price, action, tp1, tp2, stop)
+    exit_price = np.choose(level, [entry, tp1, tp2, stop])
+    pnl = (exit_price - entry) / entry if action == "BUY" else (entry - exit_price) / entry
+    pnl = pnl - fee_bp/10000.0
+
+    qv = np.quantile(pnl, list(quantiles))
+    hits = np.bincount(level, minlength=4) / float(n_paths)
+    return {
+        "paths": int(n_paths),
+        "mean_pnl": float(pnl.mean()),
+        "std_pnl": float(pnl.std()),
+        "quantiles": {k: float(v) for k, v in zip(qs, qv)},
+        "hit_rates": {"tp1": float(hits[1]), "tp2": float(hits[2]), "stop": float(hits[3]), "none": float(hits[0])},
+        "median_steps": float(np.median(idx[level > 0])) if (level > 0).any() else None,
+        "unhit_paths": int((level == 0).sum()),
+        "mean_equity": float(1.0 + pnl.mean()),
+    }
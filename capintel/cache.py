@@ -0,0 +1,178 @@
+# capintel/cache.py
+"""
+TTL + LRU кэш с single-flight: одновременные промахи по одному ключу дают ровно один вызов loader,
+остальные ждут его результат. Ошибки не кэшируются (получают все ожидающие).
+"""
+
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+_MISSING = object()
+
+# настройки мемо сигналов — одни на signal_engine и my_strategy (читать как cache.X, не копировать в модуль).
+# TTL <= 0 — мемо выключено; корзина цены CAPINTEL_SIGNAL_PRICE_BUCKET_BP: 0 — точная цена.
+SIGNAL_CACHE_TTL = float(os.getenv("CAPINTEL_SIGNAL_CACHE_TTL", "60"))
+SIGNAL_CACHE_SIZE = int(os.getenv("CAPINTEL_SIGNAL_CACHE_SIZE", "4096"))
+SIGNAL_PRICE_BUCKET_BP = float(os.getenv("CAPINTEL_SIGNAL_PRICE_BUCKET_BP", "0"))
+
+def price_bucket(price: float, bucket_bp: float = 0.0):
+    """Ключ цены для кэшей сигналов: bucket_bp <= 0 — точная цена, иначе номер логарифмической корзины шириной bucket_bp б.п."""
+    if bucket_bp <= 0 or price <= 0:
+        return float(price)
+    return math.floor(math.log(price) / math.log1p(bucket_bp / 10000.0))
+
+def _retrieve(task: "asyncio.Task") -> None:
+    # ошибка общей загрузки без ожидающих не должна логироваться как "exception was never retrieved"
+    if not task.cancelled():
+        task.exception()
+
+class _Flight:
+    __slots__ = ("event", "value", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+class TTLCache:
+    def __init__(self, maxsize: int = 1024, ttl: float = 5.0, clock: Callable[[], float] = time.monotonic):
+        self.maxsize = int(maxsize)
+        self.ttl = float(ttl)
+        self._clock = clock
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._aflights: Dict[Hashable, Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = {}
+        self.hits = self.misses = self.coalesced = self.evictions = self.errors = 0
+
+    # ---- базовые операции (вызывать под self._lock) ----
+    def _get(self, key):
+        item = self._data.get(key)
+        if item is None:
+            return _MISSING
+        expires, value = item
+        if expires <= self._clock():
+            del self._data[key]
+            return _MISSING
+        self._data.move_to_end(key)
+        return value
+
+    def _set(self, key, value, ttl: Optional[float]):
+        self._data[key] = (self._clock() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    # ---- публичный API ----
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._get(key)
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl: Optional[float] = None) -> None:
+        with self._lock:
+            self._set(key, value, ttl)
+
+    def invalidate(self, key=_MISSING) -> None:
+        """Без аргумента — очистить всё."""
+        with self._lock:
+            if key is _MISSING:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+    def get_or_load(self, key, loader: Callable[[], Any], ttl: Optional[float] = None):
+        with self._lock:
+            value = self._get(key)
+            if value is not _MISSING:
+                self.hits += 1
+                return value
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                self.misses += 1
+                flight = self._flights[key] = _Flight()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = loader()
+        except BaseException as e:
+            flight.error = e
+            with self._lock:
+                self.errors += 1
+            raise
+        else:
+            with self._lock:
+                self._set(key, flight.value, ttl)
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.event.set()
+        return flight.value
+
+    async def aget_or_load(self, key, loader: Callable[[], Awaitable[Any]], ttl: Optional[float] = None):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            value = self._get(key)
+            if value is not _MISSING:
+                self.hits += 1
+                return value
+            inflight = self._aflights.get(key)
+            if inflight is not None and inflight[0] is loop:
+                self.coalesced += 1
+                task = inflight[1]
+            else:
+                self.misses += 1
+                task = None
+
+        if task is None:
+            task = loop.create_task(self._aload(key, loader, ttl))
+            task.add_done_callback(_retrieve)
+            with self._lock:
+                self._aflights[key] = (loop, task)
+        # загрузка — отдельная задача: отмена лидера или ожидающего не отменяет её для остальных
+        return await asyncio.shield(task)
+
+    async def _aload(self, key, loader: Callable[[], Awaitable[Any]], ttl: Optional[float]):
+        try:
+            value = await loader()
+        except BaseException:
+            with self._lock:
+                self.errors += 1
+            raise
+        else:
+            with self._lock:
+                self._set(key, value, ttl)
+            return value
+        finally:
+            with self._lock:
+                flight = self._aflights.get(key)
+                if flight is not None and flight[1] is asyncio.current_task():
+                    del self._aflights[key]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "size": len(self._data), "maxsize": self.maxsize,
+                "hits": self.hits, "misses": self.misses, "coalesced": self.coalesced,
+                "evictions": self.evictions, "errors": self.errors,
+                "hit_rate": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,133 @@
+# capintel/export.py
+"""
+Массовая выгрузка сигналов потоком: NDJSON или Arrow IPC (stream format), плоскими колонками.
+take_profit и первая альтернатива разворачиваются в колонки (tp1, tp2, alt_*), дисклеймер не выгружается.
+Результат целиком не собирается: сигналы строятся и кодируются пачками по chunk_rows.
+
+    with open("signals.arrow", "wb") as fh:
+        for part in export_signals([("AAPL", "equity", "swing", None), ...], fmt="arrow"):
+            fh.write(part)
+    pd.read_json("signals.ndjson", lines=True)  /  pyarrow.ipc.open_stream(...).read_pandas()
+"""
+
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from capintel.jsonfast import dumps
+from capintel.schemas import SignalRecord
+from capintel.signal_engine import build_record
+
+# (имя, тип Arrow) — порядок колонок одинаковый для обоих форматов
+COLUMNS: List[Tuple[str, str]] = [
+    ("id", "string"), ("ticker", "string"), ("asset_class", "string"), ("horizon", "string"),
+    ("action", "string"), ("entry", "float64"), ("tp1", "float64"), ("tp2", "float64"), ("stop", "float64"),
+    ("confidence", "float64"), ("position_size_pct_nav", "float64"),
+    ("created_at", "timestamp"), ("expires_at", "timestamp"), ("narrative_ru", "string"),
+    ("alt_if_condition", "string"), ("alt_action", "string"), ("alt_entry", "float64"),
+    ("alt_tp1", "float64"), ("alt_tp2", "float64"), ("alt_stop", "float64"),
+    ("error", "string"),
+]
+_EMPTY = dict.fromkeys(name for name, _ in COLUMNS)
+
+ExportItem = Tuple[str, str, str, Any]   # (тикер, класс, горизонт, цена | None — взять из Polygon | исключение)
+
+
+def flat_row(rec: SignalRecord) -> Dict[str, Any]:
+    tp = rec.take_profit
+    row = {
+        "id": rec.id, "ticker": rec.ticker, "asset_class": rec.asset_class, "horizon": rec.horizon,
+        "action": rec.action, "entry": rec.entry, "tp1": tp[0], "tp2": tp[1] if len(tp) > 1 else None,
+        "stop": rec.stop, "confidence": rec.confidence, "position_size_pct_nav": rec.position_size_pct_nav,
+        "created_at": rec.created_at, "expires_at": rec.expires_at, "narrative_ru": rec.narrative_ru,
+        "alt_if_condition": None, "alt_action": None, "alt_entry": None, "alt_tp1": None, "alt_tp2": None,
+        "alt_stop": None, "error": None,
+    }
+    if rec.alternatives:
+        a = rec.alternatives[0]
+        row.update(alt_if_condition=a.if_condition, alt_action=a.action, alt_entry=a.entry,
+                   alt_tp1=a.take_profit[0], alt_tp2=a.take_profit[1] if len(a.take_profit) > 1 else None,
+                   alt_stop=a.stop)
+    return row
+
+def error_row(ticker: str, asset_class: str, horizon: str, error: BaseException | str) -> Dict[str, Any]:
+    msg = error if isinstance(error, str) else (str(error) or type(error).__name__)
+    return {**_EMPTY, "ticker": ticker.upper(), "asset_class": asset_class, "horizon": horizon, "error": msg}
+
+def signal_rows(items: Iterable[ExportItem], price: Optional[Callable[[str, str], float]] = None) -> Iterator[Dict[str, Any]]:
+    """Плоские строки по одной на item; ошибка цены/сигнала — строка с колонкой error (цена может быть исключением)."""
+    if price is None:
+        from capintel.providers.polygon_client import get_last_price as price
+    for ticker, asset_class, horizon, px in items:
+        try:
+            px = price(asset_class, ticker) if px is None else px
+            if isinstance(px, Exception):
+                raise px
+            yield flat_row(build_record(ticker, asset_class, horizon, float(px)))
+        except Exception as e:  # noqa — одна строка не роняет выгрузку
+            yield error_row(ticker, asset_class, horizon, e)
+
+
+# ------------------------- кодировщики -------------------------
+
+class NdjsonEncoder:
+    media_type = "application/x-ndjson"
+
+    def begin(self) -> bytes:
+        return b""
+
+    def batch(self, rows: List[Dict[str, Any]]) -> bytes:
+        return b"".join(dumps(r) + b"\n" for r in rows)
+
+    def end(self) -> bytes:
+        return b""
+
+class ArrowEncoder:
+    """Arrow IPC stream: сообщение схемы, затем по record batch на пачку, затем маркер конца потока."""
+    media_type = "application/vnd.apache.arrow.stream"
+    _EOS = b"\xff\xff\xff\xff\x00\x00\x00\x00"
+
+    def __init__(self):
+        try:
+            import pyarrow as pa
+        except ImportError as e:
+            raise RuntimeError("Для выгрузки в Arrow нужен пакет pyarrow (pip install pyarrow)") from e
+        self.pa = pa
+        types = {"string": pa.string(), "float64": pa.float64(), "timestamp": pa.timestamp("us", tz="UTC")}
+        self.schema = pa.schema([(name, types[t]) for name, t in COLUMNS])
+
+    def begin(self) -> bytes:
+        return self.schema.serialize().to_pybytes()
+
+    def batch(self, rows: List[Dict[str, Any]]) -> bytes:
+        pa = self.pa
+        arrays = [pa.array([r[f.name] for r in rows], type=f.type) for f in self.schema]
+        return pa.record_batch(arrays, schema=self.schema).serialize().to_pybytes()
+
+    def end(self) -> bytes:
+        return self._EOS
+
+ENCODERS = {"ndjson": NdjsonEncoder, "arrow": ArrowEncoder}
+
+def chunks(it: Iterable, size: int) -> Iterator[list]:
+    it = iter(it)
+    while True:
+        part = list(islice(it, size))
+        if not part:
+            return
+        yield part
+
+def encode(rows: Iterable[Dict[str, Any]], fmt: str = "ndjson", chunk_rows: int = 1000) -> Iterator[bytes]:
+    enc = ENCODERS[fmt]()
+    head = enc.begin()
+    if head:
+        yield head
+    for part in chunks(rows, chunk_rows):
+        yield enc.batch(part)
+    tail = enc.end()
+    if tail:
+        yield tail
+
+def export_signals(items: Iterable[ExportItem], fmt: str = "ndjson", chunk_rows: int = 1000,
+                   price: Optional[Callable[[str, str], float]] = None) -> Iterator[bytes]:
+    """Куски байтов выгрузки (NDJSON / Arrow IPC) — писать в файл или отдавать chunked-ответом."""
+    return encode(signal_rows(items, price), fmt, chunk_rows)
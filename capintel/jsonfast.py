@@ -0,0 +1,30 @@
+# capintel/jsonfast.py
+"""
+JSON для массовых ответов (batch, SSE, экспорт): orjson, если установлен (опционально), иначе stdlib json.
+datetime → ISO 8601 в обоих случаях, результат — bytes (UTF-8).
+"""
+
+import json
+from datetime import date, datetime
+from typing import Any
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+def _default(o: Any):
+    if isinstance(o, (datetime, date)):
+        return o.isoformat()
+    to_dict = getattr(o, "to_dict", None)   # SignalRecord / AltRecord
+    if to_dict is not None:
+        return to_dict()
+    if hasattr(o, "item"):                   # numpy-скаляры
+        return o.item()
+    raise TypeError(f"Type is not JSON serializable: {type(o).__name__}")
+
+def dumps(obj: Any, indent: bool = False) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_INDENT_2 if indent else 0)
+    return json.dumps(obj, default=_default, ensure_ascii=False,
+                      indent=2 if indent else None, separators=None if indent else (",", ":")).encode("utf-8")
@@ -0,0 +1,265 @@
+# capintel/metrics.py
+"""
+Лёгкие метрики в текстовом формате Prometheus (без внешних зависимостей).
+Counter / Histogram с метками; запись — словарь + счётчики под локом (~1 мкс),
+текст собирается только при чтении /metrics. CAPINTEL_METRICS=0 — запись выключена.
+
+    SIGNAL_STAGE.labels(stage="rsi").time()      # контекст-таймер
+    POLYGON_REQUESTS.inc(endpoint="last_trade", status="200")
+"""
+
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+ENABLED = os.getenv("CAPINTEL_METRICS", "1").lower() not in ("0", "false", "no")
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(v: str) -> str:
+    return v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _fmt_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _fmt_num(x: float) -> str:
+    if x == float("inf"):
+        return "+Inf"
+    return repr(float(x))
+
+
+class _NoopTimer:
+    __slots__ = ()
+    def __enter__(self): return self
+    def __exit__(self, *exc): return False
+
+_NOOP = _NoopTimer()
+
+
+class _Timer:
+    __slots__ = ("child", "t0")
+
+    def __init__(self, child: "_HistogramChild"):
+        self.child = child
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self.t0)
+        return False
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        if not ENABLED:
+            return
+        with self._lock:
+            self.value += amount
+
+    def reset(self) -> None:
+        with self._lock:
+            self.value = 0.0
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "count", "_lock")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)   # последний — +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        if not ENABLED:
+            return
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self):
+        return _Timer(self) if ENABLED else _NOOP
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counts = [0] * (len(self.buckets) + 1)
+            self.sum, self.count = 0.0, 0
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, doc: str, labelnames: Iterable[str] = (), registry: Optional["Registry"] = None):
+        self.name, self.doc, self.labelnames = name, doc, tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+        (REGISTRY if registry is None else registry).register(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, **labels):
+        """Дочерняя серия для набора меток (кэшируется — можно держать в модуле)."""
+        key = tuple(str(labels[n]) for n in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _series(self) -> List[Tuple[Tuple[str, ...], Any]]:
+        with self._lock:
+            return sorted(self._children.items())
+
+    def clear(self) -> None:
+        """Обнуление значений; дочерние серии остаются (на них могут держать ссылки)."""
+        with self._lock:
+            for child in self._children.values():
+                child.reset()
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        if ENABLED:
+            self.labels(**labels).inc(amount)
+
+    def value(self, **labels) -> float:
+        return self.labels(**labels).value
+
+    def render(self) -> List[str]:
+        return [f"{self.name}{_fmt_labels(self.labelnames, k)} {_fmt_num(c.value)}" for k, c in self._series()]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, doc: str, labelnames: Iterable[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS,
+                 registry: Optional["Registry"] = None):
+        self.buckets = tuple(sorted(float(b) for b in buckets))
+        super().__init__(name, doc, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float, **labels) -> None:
+        if ENABLED:
+            self.labels(**labels).observe(value)
+
+    def time(self, **labels):
+        return self.labels(**labels).time() if ENABLED else _NOOP
+
+    def render(self) -> List[str]:
+        out = []
+        for k, c in self._series():
+            with c._lock:
+                counts, total, n = list(c.counts), c.sum, c.count
+            acc = 0
+            for le, cnt in zip(self.buckets + (float("inf"),), counts):
+                acc += cnt
+                le_label = 'le="%s"' % _fmt_num(le)
+                out.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, k, le_label)} {acc}")
+            out.append(f"{self.name}_sum{_fmt_labels(self.labelnames, k)} {_fmt_num(total)}")
+            out.append(f"{self.name}_count{_fmt_labels(self.labelnames, k)} {n}")
+        return out
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> None:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Метрика {metric.name} уже зарегистрирована")
+            self._metrics[metric.name] = metric
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for m in metrics:
+            lines.append(f"# HELP {m.name} {m.doc}")
+            lines.append(f"# TYPE {m.name} {m.kind}")
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+    def clear(self) -> None:
+        """Обнуление всех метрик — для тестов."""
+        for m in list(self._metrics.values()):
+            m.clear()
+
+
+REGISTRY = Registry()
+
+def render() -> str:
+    return REGISTRY.render()
+
+
+# ------------------------- метрики приложения -------------------------
+
+SIGNAL_STAGE = Histogram("capintel_signal_stage_seconds",
+                         "Время этапов generate_signal_core (bar_fetch, period_hlc, pivots, heikin_ashi, macd, rsi, atr, decision)",
+                         ["stage"])
+BUILD_SIGNAL = Histogram("capintel_build_signal_seconds", "Время build_signal", ["asset_class", "horizon"])
+POLYGON_REQUESTS = Counter("capintel_polygon_requests_total", "Запросы к Polygon по эндпоинту и HTTP-статусу",
+                           ["endpoint", "status"])
+POLYGON_LATENCY = Histogram("capintel_polygon_request_seconds", "Время запроса к Polygon", ["endpoint"])
+POLYGON_FALLBACK = Counter("capintel_polygon_fallback_total",
+                           "Последняя цена взята из минутных агрегатов (last trade не ответил)", ["asset_class"])
+HTTP_REQUESTS = Counter("capintel_http_requests_total", "HTTP-запросы к API", ["method", "route", "status"])
+HTTP_LATENCY = Histogram("capintel_http_request_seconds", "Время обработки HTTP-запроса", ["method", "route"])
+
+
+class MetricsMiddleware:
+    """ASGI-middleware: счётчик и гистограмма по (метод, шаблон маршрута, статус)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not ENABLED:
+            return await self.app(scope, receive, send)
+        t0 = time.perf_counter()
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"   # шаблон, а не сырой путь — без взрыва меток
+            method = scope.get("method", "")
+            HTTP_REQUESTS.inc(method=method, route=path, status=status[0])
+            HTTP_LATENCY.observe(time.perf_counter() - t0, method=method, route=path)
@@ -0,0 +1,218 @@
+# capintel/providers/bar_store.py
+"""
+Локальное хранилище дневных баров: по файлу на тикер (сырые записи BAR_DTYPE, открываются через memmap)
++ json-метаданные. В файл пишутся только *завершённые* бары и только дозаписью в конец —
+уже открытые memmap'ы не портятся; текущий незавершённый бар живёт в метаданных ("tail").
+Полная перезапись (расширение истории назад, слияние) — через временный файл и os.replace.
+Бары adjusted=true: после сплита/дивиденда Polygon пересчитывает всю историю. Поэтому докачка берёт
+и последние overlap сохранённых баров; если их close разошёлся больше чем на adj_tol — история
+перекачивается целиком. Не реже max_age_s — полная перекачка в любом случае.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+
+try:  # межпроцессная блокировка (POSIX); на Windows — только потоковая
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+BAR_DTYPE = np.dtype([("t", "<i8"), ("o", "<f8"), ("h", "<f8"), ("l", "<f8"), ("c", "<f8"), ("v", "<f8")])
+DAY_S = 86400
+
+Fetcher = Callable[[date, date], np.ndarray]
+
+def default_root() -> str:
+    return os.getenv("CAPINTEL_BAR_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "capintel", "bars")
+
+def rows_from_results(results) -> np.ndarray:
+    """results Polygon aggs (t в мс или с) → массив BAR_DTYPE, отсортированный по t, t в секундах."""
+    out = np.empty(len(results or []), dtype=BAR_DTYPE)
+    for i, r in enumerate(results or []):
+        t = int(r["t"])
+        out[i] = (t // 1000 if t > 1e12 else t, r["o"], r["h"], r["l"], r["c"], r.get("v") or 0.0)
+    out.sort(order="t")
+    return out
+
+def _day_ts(d: date) -> int:
+    return int(datetime(d.year, d.month, d.day, tzinfo=timezone.utc).timestamp())
+
+class BarStore:
+    def __init__(self, root: Optional[str] = None, refresh_s: float = 60.0, overlap: int = 5,
+                 adj_tol: float = 1e-4, max_age_s: float = 7 * DAY_S):
+        self.root = root or default_root()
+        self.refresh_s = float(refresh_s)
+        self.overlap = max(1, int(overlap))    # сколько сохранённых баров перезапрашивать для сверки
+        self.adj_tol = float(adj_tol)          # допустимое относительное расхождение close
+        self.max_age_s = float(max_age_s)      # полная перекачка не реже; <= 0 — только по расхождению
+        self._tlocks: Dict[str, threading.Lock] = {}
+        self._tlocks_guard = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    # ---- пути и блокировки ----
+    def _name(self, ticker: str) -> str:
+        return re.sub(r"[^A-Za-z0-9._-]", "_", ticker.upper())
+
+    def _paths(self, ticker: str) -> Tuple[str, str]:
+        n = os.path.join(self.root, self._name(ticker))
+        return n + ".bars", n + ".json"
+
+    @contextmanager
+    def _locked(self, ticker: str):
+        name = self._name(ticker)
+        with self._tlocks_guard:
+            tl = self._tlocks.setdefault(name, threading.Lock())
+        with tl:
+            if fcntl is None:
+                yield
+                return
+            with open(os.path.join(self.root, name + ".lock"), "a") as fh:
+                fcntl.flock(fh, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(fh, fcntl.LOCK_UN)
+
+    # ---- чтение ----
+    def meta(self, ticker: str) -> dict:
+        try:
+            with open(self._paths(ticker)[1], encoding="utf-8") as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            return {}
+
+    def _complete(self, ticker: str) -> np.ndarray:
+        path = self._paths(ticker)[0]
+        try:
+            if os.path.getsize(path) >= BAR_DTYPE.itemsize:
+                return np.memmap(path, dtype=BAR_DTYPE, mode="r")
+        except OSError:
+            pass
+        return np.empty(0, dtype=BAR_DTYPE)
+
+    def load(self, ticker: str, since: Optional[date] = None) -> np.ndarray:
+        """Завершённые бары (memmap-срез без копирования) + незавершённый хвост."""
+        bars = self._complete(ticker)
+        if since is not None and len(bars):
+            bars = bars[np.searchsorted(bars["t"], _day_ts(since)):]
+        tail = self.meta(ticker).get("tail") or []
+        if tail:
+            tail_arr = np.array([tuple(r) for r in tail], dtype=BAR_DTYPE)
+            last = bars["t"][-1] if len(bars) else -1
+            bars = np.concatenate([bars, tail_arr[tail_arr["t"] > last]])
+        return bars
+
+    def version(self, ticker: str) -> Tuple[int, int, float]:
+        """(число баров, t последнего бара, close последнего бара) — меняется при любом новом/обновлённом баре."""
+        bars = self.load(ticker)
+        if not len(bars):
+            return 0, 0, 0.0
+        return len(bars), int(bars["t"][-1]), float(bars["c"][-1])
+
+    # ---- запись ----
+    def _save_meta(self, ticker: str, meta: dict) -> None:
+        path = self._paths(ticker)[1]
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump(meta, fh)
+        os.replace(tmp, path)
+
+    def _rewrite(self, ticker: str, complete: np.ndarray) -> None:
+        path = self._paths(ticker)[0]
+        tmp = f"{path}.{os.getpid()}.tmp"
+        np.ascontiguousarray(complete, dtype=BAR_DTYPE).tofile(tmp)
+        os.replace(tmp, path)
+
+    def _append(self, ticker: str, rows: np.ndarray) -> None:
+        if len(rows):
+            with open(self._paths(ticker)[0], "ab") as fh:
+                fh.write(np.ascontiguousarray(rows, dtype=BAR_DTYPE).tobytes())
+
+    @staticmethod
+    def _split(rows: np.ndarray, now: float) -> Tuple[np.ndarray, np.ndarray]:
+        done = rows["t"] + DAY_S <= now
+        return rows[done], rows[~done]
+
+    def _store(self, ticker: str, rows: np.ndarray, meta: dict, now: float, replace: bool) -> None:
+        if not replace and not len(rows):
+            meta["checked"] = now   # ничего нового — старый хвост остаётся
+            self._save_meta(ticker, meta)
+            return
+        done, tail = self._split(rows, now)
+        if replace:
+            self._rewrite(ticker, done)
+        else:
+            existing = self._complete(ticker)
+            last = existing["t"][-1] if len(existing) else -1
+            self._append(ticker, done[done["t"] > last])
+        meta["tail"] = [[int(r["t"]), float(r["o"]), float(r["h"]), float(r["l"]), float(r["c"]), float(r["v"])] for r in tail]
+        meta["checked"] = now
+        self._save_meta(ticker, meta)
+
+    def merge(self, ticker: str, rows: np.ndarray, covered_from: Optional[date] = None, now: Optional[float] = None) -> None:
+        """Слить произвольные бары (в т.ч. более старые) с хранилищем; новые значения побеждают."""
+        now = time.time() if now is None else now
+        with self._locked(ticker):
+            meta = self.meta(ticker)
+            allrows = np.concatenate([np.asarray(self.load(ticker)), np.asarray(rows, dtype=BAR_DTYPE)])
+            # последняя запись по каждому t
+            _, idx = np.unique(allrows["t"][::-1], return_index=True)
+            allrows = allrows[::-1][idx]
+            if covered_from is not None:
+                cur = meta.get("from")
+                meta["from"] = min(cur, covered_from.isoformat()) if cur else covered_from.isoformat()
+                meta.setdefault("full", now)   # дальше — сверка перекрытия при докачке и max_age_s
+            self._store(ticker, allrows, meta, now, replace=True)
+
+    def _adjusted(self, done: np.ndarray, rows: np.ndarray) -> bool:
+        """Перекрывающиеся бары разошлись по close — история пересчитана (сплит/дивиденд)."""
+        old = done[np.isin(done["t"], rows["t"])]
+        new = rows[np.isin(rows["t"], old["t"])]
+        return bool(len(old)) and not np.allclose(new["c"], old["c"], rtol=self.adj_tol, atol=0.0)
+
+    # ---- основной сценарий: «дай бары с даты fr, докачав недостающее» ----
+    def daily(self, ticker: str, fr: date, to: date, fetch: Fetcher, now: Optional[float] = None) -> np.ndarray:
+        now = time.time() if now is None else now
+        with self._locked(ticker):
+            meta = self.meta(ticker)
+            covered = meta.get("from")
+            stale = self.max_age_s > 0 and now - float(meta.get("full", 0)) >= self.max_age_s
+            if covered is None or covered > fr.isoformat() or stale:
+                # истории нет, нужна глубже, чем есть, или пора перекачать — качаем целиком
+                start = min(fr.isoformat(), covered or fr.isoformat())
+                self._store(ticker, fetch(date.fromisoformat(start), to), {"from": start, "full": now}, now, replace=True)
+            elif now - float(meta.get("checked", 0)) >= self.refresh_s:
+                done = self._complete(ticker)
+                start = (datetime.fromtimestamp(int(done["t"][-self.overlap:][0]), timezone.utc).date()
+                         if len(done) else fr)
+                rows = fetch(start, to)
+                if self._adjusted(done, rows):
+                    meta["full"] = now
+                    self._store(ticker, fetch(date.fromisoformat(covered), to), meta, now, replace=True)
+                else:
+                    self._store(ticker, rows, meta, now, replace=False)
+        return self.load(ticker, since=fr)
+
+_default: Optional[BarStore] = None
+_default_lock = threading.Lock()
+
+def default_store() -> Optional[BarStore]:
+    """Общий store процесса; CAPINTEL_BAR_STORE=0 — отключить (всегда качать из Polygon)."""
+    global _default
+    if os.getenv("CAPINTEL_BAR_STORE", "1").lower() in ("0", "false", "no", "off"):
+        return None
+    with _default_lock:
+        if _default is None or _default.root != default_root():
+            _default = BarStore(refresh_s=float(os.getenv("CAPINTEL_BAR_REFRESH_S", "60")),
+                                overlap=int(os.getenv("CAPINTEL_BAR_OVERLAP", "5")),
+                                adj_tol=float(os.getenv("CAPINTEL_BAR_ADJ_TOL", "1e-4")),
+                                max_age_s=float(os.getenv("CAPINTEL_BAR_MAX_AGE_DAYS", "7")) * DAY_S)
+        return _default
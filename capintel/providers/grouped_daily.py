@@ -0,0 +1,185 @@
+# capintel/providers/grouped_daily.py
+"""
+Массовая загрузка дневных баров всего рынка: один запрос grouped aggs на дату вместо запроса на тикер.
+
+    /v2/aggs/grouped/locale/us/market/stocks/{date}      — акции США
+    /v2/aggs/grouped/locale/global/market/crypto/{date}  — крипта
+
+Ответы по датам разворачиваются в ряды по тикерам и сливаются в bar_store (BarStore.merge).
+Какие даты уже загружены — в манифесте рынка в каталоге store; докачиваются только пропущенные.
+Время бара приводится к конвенции range aggs (_download_daily): начало дня по Нью-Йорку для акций,
+00:00 UTC для крипты — иначе один и тот же день лёг бы в store двумя барами.
+
+    python -m capintel.providers.grouped_daily --market stocks --days 30
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+from capintel.providers import polygon_client as poly
+from capintel.providers.bar_store import BAR_DTYPE, DAY_S, BarStore, default_store
+
+MARKETS = {
+    "stocks": ("locale/us/market/stocks", ZoneInfo("America/New_York")),
+    "crypto": ("locale/global/market/crypto", timezone.utc),
+}
+
+GroupedFetcher = Callable[[str, date], List[Dict[str, Any]]]
+
+
+def grouped_url(market: str, day: date) -> str:
+    return f"{poly.BASE}/v2/aggs/grouped/{MARKETS[market][0]}/{day.isoformat()}?adjusted=true"
+
+def fetch_grouped(market: str, day: date) -> List[Dict[str, Any]]:
+    """results grouped aggs за дату (пустой список — выходной/праздник)."""
+    r = poly._get(poly.get_client(), "aggs_grouped", grouped_url(market, day), timeout=60)  # noqa
+    r.raise_for_status()
+    return (poly._json(r) or {}).get("results") or []  # noqa
+
+def bar_time(market: str, day: date) -> int:
+    """t бара за день (сек) в конвенции range aggs Polygon."""
+    return int(datetime(day.year, day.month, day.day, tzinfo=MARKETS[market][1]).timestamp())
+
+def trading_days(market: str, start: date, end: date) -> List[date]:
+    """Календарь запросов: для акций без сб/вс (праздники отсеются пустым ответом)."""
+    days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+    return [d for d in days if market != "stocks" or d.weekday() < 5]
+
+def pivot_grouped(market: str, by_day: Dict[date, List[Dict[str, Any]]],
+                  tickers: Optional[Iterable[str]] = None) -> Dict[str, np.ndarray]:
+    """{дата: results} → {тикер: бары BAR_DTYPE по возрастанию t}; tickers — ограничить вселенную."""
+    keep = {t.upper() for t in tickers} if tickers is not None else None
+    names: List[str] = []
+    recs: List[tuple] = []
+    for day, results in by_day.items():
+        t = bar_time(market, day)
+        for r in results:
+            name = r.get("T")
+            if not name or (keep is not None and name.upper() not in keep):
+                continue
+            names.append(name.upper())
+            recs.append((t, r["o"], r["h"], r["l"], r["c"], r.get("v") or 0.0))
+    if not recs:
+        return {}
+    rows = np.array(recs, dtype=BAR_DTYPE)
+    names_arr = np.array(names)
+    order = np.lexsort((rows["t"], names_arr))    # по тикеру, внутри — по времени
+    names_arr, rows = names_arr[order], rows[order]
+    cuts = np.flatnonzero(names_arr[1:] != names_arr[:-1]) + 1
+    starts = np.r_[0, cuts]
+    ends = np.r_[cuts, len(rows)]
+    return {str(names_arr[a]): rows[a:b] for a, b in zip(starts, ends)}
+
+
+# ------------------------- манифест загруженных дат -------------------------
+
+def _manifest_path(store: BarStore, market: str) -> str:
+    return os.path.join(store.root, f"grouped-{market}.manifest.json")
+
+def loaded_days(store: BarStore, market: str) -> set:
+    try:
+        with open(_manifest_path(store, market), encoding="utf-8") as fh:
+            return set(json.load(fh).get("days") or [])
+    except (OSError, ValueError):
+        return set()
+
+def _save_days(store: BarStore, market: str, days: set) -> None:
+    path = _manifest_path(store, market)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump({"days": sorted(days)}, fh)
+    os.replace(tmp, path)
+
+def missing_days(store: BarStore, market: str, start: date, end: date) -> List[date]:
+    have = loaded_days(store, market)
+    return [d for d in trading_days(market, start, end) if d.isoformat() not in have]
+
+
+# ------------------------- загрузка -------------------------
+
+def ingest(
+    market: str,
+    start: date,
+    end: date,
+    store: Optional[BarStore] = None,
+    tickers: Optional[Iterable[str]] = None,
+    fetch: Optional[GroupedFetcher] = None,
+    max_workers: int = 4,
+    now: Optional[float] = None,
+) -> Dict[str, Any]:
+    """
+    Докачивает пропущенные даты [start, end] рынка market ("stocks" | "crypto") и сливает бары в store.
+    Дата попадает в манифест, только если день завершился и запрос удался; манифест общий на весь рынок,
+    поэтому загрузка с фильтром tickers его не пишет (иначе остальные тикеры потеряли бы эти дни). Если после загрузки
+    покрыт весь диапазон до вчера — у тикеров в метаданных store отмечается история с start
+    (тогда _fetch_daily_bars не перекачивает её запросом на тикер).
+    Возвращает {"requested", "failed": {дата: ошибка}, "tickers", "bars"}.
+    """
+    store = store or default_store()
+    if store is None:
+        raise RuntimeError("bar_store отключён (CAPINTEL_BAR_STORE=0)")
+    fetch = fetch or fetch_grouped
+    now = time.time() if now is None else now
+    todo = missing_days(store, market, start, end)
+
+    by_day: Dict[date, List[Dict[str, Any]]] = {}
+    failed: Dict[str, str] = {}
+
+    def one(d: date):
+        try:
+            return d, fetch(market, d), None
+        except Exception as e:  # noqa — одна дата не роняет загрузку
+            return d, None, f"{type(e).__name__}: {e}"
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(todo) or 1))) as ex:
+        for d, results, err in ex.map(one, todo):
+            if err is not None:
+                failed[d.isoformat()] = err
+            else:
+                by_day[d] = results
+
+    series = pivot_grouped(market, by_day, tickers)
+    # история непрерывна с start, если все торговые дни [start, вчера] были или загружены сейчас
+    last_day = datetime.fromtimestamp(now, timezone.utc).date() - timedelta(days=1)
+    have = loaded_days(store, market) | {d.isoformat() for d in by_day}
+    complete = end >= last_day and all(d.isoformat() in have for d in trading_days(market, start, last_day))
+    for name, rows in series.items():
+        store.merge(name, rows, covered_from=start if complete else None, now=now)
+
+    done = {d.isoformat() for d in by_day if bar_time(market, d) + DAY_S <= now}
+    if done and tickers is None:
+        _save_days(store, market, loaded_days(store, market) | done)
+    return {"requested": len(todo), "failed": failed, "tickers": len(series),
+            "bars": int(sum(len(r) for r in series.values()))}
+
+def ingest_recent(market: str, days: int = 30, **kw) -> Dict[str, Any]:
+    to = datetime.now(timezone.utc).date()
+    return ingest(market, to - timedelta(days=days), to, **kw)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m capintel.providers.grouped_daily",
+                                 description="Дневные бары всего рынка в локальный bar_store (grouped aggs Polygon).")
+    ap.add_argument("--market", default="stocks", choices=sorted(MARKETS))
+    ap.add_argument("--days", type=int, default=30, help="глубина от сегодня, календарных дней")
+    ap.add_argument("--workers", type=int, default=4, help="одновременных запросов дат")
+    ap.add_argument("--tickers", nargs="*", help="ограничить вселенную")
+    args = ap.parse_args(argv)
+    res = ingest_recent(args.market, args.days, tickers=args.tickers, max_workers=args.workers)
+    sys.stderr.write(f"дат запрошено: {res['requested']}, тикеров: {res['tickers']}, баров: {res['bars']}, "
+                     f"ошибок: {len(res['failed'])}\n")
+    for d, err in sorted(res["failed"].items()):
+        sys.stderr.write(f"  {d}: {err}\n")
+    return 1 if res["failed"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
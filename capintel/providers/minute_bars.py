@@ -0,0 +1,187 @@
+# capintel/providers/minute_bars.py
+"""
+Минутные бары в памяти и ресемплинг из них (5min / 15min / 1h / 4h) — рабочий ТФ для intraday-горизонта.
+На тикер — один запрос минутных aggs Polygon за CAPINTEL_MINUTE_LOOKBACK_DAYS; дальше докачивается только
+хвост с последней минуты (незавершённая минута обновляется), не чаще CAPINTEL_MINUTE_REFRESH_S.
+Ресемплированные ряды кэшируются по таймфрейму; новые минуты пересчитывают только бакеты начиная с того,
+куда попала первая изменённая минута (обычно — последний). Любые таймфреймы — без лишних запросов к Polygon.
+Границы бакетов — от эпохи UTC (как pandas resample(origin="epoch")).
+
+    df = minute_bars.default.bars("equity", "AAPL", "15min")   # o,h,l,c,v с UTC-индексом, как _fetch_daily_bars
+"""
+
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from capintel.providers import polygon_client as poly
+from capintel.providers.bar_store import BAR_DTYPE, DAY_S, rows_from_results
+
+TIMEFRAMES = {"1min": 60, "5min": 300, "15min": 900, "1h": 3600, "4h": 14400}
+# рабочий ТФ горизонта; пусто (CAPINTEL_INTRADAY_TF="") — intraday считается по дневным барам, как раньше
+HORIZON_TF = {"intraday": os.getenv("CAPINTEL_INTRADAY_TF", "15min")}
+
+MinuteFetcher = Callable[[str, int, int], np.ndarray]   # (символ Polygon, от, до — сек UTC) → BAR_DTYPE
+
+
+def download_minutes(symbol: str, fr: int, to: int, max_pages: int = 20) -> np.ndarray:
+    """Минутные aggs за [fr, to] (сек UTC) с переходом по next_url."""
+    url = f"{poly.BASE}/v2/aggs/ticker/{symbol}/range/1/minute/{fr * 1000}/{to * 1000}?adjusted=true&sort=asc&limit=50000"
+    results = []
+    for _ in range(max_pages):
+        r = poly._get(poly.get_client(), "aggs_minute", url, timeout=30)  # noqa
+        r.raise_for_status()
+        data = poly._json(r) or {}  # noqa
+        results += data.get("results") or []
+        url = data.get("next_url")
+        if not url:
+            break
+    return rows_from_results(results)
+
+def aggregate(minutes: np.ndarray, step: int) -> np.ndarray:
+    """Минуты (BAR_DTYPE, по возрастанию t) → бары шага step секунд: o первой, h max, l min, c последней, v сумма."""
+    if not len(minutes):
+        return np.empty(0, dtype=BAR_DTYPE)
+    b = minutes["t"] // step * step
+    starts = np.flatnonzero(np.r_[True, b[1:] != b[:-1]])
+    out = np.empty(len(starts), dtype=BAR_DTYPE)
+    out["t"] = b[starts]
+    out["o"] = minutes["o"][starts]
+    out["h"] = np.maximum.reduceat(minutes["h"], starts)
+    out["l"] = np.minimum.reduceat(minutes["l"], starts)
+    out["c"] = minutes["c"][np.r_[starts[1:], len(minutes)] - 1]
+    out["v"] = np.add.reduceat(minutes["v"], starts)
+    return out
+
+def _frame(rows: np.ndarray) -> pd.DataFrame:
+    df = pd.DataFrame({k: rows[k] for k in ("o", "h", "l", "c", "v")},
+                      index=pd.to_datetime(rows["t"], unit="s", utc=True))
+    df.index.name = "dt"
+    return df
+
+
+class MinuteSeries:
+    """Минуты одного тикера + кэш ресемплированных рядов и DataFrame по таймфреймам."""
+
+    def __init__(self, keep_s: float = 10 * DAY_S):
+        self.rows = np.empty(0, dtype=BAR_DTYPE)
+        self.keep_s = keep_s
+        self.checked: Optional[float] = None   # время последней попытки докачки (часы MinuteBars)
+        self.failed: Optional[Exception] = None  # ошибка последней попытки — повтор не раньше refresh_s
+        self.aggregated = 0           # сколько минут прошло через aggregate (для статистики)
+        self._agg: Dict[str, np.ndarray] = {}
+        self._frames: Dict[str, pd.DataFrame] = {}
+        self._lock = threading.Lock()
+        self.fetch_lock = threading.Lock()
+
+    def extend(self, new: np.ndarray) -> int:
+        """Слить минуты (та же t — новое значение); вернуть число новых/изменённых минут."""
+        new = np.sort(np.asarray(new, dtype=BAR_DTYPE), order="t")
+        if not len(new):
+            return 0
+        with self._lock:
+            first = int(new["t"][0])
+            cut = int(np.searchsorted(self.rows["t"], first))
+            rest = self.rows[cut:]
+            merged = np.concatenate([rest, new])
+            _, idx = np.unique(merged["t"][::-1], return_index=True)   # последняя запись по каждому t
+            merged = merged[::-1][idx]
+            if len(merged) == len(rest) and np.array_equal(merged, rest):
+                return 0
+            n = len(rest)
+            same = merged[:n] == rest
+            k = int(np.argmin(same)) if not same.all() else n   # первая изменённая/новая минута
+            changed_from = int(merged["t"][k])
+            self.rows = np.concatenate([self.rows[:cut], merged])
+            if self.keep_s:
+                self.rows = self.rows[np.searchsorted(self.rows["t"], self.rows["t"][-1] - self.keep_s):]
+            for tf in list(self._agg):
+                self._agg[tf] = self._refresh_tail(tf, changed_from)
+            self._frames.clear()
+            return len(merged) - k
+
+    def _refresh_tail(self, tf: str, changed_from: int) -> np.ndarray:
+        """Пересчитать бакеты tf начиная с того, где первая изменённая минута (вызывать под _lock)."""
+        step = TIMEFRAMES[tf]
+        b0 = changed_from // step * step
+        old = self._agg[tf]
+        head = old[(old["t"] < b0) & (old["t"] >= self.rows["t"][0] // step * step)]
+        tail = self.rows[np.searchsorted(self.rows["t"], b0):]
+        self.aggregated += len(tail)
+        return np.concatenate([head, aggregate(tail, step)])
+
+    def _resample(self, tf: str) -> np.ndarray:
+        """Агрегаты tf из кэша или посчитанные заново (вызывать под _lock)."""
+        agg = self._agg.get(tf)
+        if agg is None:
+            agg = self._agg[tf] = aggregate(self.rows, TIMEFRAMES[tf])
+            self.aggregated += len(self.rows)
+        return agg
+
+    def resample(self, tf: str) -> np.ndarray:
+        with self._lock:
+            return self._resample(tf)
+
+    def frame(self, tf: str) -> pd.DataFrame:
+        # строится и кладётся под тем же _lock, что и extend(): иначе в кэше мог остаться кадр до extend
+        with self._lock:
+            df = self._frames.get(tf)
+            if df is None:
+                df = self._frames[tf] = _frame(self._resample(tf))
+            return df
+
+
+class MinuteBars:
+    """Реестр MinuteSeries по тикерам: первая загрузка за lookback_days, дальше — хвост раз в refresh_s."""
+
+    def __init__(
+        self,
+        fetch: Optional[MinuteFetcher] = None,
+        lookback_days: float = float(os.getenv("CAPINTEL_MINUTE_LOOKBACK_DAYS", "5")),
+        refresh_s: float = float(os.getenv("CAPINTEL_MINUTE_REFRESH_S", "60")),
+        keep_days: float = float(os.getenv("CAPINTEL_MINUTE_KEEP_DAYS", "10")),
+        clock: Callable[[], float] = time.monotonic,
+        wall: Callable[[], float] = time.time,
+    ):
+        self._fetch = fetch or download_minutes
+        self.lookback_s = lookback_days * DAY_S
+        self.refresh_s = float(refresh_s)
+        self.keep_s = keep_days * DAY_S
+        self._clock, self._wall = clock, wall
+        self._series: Dict[str, MinuteSeries] = {}
+        self._guard = threading.Lock()
+
+    def series(self, asset_class: str, ticker: str) -> MinuteSeries:
+        symbol = poly.polygon_symbol(asset_class, ticker)
+        with self._guard:
+            s = self._series.get(symbol)
+            if s is None:
+                s = self._series[symbol] = MinuteSeries(self.keep_s)
+        with s.fetch_lock:
+            now = self._clock()
+            if s.checked is None or now - s.checked >= self.refresh_s:
+                # попытка (и неудачная: нет тарифа, 403, сеть) — не чаще refresh_s
+                to = int(self._wall())
+                fr = int(s.rows["t"][-1]) if len(s.rows) else to - int(self.lookback_s)
+                s.checked = now
+                try:
+                    s.extend(self._fetch(symbol, fr, to))
+                    s.failed = None
+                except Exception as e:  # noqa
+                    s.failed = e
+            if s.failed is not None and not len(s.rows):
+                raise s.failed       # минуток нет совсем; при ошибке докачки отдаём уже загруженные
+        return s
+
+    def bars(self, asset_class: str, ticker: str, tf: str = "15min") -> pd.DataFrame:
+        return self.series(asset_class, ticker).frame(tf)
+
+    def clear(self) -> None:
+        with self._guard:
+            self._series.clear()
+
+default = MinuteBars()
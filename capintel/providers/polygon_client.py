@@ -1,8 +1,16 @@
 
-import os
+from __future__ import annotations
+import os, asyncio, importlib.util, threading, time, weakref
 from datetime import datetime, timedelta, timezone
-from typing import Tuple
-import httpx
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Optional, Tuple, Union
+
+if TYPE_CHECKING:   # httpx (~0.2 c на импорт) грузится при создании первого клиента
+    import httpx
+
+from capintel.cache import TTLCache
+from capintel import metrics
+from capintel.ratelimit import AsyncRateLimiter, RateLimitExceeded
 
 POLYGON_API_KEY = os.getenv("POLYGON_API_KEY") or os.getenv("POLYGON_KEY") or os.getenv("API_KEY")
 BASE = "https://api.polygon.io"
@@ -26,37 +34,327 @@ def _norm_crypto_pair(ticker: str) -> Tuple[str,str]:
         if t.endswith(q) and len(t)>len(q): return t[:-len(q)], q
     return t[:3], t[3:]
 
+def polygon_symbol(asset_class: str, ticker: str) -> str:
+    """Тикер в нотации aggs Polygon: акции — AAPL, крипта — X:BTCUSD."""
+    if asset_class == "crypto":
+        base, quote = _norm_crypto_pair(ticker)
+        return f"X:{base}{quote}"
+    return ticker.upper()
+
+def _json(r: httpx.Response):
+    try:
+        return r.json()
+    except ValueError:
+        return None
+
+def _equity_urls(ticker: str) -> Tuple[str, str]:
+    fr,to = _today_range_utc(48)
+    return (f"{BASE}/v2/last/trade/{ticker.upper()}",
+            f"{BASE}/v2/aggs/ticker/{ticker.upper()}/range/1/minute/{fr}/{to}?adjusted=true&sort=desc&limit=1")
+
+def _crypto_urls(pair: str) -> Tuple[str, str]:
+    base, quote = _norm_crypto_pair(pair)
+    fr,to = _today_range_utc(72)
+    return (f"{BASE}/v1/last/crypto/{base}/{quote}",
+            f"{BASE}/v2/aggs/ticker/X:{base}{quote}/range/1/minute/{fr}/{to}?sort=desc&limit=1")
+
+def _equity_last_price(r: httpx.Response) -> Optional[float]:
+    if r.status_code == 200:
+        data = _json(r)
+        if isinstance(data, dict) and (data.get("results") or {}).get("price") is not None:
+            return float(data["results"]["price"])
+    return None
+
+def _crypto_last_price(r: httpx.Response) -> Optional[float]:
+    if r.status_code == 200:
+        d = _json(r) or {}
+        price = (d.get('last',{}) or {}).get('price') or (d.get('lastTrade',{}) or {}).get('price')
+        if price: return float(price)
+    return None
+
+def _aggs_last_close(r: httpx.Response) -> Optional[float]:
+    res = (_json(r) or {}).get("results") or []
+    return float(res[0].get("c")) if res else None
+
+# ------------------------- пул соединений -------------------------
+# Один клиент на процесс (и один AsyncClient на event loop): keep-alive вместо TCP+TLS на каждый запрос.
+
+_HTTP: Dict[str, Any] = dict(
+    timeout=10.0,
+    max_connections=int(os.getenv("POLYGON_MAX_CONNECTIONS", "100")),
+    max_keepalive_connections=int(os.getenv("POLYGON_MAX_KEEPALIVE", "20")),
+    keepalive_expiry=float(os.getenv("POLYGON_KEEPALIVE_EXPIRY", "30")),
+    http2=os.getenv("POLYGON_HTTP2", "0").lower() in ("1", "true", "yes"),
+    transport=None,   # для тестов: httpx.MockTransport
+)
+_lock = threading.Lock()
+_client: Optional[httpx.Client] = None
+_aclients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+def _client_kwargs() -> Dict[str, Any]:
+    import httpx
+    kw: Dict[str, Any] = dict(
+        timeout=_HTTP["timeout"],
+        limits=httpx.Limits(max_connections=_HTTP["max_connections"],
+                            max_keepalive_connections=_HTTP["max_keepalive_connections"],
+                            keepalive_expiry=_HTTP["keepalive_expiry"]),
+        # HTTP/2 только если установлен пакет h2 (httpx[http2]), иначе тихо остаёмся на HTTP/1.1
+        http2=bool(_HTTP["http2"]) and importlib.util.find_spec("h2") is not None,
+    )
+    if _HTTP["transport"] is not None:
+        kw["transport"] = _HTTP["transport"]
+    return kw
+
+def configure_http(**options) -> None:
+    """Меняет настройки пула (timeout, max_connections, max_keepalive_connections, keepalive_expiry, http2, transport)."""
+    unknown = set(options) - set(_HTTP)
+    if unknown:
+        raise TypeError(f"Неизвестные параметры HTTP: {sorted(unknown)}")
+    close_clients()
+    with _lock:
+        _HTTP.update(options)
+
+def get_client() -> httpx.Client:
+    global _client
+    c = _client
+    if c is None or c.is_closed:
+        import httpx
+        with _lock:
+            if _client is None or _client.is_closed:
+                _client = httpx.Client(**_client_kwargs())
+            c = _client
+    return c
+
+def get_async_client() -> httpx.AsyncClient:
+    loop = asyncio.get_running_loop()
+    c = _aclients.get(loop)
+    if c is None or c.is_closed:
+        import httpx
+        c = _aclients[loop] = httpx.AsyncClient(**_client_kwargs())
+    return c
+
+def close_clients() -> None:
+    """Закрывает синхронный клиент и AsyncClient'ы всех loop'ов (в работающем loop aclose() планируется в нём же)."""
+    global _client
+    with _lock:
+        c, _client = _client, None
+        aclients = list(_aclients.items())
+        _aclients.clear()
+    if c is not None:
+        c.close()
+    for loop, ac in aclients:
+        if loop.is_closed() or ac.is_closed:
+            continue
+        if loop.is_running():
+            asyncio.run_coroutine_threadsafe(ac.aclose(), loop)
+            continue
+        coro = ac.aclose()
+        try:
+            loop.run_until_complete(coro)
+        except RuntimeError:   # в этом потоке уже крутится другой loop — закрыть негде
+            coro.close()
+
+def _forget_clients() -> None:
+    # после fork сокеты родителя не трогаем — дочерний процесс откроет свой пул
+    global _client, _lock
+    _client, _lock = None, threading.Lock()
+    _aclients.clear()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_forget_clients)
+
+async def aclose_clients() -> None:
+    c = _aclients.pop(asyncio.get_running_loop(), None)
+    if c is not None:
+        await c.aclose()
+
+# ------------------------- запросы с метриками -------------------------
+# endpoint — короткое имя эндпоинта (last_trade, last_crypto, aggs_minute, aggs_daily), не URL
+
+def _get(c: httpx.Client, endpoint: str, url: str, **kw) -> httpx.Response:
+    t0 = time.perf_counter()
+    status = "error"
+    try:
+        r = c.get(url, headers=_headers(), **kw)
+        status = r.status_code
+        return r
+    finally:
+        metrics.POLYGON_REQUESTS.inc(endpoint=endpoint, status=status)
+        metrics.POLYGON_LATENCY.observe(time.perf_counter() - t0, endpoint=endpoint)
+
+# async-запросы проходят через общий ограничитель: не больше N в полёте и не быстрее тарифа Polygon
+polygon_limiter = AsyncRateLimiter(
+    max_concurrency=int(os.getenv("POLYGON_MAX_CONCURRENCY", "64")),
+    rate=float(os.getenv("POLYGON_RATE_LIMIT", "0")),          # запросов/сек, 0 — без ограничения
+    burst=float(os.getenv("POLYGON_RATE_BURST")) if os.getenv("POLYGON_RATE_BURST") else None,
+    max_wait=float(os.getenv("POLYGON_MAX_WAIT", "5")),
+    name="polygon",
+)
+
+async def _aget(c: httpx.AsyncClient, endpoint: str, url: str, **kw) -> httpx.Response:
+    headers = _headers()
+    async with polygon_limiter:
+        t0 = time.perf_counter()
+        status = "error"
+        try:
+            r = await c.get(url, headers=headers, **kw)
+            status = r.status_code
+            return r
+        finally:
+            metrics.POLYGON_REQUESTS.inc(endpoint=endpoint, status=status)
+            metrics.POLYGON_LATENCY.observe(time.perf_counter() - t0, endpoint=endpoint)
+
+# ------------------------- цены -------------------------
+
 def last_trade_equity(ticker: str) -> float:
-    url = f"{BASE}/v2/last/trade/{ticker.upper()}"
-    with httpx.Client(timeout=10) as c:
-        r = c.get(url, headers=_headers())
-        if r.status_code == 200:
-            data = r.json()
-            if isinstance(data, dict) and data.get("results", {}).get("price") is not None:
-                return float(data["results"]["price"])
-        fr,to = _today_range_utc(48)
-        url2 = f"{BASE}/v2/aggs/ticker/{ticker.upper()}/range/1/minute/{fr}/{to}?adjusted=true&sort=desc&limit=1"
-        r2 = c.get(url2, headers=_headers()); data2 = r2.json()
-        res = (data2 or {}).get("results") or []
-        if res: return float(res[0].get("c"))
-    raise PolygonError(f"Не удалось получить цену для {ticker}")
+    url, url2 = _equity_urls(ticker)
+    c = get_client()
+    price = _equity_last_price(_get(c, "last_trade", url))
+    if price is None:
+        metrics.POLYGON_FALLBACK.inc(asset_class="equity")
+        price = _aggs_last_close(_get(c, "aggs_minute", url2))
+    if price is None:
+        raise PolygonError(f"Не удалось получить цену для {ticker}")
+    return price
 
 def last_trade_crypto(pair: str) -> float:
-    base, quote = _norm_crypto_pair(pair)
-    url = f"{BASE}/v1/last/crypto/{base}/{quote}"
-    with httpx.Client(timeout=10) as c:
-        r = c.get(url, headers=_headers())
-        if r.status_code == 200:
-            d = r.json()
-            price = (d.get('last',{}) or {}).get('price') or (d.get('lastTrade',{}) or {}).get('price')
-            if price: return float(price)
-        fr,to = _today_range_utc(72)
-        xt = f"X:{base}{quote}"
-        url2 = f"{BASE}/v2/aggs/ticker/{xt}/range/1/minute/{fr}/{to}?sort=desc&limit=1"
-        r2 = c.get(url2, headers=_headers()); d2 = r2.json()
-        res = (d2 or {}).get("results") or []
-        if res: return float(res[0].get("c"))
-    raise PolygonError(f"Не удалось получить цену для {pair}")
+    url, url2 = _crypto_urls(pair)
+    c = get_client()
+    price = _crypto_last_price(_get(c, "last_crypto", url))
+    if price is None:
+        metrics.POLYGON_FALLBACK.inc(asset_class="crypto")
+        price = _aggs_last_close(_get(c, "aggs_minute", url2))
+    if price is None:
+        raise PolygonError(f"Не удалось получить цену для {pair}")
+    return price
 
-def get_last_price(asset_class: str, ticker: str) -> float:
+# ------------------------- таблица цен из WebSocket-потока -------------------------
+# Заполняется capintel.providers.stream; get_last_price сначала смотрит сюда, REST — только если цена устарела.
+
+class LastPriceTable:
+    """
+    {(asset_class, ключ): (цена, t сделки в мс, время приёма по monotonic)}.
+    Запись — одно присваивание кортежа в dict (атомарно под GIL), чтение — без блокировок.
+    Ключ: акции — тикер, крипта — "BASE-QUOTE" (как pair в потоке Polygon).
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self._data: Dict[Tuple[str, str], Tuple[float, int, float]] = {}
+        self._clock = clock
+
+    @staticmethod
+    def key(asset_class: str, ticker: str) -> Tuple[str, str]:
+        if asset_class == "crypto":
+            base, quote = _norm_crypto_pair(ticker)
+            return asset_class, f"{base}-{quote}"
+        return asset_class, ticker.upper()
+
+    def put(self, key: Tuple[str, str], price: float, t_ms: int = 0) -> None:
+        self._data[key] = (float(price), int(t_ms), self._clock())
+
+    def update(self, asset_class: str, ticker: str, price: float, t_ms: int = 0) -> None:
+        self.put(self.key(asset_class, ticker), price, t_ms)
+
+    def get(self, asset_class: str, ticker: str, max_age: float) -> Optional[float]:
+        """Цена, если она пришла не раньше max_age секунд назад, иначе None."""
+        item = self._data.get(self.key(asset_class, ticker))
+        if item is None or self._clock() - item[2] > max_age:
+            return None
+        return item[0]
+
+    def snapshot(self) -> Dict[Tuple[str, str], Tuple[float, int, float]]:
+        return dict(self._data)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+live_prices = LastPriceTable()
+STREAM_MAX_AGE = float(os.getenv("POLYGON_STREAM_MAX_AGE", "10"))
+
+def _live_price(asset_class: str, ticker: str) -> Optional[float]:
+    return live_prices.get(asset_class, ticker, STREAM_MAX_AGE) if len(live_prices) else None
+
+# ------------------------- кэш последней цены -------------------------
+# TTL по классу актива; одновременные запросы одного тикера → один вызов Polygon (single-flight)
+
+PRICE_TTL: Dict[str, float] = {
+    "crypto": float(os.getenv("POLYGON_PRICE_TTL_CRYPTO", "2")),
+    "equity": float(os.getenv("POLYGON_PRICE_TTL_EQUITY", "5")),
+}
+price_cache = TTLCache(maxsize=int(os.getenv("POLYGON_PRICE_CACHE_SIZE", "4096")))
+
+def _fetch_last_price(asset_class: str, ticker: str) -> float:
     return last_trade_equity(ticker) if asset_class=="equity" else last_trade_crypto(ticker)
+
+def get_last_price(asset_class: str, ticker: str) -> float:
+    px = _live_price(asset_class, ticker)
+    if px is not None:
+        return px
+    ttl = PRICE_TTL.get(asset_class, 0.0)
+    if ttl <= 0:
+        return _fetch_last_price(asset_class, ticker)
+    return price_cache.get_or_load((asset_class, ticker.upper()), lambda: _fetch_last_price(asset_class, ticker), ttl)
+
+async def alast_trade_equity(ticker: str) -> float:
+    url, url2 = _equity_urls(ticker)
+    c = get_async_client()
+    price = _equity_last_price(await _aget(c, "last_trade", url))
+    if price is None:
+        metrics.POLYGON_FALLBACK.inc(asset_class="equity")
+        price = _aggs_last_close(await _aget(c, "aggs_minute", url2))
+    if price is None:
+        raise PolygonError(f"Не удалось получить цену для {ticker}")
+    return price
+
+async def alast_trade_crypto(pair: str) -> float:
+    url, url2 = _crypto_urls(pair)
+    c = get_async_client()
+    price = _crypto_last_price(await _aget(c, "last_crypto", url))
+    if price is None:
+        metrics.POLYGON_FALLBACK.inc(asset_class="crypto")
+        price = _aggs_last_close(await _aget(c, "aggs_minute", url2))
+    if price is None:
+        raise PolygonError(f"Не удалось получить цену для {pair}")
+    return price
+
+async def _afetch_last_price(asset_class: str, ticker: str) -> float:
+    return await (alast_trade_equity(ticker) if asset_class=="equity" else alast_trade_crypto(ticker))
+
+async def aget_last_price(asset_class: str, ticker: str) -> float:
+    px = _live_price(asset_class, ticker)
+    if px is not None:
+        return px
+    ttl = PRICE_TTL.get(asset_class, 0.0)
+    if ttl <= 0:
+        return await _afetch_last_price(asset_class, ticker)
+    return await price_cache.aget_or_load((asset_class, ticker.upper()), lambda: _afetch_last_price(asset_class, ticker), ttl)
+
+def get_last_prices(items: Iterable[Tuple[str, str]], max_workers: int = 16) -> Dict[Tuple[str, str], Union[float, Exception]]:
+    """
+    Параллельно тянет цены для пар (asset_class, ticker); дубликаты запрашиваются один раз.
+    Возвращает {(asset_class, TICKER): цена | исключение} — ошибки не прерывают остальные запросы.
+    """
+    keys = list(dict.fromkeys((ac, t.upper()) for ac, t in items))
+    out: Dict[Tuple[str, str], Union[float, Exception]] = {}
+    if not keys:
+        return out
+
+    def one(key):
+        try:
+            return key, get_last_price(*key)
+        except Exception as e:  # noqa — ошибка по одному тикеру не должна ронять батч
+            return key, e
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(keys)))) as ex:
+        for key, res in ex.map(one, keys):
+            out[key] = res
+    return out
+
+async def aget_last_prices(items: Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], Union[float, Exception]]:
+    """Async-вариант get_last_prices: уникальные тикеры параллельно в одном event loop (без потоков)."""
+    keys = list(dict.fromkeys((ac, t.upper()) for ac, t in items))
+    res = await asyncio.gather(*(aget_last_price(*k) for k in keys), return_exceptions=True)
+    return dict(zip(keys, res))
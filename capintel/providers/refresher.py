@@ -0,0 +1,107 @@
+# capintel/providers/refresher.py
+"""
+Фоновое обновление последних цен для наблюдаемых тикеров (REST Polygon через get_last_prices).
+Для Streamlit-приложения: сессии аналитиков делят один процесс и одну таблицу цен — клик читает цену
+из таблицы, а не ждёт Polygon. Тикер попадает в опрос через watch()/price() и выпадает из него,
+если его никто не спрашивал idle_s секунд. Новый тикер обновляется сразу, не дожидаясь interval.
+
+    r = PriceRefresher(interval=5).start()    # фоновый поток
+    r.price("equity", "AAPL")                 # последняя цена или None (ещё не пришла)
+    r.stop()
+"""
+
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional, Tuple, Union
+
+from capintel.providers import polygon_client as poly
+
+Key = Tuple[str, str]   # (asset_class, тикер) — как LastPriceTable.key
+Fetcher = Callable[[Iterable[Key]], Dict[Key, Union[float, Exception]]]
+
+
+class PriceRefresher:
+    def __init__(
+        self,
+        interval: float = float(os.getenv("CAPINTEL_REFRESH_S", "5")),
+        idle_s: float = float(os.getenv("CAPINTEL_REFRESH_IDLE_S", "600")),
+        fetch: Optional[Fetcher] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.interval, self.idle_s = float(interval), float(idle_s)
+        self.table = poly.LastPriceTable(clock=clock)
+        self.errors: Dict[Key, str] = {}
+        self.rounds = 0
+        self.last_error: Optional[str] = None
+        self._fetch = fetch or poly.get_last_prices
+        self._clock = clock
+        self._watched: Dict[Key, float] = {}   # ключ → когда его последний раз спрашивали
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def watch(self, asset_class: str, ticker: str) -> None:
+        key = self.table.key(asset_class, ticker)   # BTCUSD и BTC-USD — один тикер
+        new = key not in self._watched
+        self._watched[key] = self._clock()
+        if new:
+            self._wake.set()
+
+    def price(self, asset_class: str, ticker: str, max_age: float = float("inf")) -> Optional[float]:
+        """Последняя цена из таблицы (не старше max_age c) или None; тикер ставится на наблюдение."""
+        self.watch(asset_class, ticker)
+        return self.table.get(asset_class, ticker, max_age)
+
+    def age(self, asset_class: str, ticker: str) -> Optional[float]:
+        """Сколько секунд назад обновлялась цена (None — ещё не было)."""
+        item = self.table.snapshot().get(self.table.key(asset_class, ticker))
+        return None if item is None else self._clock() - item[2]
+
+    def refresh(self, keys: Optional[Iterable[Key]] = None) -> int:
+        """Один проход опроса (все наблюдаемые или keys); вернуть число обновлённых цен."""
+        if keys is None:
+            now = self._clock()
+            for key, seen in list(self._watched.items()):
+                if now - seen > self.idle_s:
+                    self._watched.pop(key, None)
+            keys = list(self._watched)
+        keys = [self.table.key(ac, t) for ac, t in keys]
+        if not keys:
+            return 0
+        n = 0
+        for key, px in self._fetch(keys).items():
+            if isinstance(px, Exception):
+                self.errors[key] = f"{type(px).__name__}: {px}"
+            else:
+                self.table.update(*key, px)
+                self.errors.pop(key, None)
+                n += 1
+        self.rounds += 1
+        return n
+
+    # ---- фоновый поток ----
+    def _thread_main(self) -> None:
+        while not self._stop.is_set():
+            self._wake.clear()
+            try:
+                self.refresh()
+                self.last_error = None
+            except Exception as e:  # noqa — поток не должен умирать из-за сети
+                self.last_error = f"{type(e).__name__}: {e}"
+            self._wake.wait(self.interval)
+
+    def start(self) -> "PriceRefresher":
+        if self._thread is not None and self._thread.is_alive():
+            return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._thread_main, name="price-refresher", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
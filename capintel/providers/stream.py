@@ -0,0 +1,172 @@
+# capintel/providers/stream.py
+"""
+Поток сделок Polygon по WebSocket → таблица последних цен в памяти (polygon_client.live_prices).
+get_last_price / aget_last_price / `/price` отвечают из таблицы, пока цена свежее POLYGON_STREAM_MAX_AGE,
+иначе — обычный REST. Нужен пакет websockets (опционально).
+
+Протокол: connected → {"action":"auth"} → auth_success → {"action":"subscribe","params":"T.AAPL,..."};
+события приходят JSON-массивами: акции — ev "T" (sym, p, t), крипта — ev "XT" (pair, p, t).
+Обрыв → переподключение с экспоненциальной задержкой (джиттер), после успешной авторизации задержка сбрасывается.
+
+    s = PriceStream("equity", ["AAPL", "MSFT"]).start()    # фоновый поток со своим event loop
+    ...
+    s.stop()
+"""
+
+import asyncio
+import json
+import os
+import random
+import threading
+from typing import Iterable, List, Optional, Tuple
+
+from capintel import metrics
+from capintel.providers import polygon_client as poly
+
+URLS = {
+    "equity": os.getenv("POLYGON_WS_URL_STOCKS", "wss://socket.polygon.io/stocks"),
+    "crypto": os.getenv("POLYGON_WS_URL_CRYPTO", "wss://socket.polygon.io/crypto"),
+}
+_EVENT = {"equity": "T", "crypto": "XT"}
+
+MESSAGES = metrics.Counter("capintel_stream_trades_total", "Сделки, принятые из WebSocket-потока", ["asset_class"])
+RECONNECTS = metrics.Counter("capintel_stream_reconnects_total", "Переподключения WebSocket-потока", ["asset_class"])
+
+
+def _channel(asset_class: str, ticker: str) -> str:
+    key = poly.LastPriceTable.key(asset_class, ticker)[1]
+    return f"{_EVENT[asset_class]}.{key}"
+
+
+class PriceStream:
+    def __init__(
+        self,
+        asset_class: str,
+        tickers: Iterable[str],
+        url: Optional[str] = None,
+        table: Optional[poly.LastPriceTable] = None,
+        backoff: Tuple[float, float] = (0.5, 30.0),
+    ):
+        self.asset_class = asset_class
+        self.tickers: List[str] = list(dict.fromkeys(t.upper() for t in tickers))
+        self.url = url or URLS[asset_class]
+        self.table = table if table is not None else poly.live_prices
+        self.backoff = backoff
+        self.connected = False
+        self.reconnects = 0
+        self.trades = 0
+        self.last_error: Optional[str] = None
+        self._ws = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+        self._msg_counter = MESSAGES.labels(asset_class=asset_class)
+
+    # ---- разбор сообщений ----
+    def handle(self, raw) -> None:
+        events = json.loads(raw)
+        if isinstance(events, dict):
+            events = [events]
+        ev_name = _EVENT[self.asset_class]
+        put, ac, n = self.table.put, self.asset_class, 0
+        for ev in events:
+            if ev.get("ev") == ev_name:
+                put((ac, ev["sym"] if ac == "equity" else ev["pair"]), ev["p"], ev.get("t") or 0)
+                n += 1
+        if n:
+            self.trades += n
+            self._msg_counter.inc(n)
+
+    async def _handshake(self, ws) -> None:
+        await ws.send(json.dumps({"action": "auth", "params": poly.POLYGON_API_KEY or ""}))
+        while True:
+            for ev in json.loads(await ws.recv()):
+                if ev.get("ev") != "status":
+                    continue
+                if ev.get("status") == "auth_success":
+                    if self.tickers:
+                        await ws.send(json.dumps({"action": "subscribe",
+                                                  "params": ",".join(_channel(self.asset_class, t) for t in self.tickers)}))
+                    return
+                if ev.get("status") == "auth_failed":
+                    raise poly.PolygonError(ev.get("message") or "WebSocket: auth_failed")
+
+    # ---- основной цикл ----
+    async def run(self) -> None:
+        try:
+            import websockets
+        except ImportError as e:  # pragma: no cover
+            raise RuntimeError("Для потока цен нужен пакет websockets (pip install websockets)") from e
+
+        delay = self.backoff[0]
+        while True:
+            try:
+                async with websockets.connect(self.url, open_timeout=10, ping_interval=20, max_queue=1024) as ws:
+                    await self._handshake(ws)
+                    self._ws, self.connected, self.last_error = ws, True, None
+                    delay = self.backoff[0]
+                    async for raw in ws:
+                        self.handle(raw)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:  # noqa — любой обрыв/ошибка → переподключение
+                self.last_error = f"{type(e).__name__}: {e}"
+            finally:
+                self._ws, self.connected = None, False
+            self.reconnects += 1
+            RECONNECTS.inc(asset_class=self.asset_class)
+            await asyncio.sleep(delay * (0.5 + random.random() / 2))
+            delay = min(delay * 2, self.backoff[1])
+
+    async def subscribe(self, tickers: Iterable[str]) -> None:
+        new = [t.upper() for t in tickers if t.upper() not in self.tickers]
+        self.tickers += new
+        if new and self._ws is not None:
+            await self._ws.send(json.dumps({"action": "subscribe",
+                                            "params": ",".join(_channel(self.asset_class, t) for t in new)}))
+
+    # ---- фоновый поток ----
+    def start(self) -> "PriceStream":
+        if self._thread is not None and self._thread.is_alive():
+            return self
+        self._ready.clear()
+        self._thread = threading.Thread(target=self._thread_main, name=f"polygon-stream-{self.asset_class}", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def _thread_main(self) -> None:
+        loop = self._loop = asyncio.new_event_loop()
+        self._task = loop.create_task(self.run())
+        self._ready.set()
+        try:
+            loop.run_until_complete(self._task)
+        except (asyncio.CancelledError, Exception):  # noqa
+            pass
+        finally:
+            loop.close()
+
+    def add(self, tickers: Iterable[str]) -> None:
+        """Добавить тикеры в подписку из любого потока."""
+        if self._loop is not None and self._loop.is_running():
+            asyncio.run_coroutine_threadsafe(self.subscribe(tickers), self._loop).result(timeout=10)
+        else:
+            self.tickers += [t.upper() for t in tickers if t.upper() not in self.tickers]
+
+    def stop(self, timeout: float = 5.0) -> None:
+        if self._loop is not None and self._task is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._task.cancel)
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+
+
+def start_from_env() -> List[PriceStream]:
+    """POLYGON_STREAM_EQUITY="AAPL,MSFT" / POLYGON_STREAM_CRYPTO="BTC-USD,ETHUSDT" → запущенные потоки."""
+    streams = []
+    for ac, var in (("equity", "POLYGON_STREAM_EQUITY"), ("crypto", "POLYGON_STREAM_CRYPTO")):
+        tickers = [t.strip() for t in os.getenv(var, "").split(",") if t.strip()]
+        if tickers:
+            streams.append(PriceStream(ac, tickers).start())
+    return streams
@@ -0,0 +1,102 @@
+# capintel/ratelimit.py
+"""
+Ограничитель исходящих запросов для asyncio: семафор (одновременно в полёте) + token bucket (запросов/сек).
+Ожидание в очереди ограничено max_wait: если слот или токен не достанется вовремя — RateLimitExceeded
+(API отдаёт 429), а не бесконечная очередь корутин.
+
+    async with polygon_limiter:
+        r = await client.get(url)
+"""
+
+import asyncio
+import threading
+import time
+import weakref
+from typing import Callable, Optional
+
+from capintel import metrics
+
+QUEUE_SECONDS = metrics.Histogram("capintel_ratelimit_queue_seconds", "Ожидание слота/токена перед запросом",
+                                  ["limiter"], buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0))
+REJECTED = metrics.Counter("capintel_ratelimit_rejected_total", "Отказы ограничителя (reason: concurrency | rate)",
+                           ["limiter", "reason"])
+
+
+class RateLimitExceeded(RuntimeError):
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AsyncRateLimiter:
+    """
+    max_concurrency — запросов в полёте на event loop; rate — токенов в секунду (<=0 — без ограничения),
+    burst — ёмкость ведра; max_wait — сколько секунд запрос может ждать в очереди в сумме.
+    Ведро общее для процесса (потокобезопасно), семафор — свой на каждый event loop.
+    """
+
+    def __init__(self, max_concurrency: int = 64, rate: float = 0.0, burst: Optional[float] = None,
+                 max_wait: float = 5.0, name: str = "default", clock: Callable[[], float] = time.monotonic):
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.rate = float(rate)
+        self.burst = float(burst) if burst is not None else max(1.0, self.rate)
+        self.max_wait = float(max_wait)
+        self.name = name
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._tokens = self.burst
+        self._t = clock()
+        self._sems: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+        self._queue_t = QUEUE_SECONDS.labels(limiter=name)
+
+    def _sem(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        sem = self._sems.get(loop)
+        if sem is None:
+            sem = self._sems[loop] = asyncio.Semaphore(self.max_concurrency)
+        return sem
+
+    def _reserve(self, budget: float) -> float:
+        """Берёт токен (в долг, если ведро пусто) и возвращает, сколько ждать; дольше budget — отказ."""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._t) * self.rate)
+            self._t = now
+            wait = (1.0 - self._tokens) / self.rate if self._tokens < 1.0 else 0.0
+            if wait > budget:
+                raise self._reject("rate", wait)
+            self._tokens -= 1.0
+            return wait
+
+    def _reject(self, reason: str, retry_after: float) -> RateLimitExceeded:
+        REJECTED.inc(limiter=self.name, reason=reason)
+        return RateLimitExceeded(f"Превышен лимит запросов к upstream ({reason})", retry_after=max(retry_after, 0.001))
+
+    async def acquire(self) -> None:
+        t0 = self._clock()
+        sem = self._sem()
+        try:
+            await asyncio.wait_for(sem.acquire(), timeout=self.max_wait)
+        except asyncio.TimeoutError:
+            raise self._reject("concurrency", self.max_wait) from None
+        try:
+            wait = self._reserve(self.max_wait - (self._clock() - t0))
+            if wait > 0:
+                await asyncio.sleep(wait)
+        except BaseException:
+            sem.release()
+            raise
+        self._queue_t.observe(self._clock() - t0)
+
+    def release(self) -> None:
+        self._sem().release()
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc):
+        self.release()
+        return False
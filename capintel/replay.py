@@ -0,0 +1,204 @@
+# capintel/replay.py
+"""
+Историческая прогонка (walk-forward) стратегии my_strategy бар за баром.
+На каждом баре правила (my_strategy.decide) видят только уже закрытые данные:
+индикаторы обновляются потоково (IndicatorSet, O(1) на бар), пивоты — по инкрементальным
+трекерам периодов W/M/Y. Никаких повторных загрузок и пересчётов всей истории.
+Модель исполнения: вход по close сигнального бара, дальше по H/L следующих баров —
+стоп (проверяется первым, консервативно), цель (TP1 или TP2), либо выход по close через max_hold баров.
+"""
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from capintel.strategy import my_strategy as ms
+from capintel.strategy.indicators import IndicatorSet
+
+TRADE_COLUMNS = ["entry_time", "exit_time", "action", "confidence", "entry", "exit", "tp", "stop",
+                 "outcome", "bars_held", "pnl"]
+SIGNAL_COLUMNS = ["time", "action", "confidence", "entry", "tp1", "tp2", "stop"]
+
+
+class PeriodTracker:
+    """HLC последнего завершённого периода (как _last_complete_period_hlc), обновление за O(1)."""
+    __slots__ = ("cur", "h", "l", "c", "prev", "piv", "tail")
+
+    def __init__(self, period: str):
+        self.cur: Optional[int] = None
+        self.h = self.l = self.c = 0.0
+        self.prev: Optional[Tuple[float, float, float]] = None
+        self.piv: Optional[Dict[str, float]] = None
+        self.tail: deque = deque(maxlen={"W": 5, "M": 22, "Y": 252}[period])   # fallback, пока нет периода
+
+    def update(self, pid: int, h: float, l: float, c: float) -> None:
+        if pid != self.cur:
+            if self.cur is not None:
+                self.prev = (self.h, self.l, self.c)
+                self.piv = ms._fibo_pivots(*self.prev)
+            self.cur, self.h, self.l, self.c = pid, h, l, c
+        else:
+            self.h, self.l, self.c = max(self.h, h), min(self.l, l), c
+        if self.prev is None:
+            self.tail.append((h, l, c))
+
+    def pivots(self) -> Dict[str, float]:
+        if self.piv is not None:
+            return self.piv
+        hs, ls, cs = zip(*self.tail)
+        return ms._fibo_pivots(max(hs), min(ls), cs[-1])
+
+
+def _period_ids(index: pd.DatetimeIndex, period: str) -> np.ndarray:
+    naive = index.tz_convert(None) if index.tz is not None else index
+    return naive.to_period(ms._PERIOD_FREQ[period]).asi8
+
+
+def _exit(action: str, h: float, l: float, tp: float, stop: float) -> Optional[Tuple[str, float]]:
+    if action == "BUY":
+        if l <= stop: return "stop", stop
+        if h >= tp:   return "tp", tp
+    else:
+        if h >= stop: return "stop", stop
+        if l <= tp:   return "tp", tp
+    return None
+
+
+def replay(
+    daily: pd.DataFrame,
+    horizon: str = "swing",
+    bars: Optional[pd.DataFrame] = None,
+    warmup: int = 50,
+    max_hold: int = 20,
+    target: str = "tp1",
+    fee_bp: float = 2.0,
+    record_all: bool = False,
+    params: Optional[Dict[str, Any]] = None,
+    trade: bool = True,
+) -> Dict[str, Any]:
+    """
+    daily — дневные бары (для пивотов); bars — рабочий ТФ (по умолчанию те же дневные).
+    Возвращает {"signals": DataFrame, "trades": DataFrame, "summary": dict}.
+    record_all=False — в signals только BUY/SHORT; trade=False — только сигналы на каждом баре, без позиций.
+    """
+    work = ms._standardize_bars(daily if bars is None else bars)
+    d = ms._standardize_bars(daily)
+    p, p_hi = ms._PIVOT_PERIODS[horizon]
+    periods = [p] + ([p_hi] if p_hi else [])
+    trackers = {q: PeriodTracker(q) for q in periods}
+    pids = {q: _period_ids(d.index, q) for q in periods}
+    dt, dh, dl, dc = d.index.asi8, d["h"].to_numpy(), d["l"].to_numpy(), d["c"].to_numpy()
+    wt = work.index.asi8
+    wo, wh, wl, wc = (work[k].to_numpy() for k in ("o", "h", "l", "c"))
+    tp_idx = 0 if target == "tp1" else 1
+    fee = fee_bp / 10000.0
+    # ленивые квантили RSI верны, только пока пороги не уже [30, 70] (см. IndicatorSet.features)
+    lazy = params is None or (params.get("rsi_hi", 70.0) >= 70.0 and params.get("rsi_lo", 30.0) <= 30.0)
+
+    ind = IndicatorSet()
+    signals: List[tuple] = []
+    trades: List[tuple] = []
+    pos: Optional[Dict[str, Any]] = None
+    j = 0
+    for i in range(len(work)):
+        while j < len(d) and dt[j] <= wt[i]:
+            for q in periods:
+                trackers[q].update(int(pids[q][j]), dh[j], dl[j], dc[j])
+            j += 1
+        o, h, l, c = float(wo[i]), float(wh[i]), float(wl[i]), float(wc[i])
+        ind.update(o, h, l, c)
+
+        if pos is not None:
+            hit = _exit(pos["action"], h, l, pos["tp"], pos["stop"])
+            if hit is None and i - pos["i"] >= max_hold:
+                hit = ("timeout", c)
+            if hit is not None:
+                outcome, px = hit
+                pnl = (px - pos["entry"]) / pos["entry"] if pos["action"] == "BUY" else (pos["entry"] - px) / pos["entry"]
+                trades.append((work.index[pos["i"]], work.index[i], pos["action"], pos["confidence"], pos["entry"],
+                               px, pos["tp"], pos["stop"], outcome, i - pos["i"], pnl - fee))
+                pos = None
+            continue   # в день выхода новых входов не ищем
+
+        if ind.n < warmup or j == 0:
+            continue
+        piv = trackers[p].pivots()
+        piv_hi = trackers[p_hi].pivots() if p_hi else piv
+        spec = ms.decide(horizon, c, piv, piv_hi, ind.features(lazy=lazy), params)
+        action = spec["action"]
+        if action in ("BUY", "SHORT") or record_all:
+            tp1, tp2 = spec["take_profit"]
+            signals.append((work.index[i], action, spec["confidence"], spec["entry"], tp1, tp2, spec["stop"]))
+        if trade and action in ("BUY", "SHORT"):
+            pos = dict(i=i, action=action, confidence=spec["confidence"], entry=spec["entry"],
+                       tp=spec["take_profit"][tp_idx], stop=spec["stop"])
+
+    if pos is not None:   # незакрытая позиция — помечаем «open» по последнему close
+        px = float(wc[-1])
+        pnl = (px - pos["entry"]) / pos["entry"] if pos["action"] == "BUY" else (pos["entry"] - px) / pos["entry"]
+        trades.append((work.index[pos["i"]], work.index[-1], pos["action"], pos["confidence"], pos["entry"],
+                       px, pos["tp"], pos["stop"], "open", len(work) - 1 - pos["i"], pnl - fee))
+
+    tr = pd.DataFrame(trades, columns=TRADE_COLUMNS)
+    return {"signals": pd.DataFrame(signals, columns=SIGNAL_COLUMNS), "trades": tr, "summary": summarize(tr)}
+
+
+def summarize(trades: pd.DataFrame) -> Dict[str, Any]:
+    closed = trades[trades["outcome"] != "open"]
+    n = len(closed)
+    return {
+        "trades": n,
+        "hit_rate": float((closed["outcome"] == "tp").mean()) if n else 0.0,
+        "stop_rate": float((closed["outcome"] == "stop").mean()) if n else 0.0,
+        "win_rate": float((closed["pnl"] > 0).mean()) if n else 0.0,
+        "mean_pnl": float(closed["pnl"].mean()) if n else 0.0,
+        "total_pnl": float(closed["pnl"].sum()) if n else 0.0,
+        "avg_bars_held": float(closed["bars_held"].mean()) if n else 0.0,
+    }
+
+
+def _replay_one(args) -> Tuple[str, Dict[str, Any]]:
+    ticker, daily, kw = args
+    try:
+        return ticker, replay(daily, **kw)
+    except Exception as e:  # noqa — один тикер не роняет прогон
+        return ticker, {"error": f"{type(e).__name__}: {e}"}
+
+
+def replay_universe(
+    frames: Dict[str, pd.DataFrame],
+    horizon: str = "swing",
+    workers: Optional[int] = 0,
+    **kw,
+) -> Dict[str, Any]:
+    """
+    frames: {тикер: дневные бары}. workers=0 — последовательно, None — пул по числу ядер.
+    Возвращает {"trades": все сделки с колонкой ticker, "signals": ..., "summary": DataFrame по тикерам}.
+    """
+    kw["horizon"] = horizon
+    jobs = [(t, df, kw) for t, df in frames.items()]
+    if workers == 0:
+        results = [_replay_one(j) for j in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            results = list(ex.map(_replay_one, jobs, chunksize=max(1, len(jobs) // 64)))
+
+    trades, signals, summary = [], [], []
+    for t, r in results:
+        if "error" in r:
+            summary.append({"ticker": t, "error": r["error"]})
+            continue
+        trades.append(r["trades"].assign(ticker=t))
+        signals.append(r["signals"].assign(ticker=t))
+        summary.append({"ticker": t, **r["summary"], "error": None})
+    cat = lambda xs, cols: pd.concat(xs, ignore_index=True) if xs else pd.DataFrame(columns=cols + ["ticker"])
+    return {"trades": cat(trades, TRADE_COLUMNS), "signals": cat(signals, SIGNAL_COLUMNS),
+            "summary": pd.DataFrame(summary)}
+
+
+def load_history(items: Iterable[Tuple[str, str]], days: int = 520) -> Dict[str, pd.DataFrame]:
+    """Дневные бары для [(ticker, asset_class)] через _fetch_daily_bars (локальный bar_store)."""
+    return {t.upper(): ms._fetch_daily_bars(ac, t, days=days) for t, ac in items}
@@ -0,0 +1,159 @@
+# capintel/scan.py
+"""
+Сканер вселенной: generate_signal_core по списку тикеров в пуле процессов.
+Одновременные запросы к Polygon ограничены общим семафором; ошибка по тикеру → строка с error, скан продолжается.
+
+    python -m capintel.scan AAPL MSFT NVDA --horizon swing --out scan.csv
+    python -m capintel.scan --file universe.txt --workers 8 --max-fetch 6 --out scan.parquet
+"""
+
+import argparse
+import multiprocessing as mp
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import nullcontext
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+from capintel.providers import polygon_client as poly
+from capintel.strategy import my_strategy as ms
+
+COLUMNS = ["ticker", "asset_class", "horizon", "last_price", "action", "entry",
+           "tp1", "tp2", "stop", "confidence", "error"]
+
+Item = Tuple[str, str]   # (ticker, asset_class)
+Progress = Callable[[int, int, Dict[str, Any]], None]
+DailyFetcher = Callable[..., pd.DataFrame]   # (asset_class, ticker, days=) → дневные бары, как ms._fetch_daily_bars
+
+_fetch_sem = None   # семафор на процесс-воркер (см. _init_worker)
+
+def _init_worker(sem) -> None:
+    global _fetch_sem
+    _fetch_sem = sem
+
+def scan_one(item: Item, horizon: str = "swing", price_source: str = "close",
+             fetch_daily: Optional[DailyFetcher] = None) -> Dict[str, Any]:
+    ticker, asset_class = item
+    row: Dict[str, Any] = dict.fromkeys(COLUMNS)
+    row.update(ticker=ticker.upper(), asset_class=asset_class, horizon=horizon)
+    limit = _fetch_sem if _fetch_sem is not None else nullcontext()
+    try:
+        with limit:
+            daily = (fetch_daily or ms._fetch_daily_bars)(asset_class, ticker, days=520)
+            bars = ms._horizon_bars(asset_class, ticker, horizon)
+        if daily.empty:
+            raise poly.PolygonError(f"Нет дневных баров для {ticker}")
+        if price_source == "live":
+            with limit:
+                price = poly.get_last_price(asset_class, ticker)
+        else:
+            price = float(daily["c"].iloc[-1])
+        spec = ms.generate_signal_core(ticker, asset_class, horizon, price, bars=bars, daily=daily)
+        row.update(last_price=price, action=spec["action"], entry=spec["entry"],
+                   tp1=spec["take_profit"][0], tp2=spec["take_profit"][1],
+                   stop=spec["stop"], confidence=spec["confidence"])
+    except Exception as e:  # noqa — один тикер не роняет скан
+        row["error"] = f"{type(e).__name__}: {e}"
+    return row
+
+def scan_universe(
+    items: Iterable[Item],
+    horizon: str = "swing",
+    workers: Optional[int] = None,
+    max_fetch: int = 8,
+    price_source: str = "close",
+    progress: Optional[Progress] = None,
+    fetch_daily: Optional[DailyFetcher] = None,
+) -> pd.DataFrame:
+    """
+    items: [(ticker, asset_class)]. workers=0 — в текущем процессе (отладка), None — по числу ядер.
+    fetch_daily — свой загрузчик дневных баров (по умолчанию ms._fetch_daily_bars); для пула он передаётся
+    воркерам явно, поэтому должен быть функцией уровня модуля (pickle).
+    Результат — DataFrame в порядке входа, колонки COLUMNS.
+    """
+    items = list(items)
+    n = len(items)
+    rows: List[Optional[Dict[str, Any]]] = [None] * n
+
+    def done(i: int, row: Dict[str, Any], k: int) -> None:
+        rows[i] = row
+        if progress:
+            progress(k, n, row)
+
+    if workers == 0:
+        for i, it in enumerate(items):
+            done(i, scan_one(it, horizon, price_source, fetch_daily), i + 1)
+    else:
+        sem = mp.get_context().Semaphore(max(1, int(max_fetch)))
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count(),
+                                 initializer=_init_worker, initargs=(sem,)) as ex:
+            futs = {ex.submit(scan_one, it, horizon, price_source, fetch_daily): i for i, it in enumerate(items)}
+            for k, f in enumerate(as_completed(futs), 1):
+                i = futs[f]
+                try:
+                    row = f.result()
+                except Exception as e:  # упал сам воркер (BrokenProcessPool и т.п.)
+                    row = dict.fromkeys(COLUMNS)
+                    row.update(ticker=items[i][0].upper(), asset_class=items[i][1], horizon=horizon,
+                               error=f"{type(e).__name__}: {e}")
+                done(i, row, k)
+    return pd.DataFrame(rows, columns=COLUMNS)
+
+def write_table(df: pd.DataFrame, out: str) -> None:
+    if out == "-":
+        df.to_csv(sys.stdout, index=False)
+    elif out.endswith(".parquet"):
+        df.to_parquet(out, index=False)   # нужен pyarrow
+    else:
+        df.to_csv(out, index=False)
+
+def read_watchlist(path: str, default_class: str) -> List[Item]:
+    """Строки «TICKER» или «TICKER,asset_class»; пустые и # — пропуск."""
+    items: List[Item] = []
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            parts = [p.strip() for p in line.split(",")]
+            items.append((parts[0], parts[1] if len(parts) > 1 and parts[1] else default_class))
+    return items
+
+def _print_progress(k: int, n: int, row: Dict[str, Any]) -> None:
+    status = row["action"] if row["error"] is None else "ERR"
+    sys.stderr.write(f"\r[{k}/{n}] {row['ticker']:<12} {status:<6}")
+    if k == n:
+        sys.stderr.write("\n")
+    sys.stderr.flush()
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m capintel.scan", description="Скан списка тикеров стратегией Pivot+HA+MACD+RSI.")
+    ap.add_argument("tickers", nargs="*", help="тикеры (класс — из --asset-class)")
+    ap.add_argument("--file", help="watchlist: TICKER[,asset_class] в строке")
+    ap.add_argument("--asset-class", default="equity", choices=["equity", "crypto"])
+    ap.add_argument("--horizon", default="swing", choices=["intraday", "swing", "position"])
+    ap.add_argument("--workers", type=int, default=None, help="процессов (0 — без пула)")
+    ap.add_argument("--max-fetch", type=int, default=8, help="одновременных запросов к Polygon")
+    ap.add_argument("--price", default="close", choices=["close", "live"], help="цена: последний close или live из Polygon")
+    ap.add_argument("--out", default="-", help="файл .csv / .parquet или '-' (stdout)")
+    ap.add_argument("--quiet", action="store_true")
+    args = ap.parse_args(argv)
+
+    items: List[Item] = [(t, args.asset_class) for t in args.tickers]
+    if args.file:
+        items += read_watchlist(args.file, args.asset_class)
+    if not items:
+        ap.error("нужны тикеры или --file")
+
+    df = scan_universe(items, args.horizon, args.workers, args.max_fetch, args.price,
+                       progress=None if args.quiet else _print_progress)
+    write_table(df, args.out)
+    n_err = int(df["error"].notna().sum())
+    if not args.quiet:
+        sys.stderr.write(f"готово: {len(df) - n_err} ок, {n_err} ошибок\n")
+    return 0 if n_err < len(df) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
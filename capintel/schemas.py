@@ -1,12 +1,15 @@
 
+from dataclasses import dataclass
 from pydantic import BaseModel, Field, validator
-from typing import List, Literal
+from typing import Any, Dict, List, Literal, Tuple
 from datetime import datetime
 
 Action = Literal["BUY", "SHORT", "CLOSE", "WAIT"]
 Horizon = Literal["intraday", "swing", "position"]
 AssetClass = Literal["crypto", "equity"]
 
+DISCLAIMER = "Не инвестиционный совет. Торговля сопряжена с риском."
+
 class SignalAlternative(BaseModel):
     if_condition: str
     action: Action
@@ -29,8 +32,56 @@ class Signal(BaseModel):
     expires_at: datetime
     narrative_ru: str
     alternatives: List[SignalAlternative] = []
-    disclaimer: str = "Не инвестиционный совет. Торговля сопряжена с риском."
+    disclaimer: str = DISCLAIMER
 
     @validator("take_profit")
     def tp_sorted(cls, v):
         return sorted(v)
+
+
+# ---- внутреннее представление: движок работает с записями без валидации, Signal — только на границе API ----
+
+@dataclass(frozen=True, slots=True)
+class AltRecord:
+    if_condition: str
+    action: str
+    entry: float
+    take_profit: Tuple[float, ...]
+    stop: float
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"if_condition": self.if_condition, "action": self.action, "entry": self.entry,
+                "take_profit": list(self.take_profit), "stop": self.stop}
+
+@dataclass(frozen=True, slots=True)
+class SignalRecord:
+    """Поля как у Signal; take_profit уже отсортирован (то же, что делает tp_sorted)."""
+    id: str
+    ticker: str
+    asset_class: str
+    horizon: str
+    action: str
+    entry: float
+    take_profit: Tuple[float, ...]
+    stop: float
+    confidence: float
+    position_size_pct_nav: float
+    created_at: datetime
+    expires_at: datetime
+    narrative_ru: str
+    alternatives: Tuple[AltRecord, ...] = ()
+    disclaimer: str = DISCLAIMER
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Как Signal.dict(): datetime остаются объектами (JSON — через capintel.jsonfast.dumps)."""
+        return {
+            "id": self.id, "ticker": self.ticker, "asset_class": self.asset_class, "horizon": self.horizon,
+            "action": self.action, "entry": self.entry, "take_profit": list(self.take_profit), "stop": self.stop,
+            "confidence": self.confidence, "position_size_pct_nav": self.position_size_pct_nav,
+            "created_at": self.created_at, "expires_at": self.expires_at, "narrative_ru": self.narrative_ru,
+            "alternatives": [a.to_dict() for a in self.alternatives], "disclaimer": self.disclaimer,
+        }
+
+    def to_model(self) -> Signal:
+        """Валидированный Signal (ответ API, вход бэктеста по HTTP)."""
+        return Signal(**self.to_dict())
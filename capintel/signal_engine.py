@@ -1,13 +1,24 @@
 
 import hashlib, random
+from dataclasses import replace
 from datetime import datetime, timedelta
 from typing import Tuple, List
-from .schemas import Signal, SignalAlternative, AssetClass, Horizon
+from .schemas import Signal, SignalRecord, AltRecord, AssetClass, Horizon
 from .risk import target_vol_position_size, sanitize_levels
 from .narrator import trader_tone_narrative_ru
+from . import metrics
+from . import cache
+from .cache import TTLCache, price_bucket
 
-def _daily_seed(key: str) -> int:
-    today = datetime.utcnow().strftime("%Y-%m-%d")
+# build_signal детерминирован для (тикер, класс, горизонт, день сида, цена) → мемо с TTL/LRU (настройки — в cache).
+# Смена дня меняет ключ (и сид); id / created_at / expires_at проставляются на каждый вызов.
+signal_cache = TTLCache(maxsize=cache.SIGNAL_CACHE_SIZE, ttl=cache.SIGNAL_CACHE_TTL)
+
+def _seed_day() -> str:
+    return datetime.utcnow().strftime("%Y-%m-%d")
+
+def _daily_seed(key: str, today: str = None) -> int:
+    today = today or _seed_day()
     s = hashlib.sha256((key + today).encode()).hexdigest()
     return int(s[:8], 16)
 
@@ -41,7 +52,7 @@ def gen_confidence(seed: int, action: str) -> float:
     conf = max(0.50, min(0.90, base + random.uniform(-0.05, 0.08)))
     return round(conf, 2)
 
-def alternative_scenario(action: str, entry: float, buffer_bp: int) -> SignalAlternative:
+def alternative_scenario(action: str, entry: float, buffer_bp: int) -> AltRecord:
     bp = buffer_bp/10000.0
     if action == "BUY":
         alt_action="BUY"; alt_entry=round(entry*(1+0.6*bp),4)
@@ -56,11 +67,33 @@ def alternative_scenario(action: str, entry: float, buffer_bp: int) -> SignalAlt
         tp1=round(alt_entry*(1+1.0*bp),4); tp2=round(alt_entry*(1+2.0*bp),4); stop=round(alt_entry*(1-1.0*bp),4)
         cond=f"если цена вырвется выше ~{round(entry*(1+0.7*bp),4)}"
     tp1,tp2,stop = sanitize_levels(alt_action, alt_entry, tp1, tp2, stop)
-    return SignalAlternative(if_condition=cond, action=alt_action, entry=alt_entry, take_profit=[tp1,tp2], stop=stop)
+    return AltRecord(if_condition=cond, action=alt_action, entry=alt_entry, take_profit=(tp1,tp2), stop=stop)
 
 def build_signal(ticker: str, asset_class: AssetClass, horizon: Horizon, last_price: float) -> Signal:
+    """Валидированный Signal (pydantic) — для внешних потребителей; внутри движка — build_record."""
+    return build_record(ticker, asset_class, horizon, last_price).to_model()
+
+def build_record(ticker: str, asset_class: AssetClass, horizon: Horizon, last_price: float) -> SignalRecord:
+    """SignalRecord: уровни и тексты — из signal_cache, если есть; id и время — свежие на каждый вызов."""
+    if cache.SIGNAL_CACHE_TTL <= 0:
+        return _timed_build(ticker, asset_class, horizon, last_price)
+    day = _seed_day()
+    key = (ticker, asset_class, horizon, day, price_bucket(last_price, cache.SIGNAL_PRICE_BUCKET_BP))
+    rec = signal_cache.get_or_load(key, lambda: _timed_build(ticker, asset_class, horizon, last_price, day))
+    now = datetime.utcnow()
+    return replace(rec, id=_signal_id(ticker, now, horizon), created_at=now,
+                   expires_at=now + timedelta(hours=_horizon_params(horizon)[1]))
+
+def _signal_id(ticker: str, now: datetime, horizon: Horizon) -> str:
+    return f"{ticker}-{now.strftime('%Y%m%d%H%M%S')}-{horizon}"
+
+def _timed_build(ticker, asset_class, horizon, last_price, day=None) -> SignalRecord:
+    with metrics.BUILD_SIGNAL.time(asset_class=asset_class, horizon=horizon):
+        return _build_record(ticker, asset_class, horizon, last_price, day)
+
+def _build_record(ticker: str, asset_class: AssetClass, horizon: Horizon, last_price: float, day: str = None) -> SignalRecord:
     buffer_bp, expire_h = _horizon_params(horizon)
-    seed = _daily_seed(f"{ticker}-{asset_class}-{horizon}")
+    seed = _daily_seed(f"{ticker}-{asset_class}-{horizon}", day)
     action = choose_action(seed)
     entry, tps, stop = gen_levels(action, last_price, buffer_bp)
     confidence = gen_confidence(seed, action)
@@ -68,11 +101,31 @@ def build_signal(ticker: str, asset_class: AssetClass, horizon: Horizon, last_pr
     now = datetime.utcnow(); exp = now + timedelta(hours=expire_h)
     narrative = trader_tone_narrative_ru(action, horizon, last_price)
     alt = alternative_scenario(action, entry, buffer_bp)
-    return Signal(
-        id=f"{ticker}-{now.strftime('%Y%m%d%H%M%S')}-{horizon}",
+    return SignalRecord(
+        id=_signal_id(ticker, now, horizon),
         ticker=ticker.upper(), asset_class=asset_class, horizon=horizon,
-        action=action, entry=entry, take_profit=tps, stop=stop,
+        action=action, entry=entry, take_profit=tuple(sorted(tps)), stop=stop,
         confidence=confidence, position_size_pct_nav=size_pct,
         created_at=now, expires_at=exp, narrative_ru=narrative,
-        alternatives=[alt],
+        alternatives=(alt,),
+    )
+
+def signal_from_spec(ticker: str, asset_class: AssetClass, horizon: Horizon, last_price: float, spec: dict) -> Signal:
+    return record_from_spec(ticker, asset_class, horizon, last_price, spec).to_model()
+
+def record_from_spec(ticker: str, asset_class: AssetClass, horizon: Horizon, last_price: float, spec: dict) -> SignalRecord:
+    """Спека стратегии (my_strategy.generate_signal_core / DecisionBands.decide) → SignalRecord."""
+    _, expire_h = _horizon_params(horizon)
+    action = spec["action"]
+    tp1, tp2, stop = sanitize_levels(action, spec["entry"], *spec["take_profit"], spec["stop"])
+    now = datetime.utcnow(); exp = now + timedelta(hours=expire_h)
+    alt = spec.get("alt")
+    return SignalRecord(
+        id=f"{ticker.upper()}-{now.strftime('%Y%m%d%H%M%S')}-{horizon}",
+        ticker=ticker.upper(), asset_class=asset_class, horizon=horizon,
+        action=action, entry=spec["entry"], take_profit=tuple(sorted((tp1, tp2))), stop=stop,
+        confidence=spec["confidence"],
+        position_size_pct_nav=target_vol_position_size(spec["confidence"], asset_class, horizon),
+        created_at=now, expires_at=exp, narrative_ru=spec["narrative_ru"],
+        alternatives=(AltRecord(**{**alt, "take_profit": tuple(alt["take_profit"])}),) if alt else (),
     )
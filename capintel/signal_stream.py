@@ -0,0 +1,83 @@
+# capintel/signal_stream.py
+"""
+Push сигналов по пересечению полос решения вместо опроса /signal.
+Для каждого тикера один раз строятся DecisionBands (пивоты + признаки); на каждый тик цены —
+только zone(price) (несколько сравнений). Новый сигнал — когда цена сменила полосу
+или пришёл новый дневной бар (полосы перестраиваются не чаще refresh_s).
+"""
+
+import time
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+import pandas as pd
+
+from capintel.schemas import SignalRecord
+from capintel.signal_engine import record_from_spec
+from capintel.strategy import my_strategy as ms
+
+Loader = Callable[[str, str], pd.DataFrame]   # (asset_class, ticker) → дневные бары
+
+
+class BandWatcher:
+    def __init__(
+        self,
+        asset_class: str,
+        horizon: str,
+        tickers: Iterable[str],
+        refresh_s: float = 60.0,
+        loader: Optional[Loader] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.asset_class, self.horizon = asset_class, horizon
+        self.tickers = list(dict.fromkeys(t.upper() for t in tickers))
+        self.refresh_s = float(refresh_s)
+        self._loader = loader or (lambda ac, t: ms._fetch_daily_bars(ac, t, days=520))
+        self._clock = clock
+        self.bands: Dict[str, ms.DecisionBands] = {}
+        self.errors: Dict[str, str] = {}
+        self._zone: Dict[str, Tuple[bool, ...]] = {}
+        self._checked: Dict[str, float] = {}
+
+    def refresh(self, ticker: str, force: bool = False) -> bool:
+        """Перестроить полосы, если пора (refresh_s) и бары изменились. True — полосы новые."""
+        t = ticker.upper()
+        now = self._clock()
+        if not force and t in self._checked and now - self._checked[t] < self.refresh_s:
+            return False
+        self._checked[t] = now
+        try:
+            daily = self._loader(self.asset_class, t)
+            if daily.empty:
+                raise ValueError(f"Нет дневных баров для {t}")
+            old = self.bands.get(t)
+            if old is not None and old.version == ms.bars_version(daily):
+                return False
+            self.bands[t] = ms.decision_bands(t, self.asset_class, self.horizon, daily=daily)
+        except Exception as e:  # noqa — ошибка тикера не останавливает поток
+            self.errors[t] = f"{type(e).__name__}: {e}"
+            return False
+        self.errors.pop(t, None)
+        self._zone.pop(t, None)   # новый бар → следующий тик даст свежий сигнал
+        return True
+
+    def refresh_all(self, force: bool = False) -> None:
+        for t in self.tickers:
+            self.refresh(t, force)
+
+    def on_price(self, ticker: str, price: float) -> Optional[SignalRecord]:
+        """Сигнал, если цена перешла в другую полосу (или первый тик после построения полос), иначе None."""
+        t = ticker.upper()
+        bands = self.bands.get(t)
+        if bands is None:
+            return None
+        z = bands.zone(price)
+        if self._zone.get(t) == z:
+            return None
+        self._zone[t] = z
+        return record_from_spec(t, self.asset_class, self.horizon, price, bands.decide(price))
+
+    def state(self, ticker: str, price: float) -> Dict[str, Any]:
+        """Полоса и ближайшие границы — для отладки/клиента."""
+        bands = self.bands[ticker.upper()]
+        lo, hi = bands.neighbours(price)
+        return {"zone": bands.zone(price), "lower": lo, "upper": hi}
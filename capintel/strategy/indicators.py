@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+"""
+Потоковые (инкрементальные) версии индикаторов my_strategy: EMA, RSI(Wilder), ATR(Wilder),
+MACD histogram, Heikin Ashi. Засев из истории — векторно теми же батч-функциями,
+дальше update() за O(1) на бар. Состояние — простой dict (to_dict/from_dict), сериализуется в JSON.
+Результаты совпадают с батч-версиями (pandas ewm, adjust=False) с точностью до округления.
+"""
+
+from __future__ import annotations
+import json
+import math
+from collections import deque
+from typing import Any, Dict, Optional, Tuple
+
+import pandas as pd
+
+from capintel.strategy import my_strategy as ms
+
+_nan = float("nan")
+
+def _f(x) -> Optional[float]:
+    return None if x is None or (isinstance(x, float) and math.isnan(x)) else float(x)
+
+
+class EMA:
+    __slots__ = ("span", "wilder", "alpha", "value")
+
+    def __init__(self, span: int, wilder: bool = False, value: Optional[float] = None):
+        self.span, self.wilder = int(span), bool(wilder)
+        self.alpha = (1.0 / span) if wilder else (2.0 / (span + 1.0))
+        self.value = value
+
+    def update(self, x: float) -> float:
+        if x != x:  # NaN: как ewm(ignore_na=False) — значение не меняется
+            return _nan if self.value is None else self.value
+        self.value = x if self.value is None else (1.0 - self.alpha) * self.value + self.alpha * x
+        return self.value
+
+    def seed(self, series: pd.Series) -> "EMA":
+        e = ms._ema(series.astype(float), self.span, wilder=self.wilder).dropna()
+        self.value = float(e.iloc[-1]) if len(e) else None
+        return self
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"span": self.span, "wilder": self.wilder, "value": self.value}
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "EMA":
+        return cls(d["span"], d["wilder"], d["value"])
+
+
+class RSIWilder:
+    __slots__ = ("n", "prev_close", "au", "ad")
+
+    def __init__(self, n: int = 14):
+        self.n = int(n)
+        self.prev_close: Optional[float] = None
+        self.au, self.ad = EMA(n, wilder=True), EMA(n, wilder=True)
+
+    def update(self, close: float) -> float:
+        prev, self.prev_close = self.prev_close, float(close)
+        if prev is None:
+            return 50.0
+        d = close - prev
+        au, ad = self.au.update(max(d, 0.0)), self.ad.update(max(-d, 0.0))
+        if not ad:  # rs = NaN → fillna(50)
+            return 50.0
+        return 100.0 - 100.0 / (1.0 + au / ad)
+
+    def seed(self, close: pd.Series) -> "RSIWilder":
+        close = close.astype(float)
+        d = close.diff()
+        self.au.seed(d.clip(lower=0.0)); self.ad.seed((-d).clip(lower=0.0))
+        self.prev_close = float(close.iloc[-1]) if len(close) else None
+        return self
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"n": self.n, "prev_close": self.prev_close, "au": self.au.to_dict(), "ad": self.ad.to_dict()}
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "RSIWilder":
+        obj = cls(d["n"]); obj.prev_close = d["prev_close"]
+        obj.au, obj.ad = EMA.from_dict(d["au"]), EMA.from_dict(d["ad"])
+        return obj
+
+
+class ATRWilder:
+    __slots__ = ("n", "prev_close", "atr")
+
+    def __init__(self, n: int = 14):
+        self.n = int(n)
+        self.prev_close: Optional[float] = None
+        self.atr = EMA(n, wilder=True)
+
+    def update(self, h: float, l: float, c: float) -> float:
+        pc, self.prev_close = self.prev_close, float(c)
+        tr = h - l if pc is None else max(h - l, abs(h - pc), abs(l - pc))
+        return self.atr.update(tr)
+
+    def seed(self, bars: pd.DataFrame) -> "ATRWilder":
+        a = ms._atr_wilder(bars, self.n).dropna()
+        self.atr.value = float(a.iloc[-1]) if len(a) else None
+        self.prev_close = float(bars["c"].iloc[-1]) if len(bars) else None
+        return self
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"n": self.n, "prev_close": self.prev_close, "atr": self.atr.to_dict()}
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "ATRWilder":
+        obj = cls(d["n"]); obj.prev_close = d["prev_close"]; obj.atr = EMA.from_dict(d["atr"])
+        return obj
+
+
+class MACDHist:
+    __slots__ = ("fast", "slow", "signal")
+
+    def __init__(self):
+        self.fast, self.slow, self.signal = EMA(12), EMA(26), EMA(9)
+
+    def update(self, close: float) -> float:
+        macd = self.fast.update(close) - self.slow.update(close)
+        return macd - self.signal.update(macd)
+
+    def seed(self, close: pd.Series) -> "MACDHist":
+        close = close.astype(float)
+        self.fast.seed(close); self.slow.seed(close)
+        self.signal.seed(ms._ema(close, 12) - ms._ema(close, 26))
+        return self
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"fast": self.fast.to_dict(), "slow": self.slow.to_dict(), "signal": self.signal.to_dict()}
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "MACDHist":
+        obj = cls()
+        obj.fast, obj.slow, obj.signal = (EMA.from_dict(d[k]) for k in ("fast", "slow", "signal"))
+        return obj
+
+
+class HeikinAshi:
+    __slots__ = ("ha_open", "ha_close")
+
+    def __init__(self):
+        self.ha_open: Optional[float] = None
+        self.ha_close: Optional[float] = None
+
+    def update(self, o: float, h: float, l: float, c: float) -> Tuple[float, float]:
+        ha_c = (o + h + l + c) / 4.0
+        ha_o = (o + c) / 2.0 if self.ha_open is None else (self.ha_open + self.ha_close) / 2.0
+        self.ha_open, self.ha_close = ha_o, ha_c
+        return ha_o, ha_c
+
+    def seed(self, bars: pd.DataFrame) -> "HeikinAshi":
+        if len(bars):
+            ha_o, ha_c = ms._heikin_ashi(bars)
+            self.ha_open, self.ha_close = float(ha_o.iloc[-1]), float(ha_c.iloc[-1])
+        return self
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"ha_open": self.ha_open, "ha_close": self.ha_close}
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "HeikinAshi":
+        obj = cls(); obj.ha_open, obj.ha_close = d["ha_open"], d["ha_close"]
+        return obj
+
+
+def _percentiles(values, qs) -> Tuple[float, ...]:
+    """np.nanpercentile (линейная интерполяция) для короткого окна — без накладных расходов numpy."""
+    v = sorted(x for x in values if x == x)
+    if not v:
+        return tuple(_nan for _ in qs)
+    out = []
+    for q in qs:
+        pos = q / 100.0 * (len(v) - 1)
+        lo = int(pos); hi = min(lo + 1, len(v) - 1)
+        out.append(v[lo] + (v[hi] - v[lo]) * (pos - lo))
+    return tuple(out)
+
+
+def _streak(prev: Tuple[int, int], x: float) -> Tuple[int, int]:
+    """(pos, neg) серии знаков как в _last_streak_length: ноль рвёт обе."""
+    pos, neg = prev
+    if x > 0:
+        return pos + 1, 0
+    if x < 0:
+        return 0, neg + 1
+    return 0, 0
+
+
+class IndicatorSet:
+    """
+    Все индикаторы рабочего ТФ стратегии + серии знаков HA/MACD и короткие окна
+    (хвост RSI для квантилей, хвост hist для «замедления») — всё, что нужно правилам на последнем баре.
+    """
+    RSI_WINDOW = 200
+    HIST_WINDOW = 3
+
+    def __init__(self):
+        self.ha, self.macd = HeikinAshi(), MACDHist()
+        self.rsi, self.atr = RSIWilder(14), ATRWilder(14)
+        self.n = 0
+        self.ha_streak = (0, 0)
+        self.macd_streak = (0, 0)
+        self.rsi_tail: deque = deque(maxlen=self.RSI_WINDOW)
+        self.hist_tail: deque = deque(maxlen=self.HIST_WINDOW)
+        self.last: Dict[str, float] = {}
+
+    def update(self, o: float, h: float, l: float, c: float) -> Dict[str, float]:
+        ha_o, ha_c = self.ha.update(o, h, l, c)
+        hist = self.macd.update(c)
+        rsi = self.rsi.update(c)
+        atr = self.atr.update(h, l, c)
+        self.n += 1
+        self.ha_streak = _streak(self.ha_streak, ha_c - ha_o)
+        self.macd_streak = _streak(self.macd_streak, hist)
+        self.rsi_tail.append(rsi)
+        self.hist_tail.append(hist)
+        self.last = dict(ha_open=ha_o, ha_close=ha_c, hist=hist, rsi=rsi, atr=atr, close=float(c))
+        return self.last
+
+    def seed(self, bars: pd.DataFrame) -> "IndicatorSet":
+        """bars: колонки o,h,l,c (как в generate_signal_core)."""
+        b = bars[["o", "h", "l", "c"]].astype(float)
+        if not len(b):
+            return self
+        close = b["c"]
+        self.ha.seed(b); self.macd.seed(close); self.rsi.seed(close); self.atr.seed(b)
+        ha_o, ha_c = ms._heikin_ashi(b)
+        hist, rsi, atr = ms._macd_hist(close), ms._rsi_wilder(close, 14), ms._atr_wilder(b, 14)
+        ha_d = ha_c - ha_o
+        self.n = len(b)
+        self.ha_streak = (ms._last_streak_length(ha_d, True), ms._last_streak_length(ha_d, False))
+        self.macd_streak = (ms._last_streak_length(hist, True), ms._last_streak_length(hist, False))
+        self.rsi_tail.extend(rsi.tail(self.RSI_WINDOW).tolist())
+        self.hist_tail.extend(hist.tail(self.HIST_WINDOW).tolist())
+        self.last = dict(ha_open=float(ha_o.iloc[-1]), ha_close=float(ha_c.iloc[-1]), hist=float(hist.iloc[-1]),
+                         rsi=float(rsi.iloc[-1]), atr=float(atr.iloc[-1]), close=float(close.iloc[-1]))
+        return self
+
+    def features(self, lazy: bool = False) -> Dict[str, Any]:
+        """
+        Те же признаки, что my_strategy._bar_features, но из состояния — O(окна), без истории.
+        lazy=True: квантили RSI считаются только при RSI вне [30, 70] — иначе правила их не используют
+        (rsi_high требует RSI > 70, rsi_low — RSI < 30), решение то же.
+        """
+        h = list(self.hist_tail)
+        def decel(vals) -> bool:   # как _deceleration_abs(lookback=3)
+            return self.n >= self.HIST_WINDOW + 3 and all(abs(b) <= abs(a) for a, b in zip(vals, vals[1:]))
+        rsi = self.last.get("rsi", 50.0)
+        if self.n >= 50 and not (lazy and 30.0 <= rsi <= 70.0):
+            q20, q80 = _percentiles(self.rsi_tail, (20, 80))
+        else:
+            q20, q80 = 30.0, 70.0
+        return dict(
+            ha_green_streak=self.ha_streak[0], ha_red_streak=self.ha_streak[1],
+            macd_pos_streak=self.macd_streak[0], macd_neg_streak=self.macd_streak[1],
+            macd_decel_pos=decel([max(x, 0.0) for x in h]), macd_decel_neg=decel([max(-x, 0.0) for x in h]),
+            rsi=rsi, rsi_q20=float(q20), rsi_q80=float(q80),
+            atr=self.last.get("atr"),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "ha": self.ha.to_dict(), "macd": self.macd.to_dict(),
+            "rsi": self.rsi.to_dict(), "atr": self.atr.to_dict(),
+            "n": self.n, "ha_streak": list(self.ha_streak), "macd_streak": list(self.macd_streak),
+            "rsi_tail": [_f(x) for x in self.rsi_tail], "hist_tail": [_f(x) for x in self.hist_tail],
+            "last": {k: _f(v) for k, v in self.last.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "IndicatorSet":
+        obj = cls()
+        obj.ha, obj.macd = HeikinAshi.from_dict(d["ha"]), MACDHist.from_dict(d["macd"])
+        obj.rsi, obj.atr = RSIWilder.from_dict(d["rsi"]), ATRWilder.from_dict(d["atr"])
+        obj.n = int(d["n"])
+        obj.ha_streak, obj.macd_streak = tuple(d["ha_streak"]), tuple(d["macd_streak"])
+        obj.rsi_tail.extend(_nan if x is None else x for x in d["rsi_tail"])
+        obj.hist_tail.extend(_nan if x is None else x for x in d["hist_tail"])
+        obj.last = {k: (_nan if v is None else v) for k, v in d["last"].items()}
+        return obj
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict())
+
+    @classmethod
+    def from_json(cls, s: str) -> "IndicatorSet":
+        return cls.from_dict(json.loads(s))
@@ -7,15 +7,28 @@
 """
 
 from __future__ import annotations
+from bisect import bisect_right
 from typing import Dict, Any, Tuple, List
 from datetime import datetime, timezone, timedelta
 
 import numpy as np
 import pandas as pd
-import httpx
 
 # берём внутренние утилиты клиента Polygon
 from capintel.providers import polygon_client as poly
+from capintel.providers import bar_store, minute_bars
+from capintel import cache
+from capintel.cache import TTLCache, price_bucket
+from capintel import metrics
+
+# таймеры этапов generate_signal_core (period_hlc — пересчёт HLC внутри pivots, при промахе PivotIndex)
+_STAGE = {s: metrics.SIGNAL_STAGE.labels(stage=s)
+          for s in ("bar_fetch", "period_hlc", "pivots", "heikin_ashi", "macd", "rsi", "atr", "decision")}
+
+# мемо generate_signal_core: полосы по (тикер, горизонт, версия баров), спеки — ещё и по корзине цены;
+# новый бар меняет версию → новый ключ, старые записи уходят по TTL/LRU. Настройки — cache.SIGNAL_*.
+bands_cache = TTLCache(maxsize=cache.SIGNAL_CACHE_SIZE, ttl=cache.SIGNAL_CACHE_TTL)
+spec_cache = TTLCache(maxsize=cache.SIGNAL_CACHE_SIZE, ttl=cache.SIGNAL_CACHE_TTL)
 
 
 # ------------------------- вспомогалки -------------------------
@@ -105,152 +118,321 @@ def _fibo_pivots(H: float, L: float, C: float) -> Dict[str, float]:
         "S3": P - 1.000 * d,
     }
 
+def _polygon_ticker(asset_class: str, ticker: str) -> str:
+    return poly.polygon_symbol(asset_class, ticker)
+
+def _horizon_bars(asset_class: str, ticker: str, horizon: str) -> pd.DataFrame | None:
+    """Рабочий ТФ горизонта из минутных баров (minute_bars.HORIZON_TF); None — считать по дневным."""
+    tf = minute_bars.HORIZON_TF.get(horizon)
+    if not tf:
+        return None
+    try:
+        with _STAGE["bar_fetch"].time():
+            bars = minute_bars.default.bars(asset_class, ticker, tf)
+    except Exception:  # noqa — нет минуток (ключ/тариф/сеть) → как раньше, по дневным
+        return None
+    return bars if len(bars) >= 50 else None
+
+def _download_daily(tkr: str, fr, to) -> np.ndarray:
+    """Дневные агрегаты Polygon за [fr, to] → массив bar_store.BAR_DTYPE."""
+    url = f"{poly.BASE}/v2/aggs/ticker/{tkr}/range/1/day/{fr}/{to}?adjusted=true&limit=50000&sort=asc"  # noqa
+    r = poly._get(poly.get_client(), "aggs_daily", url, timeout=20)  # noqa
+    r.raise_for_status()
+    data = r.json()
+    return bar_store.rows_from_results((data or {}).get("results") or [])
+
+def _bars_frame(rows: np.ndarray) -> pd.DataFrame:
+    if not len(rows):
+        return pd.DataFrame(columns=["o", "h", "l", "c", "v"])
+    df = pd.DataFrame({k: rows[k] for k in ("o", "h", "l", "c", "v")},
+                      index=pd.to_datetime(rows["t"], unit="s", utc=True))
+    df.index.name = "dt"
+    return df
+
 def _fetch_daily_bars(asset_class: str, ticker: str, days: int = 500) -> pd.DataFrame:
-    """Дневные бары (для расчёта недельных/месячных/годовых пивотов)."""
-    if asset_class == "crypto":
-        base, quote = poly._norm_crypto_pair(ticker)  # noqa
-        tkr = f"X:{base}{quote}"
-    else:
-        tkr = ticker.upper()
+    """Дневные бары (для расчёта недельных/месячных/годовых пивотов).
+    С локальным bar_store докачивается только недостающий хвост истории."""
+    tkr = _polygon_ticker(asset_class, ticker)
 
     # берем ~days последних календарных дней
     to = datetime.now(timezone.utc).date()
     fr = (to - timedelta(days=days))
-    url = f"{poly.BASE}/v2/aggs/ticker/{tkr}/range/1/day/{fr}/{to}?adjusted=true&limit=50000&sort=asc"  # noqa
+    store = bar_store.default_store()
+    rows = store.daily(tkr, fr, to, lambda a, b: _download_daily(tkr, a, b)) if store else _download_daily(tkr, fr, to)
+    return _bars_frame(rows)
 
-    with httpx.Client(timeout=20) as c:
-        r = c.get(url, headers=poly._headers())  # noqa
-        r.raise_for_status()
-        data = r.json()
-    rows = (data or {}).get("results") or []
-    if not rows:
-        return pd.DataFrame(columns=["t", "o", "h", "l", "c", "v"])
-
-    df = pd.DataFrame(rows)[["t", "o", "h", "l", "c", "v"]].copy()
-    # Polygon даёт мс → сек
-    if df["t"].max() > 1e12:
-        df["t"] = (df["t"] / 1000).astype(int)
-    df["dt"] = pd.to_datetime(df["t"], unit="s", utc=True)
-    df.set_index("dt", inplace=True)
-    return df[["o", "h", "l", "c", "v"]]
+_PERIOD_FREQ = {"W": "W-MON", "M": "M", "Y": "Y"}   # те же границы, что у pd.Grouper(freq=..., label="right")
+
+def _period_start(ts: pd.Timestamp, period: str) -> pd.Timestamp:
+    """Начало (UTC) периода W/M/Y, в который попадает ts."""
+    if period not in _PERIOD_FREQ:
+        raise ValueError("period must be 'W', 'M' or 'Y'")
+    naive = ts.tz_convert(None) if ts.tzinfo is not None else ts
+    start = naive.to_period(_PERIOD_FREQ[period]).start_time
+    return start.tz_localize("UTC") if ts.tzinfo is not None else start
+
+def _last_complete_period_bounds(df_daily: pd.DataFrame, period: str) -> Tuple[pd.Timestamp, int, int]:
+    """(начало текущего периода, [j, k) — позиции баров последнего завершённого периода); j == k == 0, если его нет."""
+    idx = df_daily.index
+    cur_start = _period_start(idx[-1], period)
+    k = int(idx.searchsorted(cur_start))
+    if k == 0:
+        return cur_start, 0, 0
+    j = int(idx.searchsorted(_period_start(idx[k - 1], period)))
+    return cur_start, j, k
 
 def _last_complete_period_hlc(df_daily: pd.DataFrame, period: str) -> Tuple[float, float, float]:
     """
-    period: 'W' (неделя, Mon-Sun), 'M' (месяц), 'Y' (год)
+    period: 'W' (неделя, Tue-Mon как W-MON), 'M' (месяц), 'Y' (год)
     Возвращает H,L,C для последнего *завершённого* периода.
+    Бинарный поиск по отсортированному индексу вместо groupby по всей истории.
     """
     if df_daily.empty:
         raise ValueError("Нет данных для расчёта HLC предыдущего периода")
 
-    if period == "W":
-        g = df_daily.groupby(pd.Grouper(freq="W-MON", label="right"))
-    elif period == "M":
-        g = df_daily.groupby(pd.Grouper(freq="M", label="right"))
-    elif period == "Y":
-        g = df_daily.groupby(pd.Grouper(freq="Y", label="right"))
-    else:
-        raise ValueError("period must be 'W', 'M' or 'Y'")
-
-    agg = g.agg({"h": "max", "l": "min", "c": "last"}).dropna()
-    if len(agg) < 2:
+    _, j, k = _last_complete_period_bounds(df_daily, period)
+    if k == 0:
         # на всякий случай fallback: берём хвост по количеству торговых дней
         window = {"W": 5, "M": 22, "Y": 252}[period]
         tail = df_daily.tail(window)
         return float(tail["h"].max()), float(tail["l"].min()), float(tail["c"].iloc[-1])
-    # берём предыдущий завершённый (последнюю строку исключаем как текущий незавершённый)
-    H = float(agg.iloc[-2]["h"])
-    L = float(agg.iloc[-2]["l"])
-    C = float(agg.iloc[-2]["c"])
+    # берём предыдущий завершённый (текущий незавершённый исключён)
+    H = float(df_daily["h"].to_numpy()[j:k].max())
+    L = float(df_daily["l"].to_numpy()[j:k].min())
+    C = float(df_daily["c"].to_numpy()[k - 1])
     return H, L, C
 
+class PivotIndex:
+    """
+    Кэш HLC/пивотов по (тикер, период) с отпечатком входа: граница текущего периода + окно баров
+    завершённого периода (первый бар, длина, последний бар и его h/l/c). Пока последний бар в том же
+    периоде и история не пересчитана, прошлый период не меняется → ответ из памяти.
+    Новый период, другой/укороченный df_daily или пересчёт истории (сплит) → пересчёт двумя бинарными поисками.
+    """
+
+    def __init__(self, maxsize: int = 8192):
+        self._cache = TTLCache(maxsize=maxsize, ttl=float("inf"))
+
+    def hlc(self, key: str, df_daily: pd.DataFrame, period: str) -> Tuple[float, float, float]:
+        return self.get(key, df_daily, period)[0]
+
+    def pivots(self, key: str, df_daily: pd.DataFrame, period: str) -> Dict[str, float]:
+        return self.get(key, df_daily, period)[1]
+
+    def get(self, key: str, df_daily: pd.DataFrame, period: str) -> Tuple[Tuple[float, float, float], Dict[str, float]]:
+        if df_daily.empty:
+            raise ValueError("Нет данных для расчёта HLC предыдущего периода")
+        cur_start, j, k = _last_complete_period_bounds(df_daily, period)
+        if k == 0:   # нет завершённого периода — fallback по хвосту, не кэшируем
+            hlc = _last_complete_period_hlc(df_daily, period)
+            return hlc, _fibo_pivots(*hlc)
+        h, l, c = (df_daily[col].to_numpy() for col in ("h", "l", "c"))
+        fp = (cur_start, df_daily.index[j], k - j, df_daily.index[k - 1], float(h[k - 1]), float(l[k - 1]), float(c[k - 1]))
+        hit = self._cache.get((key, period))
+        if hit is not None and hit[0] == fp:
+            return hit[1], hit[2]
+        with _STAGE["period_hlc"].time():
+            hlc = (float(h[j:k].max()), float(l[j:k].min()), float(c[k - 1]))
+        piv = _fibo_pivots(*hlc)
+        self._cache.set((key, period), (fp, hlc, piv))
+        return hlc, piv
+
+    def invalidate(self, key: str | None = None) -> None:
+        if key is None:
+            self._cache.invalidate()
+        else:
+            for p in _PERIOD_FREQ:
+                self._cache.invalidate((key, p))
+
+    def stats(self) -> Dict[str, Any]:
+        return self._cache.stats()
+
+pivot_index = PivotIndex()
+
 def _near(price: float, level: float, tol: float) -> bool:
     if level <= 0:
         return False
     return abs(price - level) / level <= tol
 
 def _horizon_params(horizon: str) -> Dict[str, Any]:
-    # thresholds & tolerances
+    # thresholds & tolerances (rsi_hi/rsi_lo — нижняя граница «перегрева» / верхняя «перепроданности» RSI)
     return {
-        "intraday": dict(tag="ST", ha=4, macd=4, tol=0.0065),
-        "swing":    dict(tag="MID", ha=5, macd=6, tol=0.0090),
-        "position": dict(tag="LT", ha=6, macd=8, tol=0.0120),
+        "intraday": dict(tag="ST", ha=4, macd=4, tol=0.0065, rsi_hi=70.0, rsi_lo=30.0),
+        "swing":    dict(tag="MID", ha=5, macd=6, tol=0.0090, rsi_hi=70.0, rsi_lo=30.0),
+        "position": dict(tag="LT", ha=6, macd=8, tol=0.0120, rsi_hi=70.0, rsi_lo=30.0),
     }[horizon]
 
 
 # ------------------------- основная логика -------------------------
 
+_PIVOT_PERIODS = {"intraday": ("W", "M"), "swing": ("M", "Y"), "position": ("Y", None)}
+
+def _horizon_pivots(key: str, daily: pd.DataFrame, horizon: str) -> Tuple[Dict[str, float], Dict[str, float]]:
+    """Пивоты текущего горизонта и старшего ТФ: ST → W (+M), MID → M (+Y), LT → Y (старшего нет — тот же)."""
+    p, p_hi = _PIVOT_PERIODS[horizon]
+    piv = pivot_index.pivots(key, daily, p)
+    return piv, (pivot_index.pivots(key, daily, p_hi) if p_hi else piv)
+
+def _bar_features(b: pd.DataFrame) -> Dict[str, Any]:
+    """Признаки рабочего ТФ на последнем баре (не зависят от цены и порогов горизонта)."""
+    with _STAGE["heikin_ashi"].time():
+        ha_o, ha_c = _heikin_ashi(b)
+    close = b["c"].astype(float)
+    with _STAGE["macd"].time():
+        hist = _macd_hist(close)
+    with _STAGE["rsi"].time():
+        rsi = _rsi_wilder(close, 14)
+        q20, q80 = np.nanpercentile(rsi.tail(200), [20, 80]) if len(rsi) >= 50 else (30.0, 70.0)
+    with _STAGE["atr"].time():
+        atr = _atr_wilder(b, 14)
+    return dict(
+        ha_green_streak=_last_streak_length((ha_c - ha_o), positive=True),
+        ha_red_streak=_last_streak_length((ha_c - ha_o), positive=False),
+        macd_pos_streak=_last_streak_length(hist, positive=True),
+        macd_neg_streak=_last_streak_length(hist, positive=False),
+        macd_decel_pos=_deceleration_abs(hist.clip(lower=0)),
+        macd_decel_neg=_deceleration_abs((-hist).clip(lower=0)),
+        rsi=float(rsi.iloc[-1]), rsi_q20=float(q20), rsi_q80=float(q80),
+        atr=float(atr.iloc[-1]) if len(atr) else None,
+    )
+
+def _standardize_bars(bars: pd.DataFrame) -> pd.DataFrame:
+    # стандартизируем колонки, индекс — datetime
+    b = bars.copy()
+    if "dt" in b.columns:
+        b = b.set_index(pd.to_datetime(b["dt"], utc=True))
+    elif "t" in b.columns and not isinstance(b.index, pd.DatetimeIndex):
+        b = b.set_index(pd.to_datetime(b["t"], unit="s", utc=True))
+    return b[["o", "h", "l", "c"]].astype(float).dropna()
+
+class DecisionBands:
+    """
+    Всё, что decide() нужно кроме цены: пивоты, признаки бара, пороги горизонта.
+    На этих входах решение зависит от цены только через попадание в полосы R2/R3/S2/S3 ± tol
+    и положение относительно R1/S1 старшего ТФ: zone(price) — эти флаги (O(1) на тик);
+    пока zone не меняется, меняются только привязанные к цене уровни (entry, ATR-цели).
+    """
+    __slots__ = ("horizon", "piv", "piv_hi", "feats", "params", "edges", "version", "key")
+
+    def __init__(self, horizon: str, piv: Dict[str, float], piv_hi: Dict[str, float], feats: Dict[str, Any],
+                 params: Dict[str, Any] | None = None, version: Any = None, key: Any = None):
+        self.horizon, self.piv, self.piv_hi, self.feats = horizon, piv, piv_hi, feats
+        self.params = params or _horizon_params(horizon)
+        self.version = version
+        self.key = key   # ключ bands_cache (None — полосы не из кэша)
+        tol = self.params["tol"]
+        edges = [piv[k] * (1.0 + s * tol) for k in ("R2", "R3", "S2", "S3") if piv[k] > 0 for s in (-1.0, 1.0)]
+        self.edges = sorted(edges + [piv_hi["R1"], piv_hi["S1"]])
+
+    def zone(self, price: float) -> Tuple[bool, ...]:
+        piv, hi, tol = self.piv, self.piv_hi, self.params["tol"]
+        return (_near(price, piv["R2"], tol), _near(price, piv["R3"], tol),
+                _near(price, piv["S2"], tol), _near(price, piv["S3"], tol),
+                price > hi["R1"], price < hi["S1"])
+
+    def neighbours(self, price: float) -> Tuple[float | None, float | None]:
+        """Ближайшие границы полос снизу и сверху от цены."""
+        i = bisect_right(self.edges, price)
+        return (self.edges[i - 1] if i else None), (self.edges[i] if i < len(self.edges) else None)
+
+    def decide(self, price: float) -> Dict[str, Any]:
+        with _STAGE["decision"].time():
+            return decide(self.horizon, price, self.piv, self.piv_hi, self.feats, self.params)
+
+def bars_version(daily: pd.DataFrame) -> Tuple[int, Any, float]:
+    """(число баров, время и close последнего) — меняется с новым/обновлённым баром."""
+    if daily.empty:
+        return 0, None, 0.0
+    return len(daily), daily.index[-1], float(daily["c"].iloc[-1])
+
+def decision_bands(
+    ticker: str,
+    asset_class: str,
+    horizon: str,
+    bars: pd.DataFrame | None = None,
+    daily: pd.DataFrame | None = None,
+) -> DecisionBands:
+    """
+    Пивоты + признаки для тикера/горизонта (всё тяжёлое в generate_signal_core, кроме самого решения).
+    Кэшируются в bands_cache по (тикер, горизонт, bars_version(daily), bars_version(bars)).
+    """
+    if daily is None:
+        if bars is None:
+            bars = _horizon_bars(asset_class, ticker, horizon)
+        with _STAGE["bar_fetch"].time():
+            daily = _fetch_daily_bars(asset_class, ticker, days=520)
+    key = _polygon_ticker(asset_class, ticker)
+    if cache.SIGNAL_CACHE_TTL <= 0 or daily.empty:
+        return _decision_bands(key, horizon, bars, daily, None)
+    bkey = (key, horizon, bars_version(daily), bars_version(bars) if bars is not None and len(bars) >= 50 else None)
+    return bands_cache.get_or_load(bkey, lambda: _decision_bands(key, horizon, bars, daily, bkey))
+
+def _decision_bands(key: str, horizon: str, bars: pd.DataFrame | None, daily: pd.DataFrame, bkey: Any) -> DecisionBands:
+    # --- 1) Пивоты текущего горизонта и старшего ТФ для подтверждения ---
+    with _STAGE["pivots"].time():
+        piv, piv_hi = _horizon_pivots(key, daily, horizon)
+
+    # --- 2) Индикаторы по рабочему ТФ (bars приходит из движка) ---
+    if bars is None or len(bars) < 50:
+        # если bars нет — соберём минимальный набор с day (не идеально, но лучше, чем ничего)
+        bars = daily
+    feats = _bar_features(_standardize_bars(bars))
+    return DecisionBands(horizon, piv, piv_hi, feats, version=bars_version(daily), key=bkey)
+
 def generate_signal_core(
     ticker: str,
     asset_class: str,     # "crypto" | "equity"
     horizon: str,         # "intraday" | "swing" | "position"
     last_price: float,
     bars: pd.DataFrame | None = None,
+    daily: pd.DataFrame | None = None,
 ) -> Dict[str, Any]:
     """
     Возвращает спеку сигнала (dict), которую обернёт движок в pydantic-модель.
     Ключи: action, entry, take_profit [tp1,tp2], stop, confidence, narrative_ru, alt
+    daily — уже загруженные дневные бары (иначе берутся через _fetch_daily_bars).
+    Результат мемоизируется (spec_cache) по полосам и корзине цены CAPINTEL_SIGNAL_PRICE_BUCKET_BP:
+    при корзине > 0 цены внутри неё получают спеку первой из них. Возвращается копия — кэш не портится.
+    """
+    bands = decision_bands(ticker, asset_class, horizon, bars=bars, daily=daily)
+    if bands.key is None:
+        return bands.decide(last_price)
+    spec = spec_cache.get_or_load((bands.key, price_bucket(last_price, cache.SIGNAL_PRICE_BUCKET_BP)),
+                                  lambda: bands.decide(last_price))
+    alt = spec.get("alt")
+    return {**spec, "take_profit": list(spec["take_profit"]),
+            "alt": {**alt, "take_profit": list(alt["take_profit"])} if alt else alt}
+
+def decide(
+    horizon: str,
+    last_price: float,
+    piv: Dict[str, float],
+    piv_hi: Dict[str, float],
+    feats: Dict[str, Any],
+    params: Dict[str, Any] | None = None,
+) -> Dict[str, Any]:
+    """
+    Правила стратегии поверх готовых пивотов и признаков (_bar_features или потоковый IndicatorSet).
+    Чистая функция без I/O — её же использует историческая прогонка.
     """
-    params = _horizon_params(horizon)
+    params = params or _horizon_params(horizon)
     tol = params["tol"]
     ha_min = params["ha"]
     macd_min = params["macd"]
 
-    # --- 1) Пивоты текущего горизонта и старшего ТФ для подтверждения ---
-    daily = _fetch_daily_bars(asset_class, ticker, days=520)
-
-    if horizon == "intraday":         # ST → weekly
-        H, L, C = _last_complete_period_hlc(daily, "W")
-        high_HLC = _last_complete_period_hlc(daily, "M")  # старший ТФ для подтверждения
-    elif horizon == "swing":          # MID → monthly
-        H, L, C = _last_complete_period_hlc(daily, "M")
-        high_HLC = _last_complete_period_hlc(daily, "Y")
-    else:                              # LT → yearly
-        H, L, C = _last_complete_period_hlc(daily, "Y")
-        # Для LT старший ТФ отсутствует — используем тот же как «нейтральный»
-        high_HLC = (H, L, C)
-
-    piv = _fibo_pivots(H, L, C)
-    piv_hi = _fibo_pivots(*high_HLC)
-
-    # --- 2) Индикаторы по рабочему ТФ (bars приходит из движка) ---
-    if bars is None or len(bars) < 50:
-        # если bars нет — соберём минимальный набор с day (не идеально, но лучше, чем ничего)
-        bars = daily.copy()
-    # стандартизируем колонки, индекс — datetime
-    b = bars.copy()
-    if "dt" in b.columns:
-        b = b.set_index(pd.to_datetime(b["dt"], utc=True))
-    elif "t" in b.columns and not isinstance(b.index, pd.DatetimeIndex):
-        b = b.set_index(pd.to_datetime(b["t"], unit="s", utc=True))
-    b = b[["o", "h", "l", "c"]].astype(float).dropna()
-
-    ha_o, ha_c = _heikin_ashi(b)
-    ha_green = (ha_c > ha_o)
-    ha_red   = (ha_c < ha_o)
-    ha_green_streak = _last_streak_length((ha_c - ha_o), positive=True)
-    ha_red_streak   = _last_streak_length((ha_c - ha_o), positive=False)
-    ha_long_green = ha_green_streak >= ha_min
-    ha_long_red   = ha_red_streak   >= ha_min
-    # смена цвета после длинной серии
-    ha_flip_down = ha_long_green and ha_red.iloc[-1]
-    ha_flip_up   = ha_long_red and ha_green.iloc[-1]
-
-    close = b["c"].astype(float)
-    hist = _macd_hist(close)
-    macd_pos_streak = _last_streak_length(hist, positive=True)
-    macd_neg_streak = _last_streak_length(hist, positive=False)
+    ha_long_green = feats["ha_green_streak"] >= ha_min
+    ha_long_red   = feats["ha_red_streak"]   >= ha_min
+    macd_pos_streak = feats["macd_pos_streak"]
+    macd_neg_streak = feats["macd_neg_streak"]
     macd_long_pos = macd_pos_streak >= macd_min
     macd_long_neg = macd_neg_streak >= macd_min
-    macd_decel_pos = _deceleration_abs(hist.clip(lower=0))
-    macd_decel_neg = _deceleration_abs((-hist).clip(lower=0))
+    macd_decel_pos = feats["macd_decel_pos"]
+    macd_decel_neg = feats["macd_decel_neg"]
 
-    rsi = _rsi_wilder(close, 14)
-    q20, q80 = np.nanpercentile(rsi.tail(200), [20, 80]) if len(rsi) >= 50 else (30.0, 70.0)
-    rsi_high = (rsi.iloc[-1] > max(70.0, q80))
-    rsi_low  = (rsi.iloc[-1] < min(30.0, q20))
+    rsi_high = (feats["rsi"] > max(params.get("rsi_hi", 70.0), feats["rsi_q80"]))
+    rsi_low  = (feats["rsi"] < min(params.get("rsi_lo", 30.0), feats["rsi_q20"]))
 
-    atr = _atr_wilder(b, 14)
-    last_atr = float(atr.iloc[-1]) if len(atr) else (abs(H - L) / 14.0)
+    last_atr = feats["atr"] if feats["atr"] is not None else (abs(piv["R3"] - piv["P"]) / 14.0)  # |H-L|/14
 
     price = float(last_price)
 
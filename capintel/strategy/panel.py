@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+Панель баров [тикер × время × поле] и векторные ядра индикаторов сразу по всем тикерам.
+Рекурсии (EMA, HA) идут циклом по времени, но каждый шаг — одна numpy-операция по всем тикерам.
+NaN = нет бара у тикера (ещё не торгуется, выходной и т.п.): пропуски просто пропускаются,
+т.е. результат по строке совпадает с батч-функциями my_strategy на барах этого тикера без NaN.
+"""
+
+from __future__ import annotations
+import warnings
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+FIELDS = ("o", "h", "l", "c", "v")
+
+
+class BarPanel:
+    __slots__ = ("tickers", "index", "data")
+
+    def __init__(self, tickers: Sequence[str], index: pd.DatetimeIndex, data: np.ndarray):
+        if data.shape != (len(tickers), len(index), len(FIELDS)):
+            raise ValueError(f"data shape {data.shape} != ({len(tickers)}, {len(index)}, {len(FIELDS)})")
+        self.tickers = list(tickers)
+        self.index = index
+        self.data = np.ascontiguousarray(data, dtype=np.float64)
+
+    @classmethod
+    def from_frames(cls, frames: Dict[str, pd.DataFrame]) -> "BarPanel":
+        """frames: {тикер: DataFrame o,h,l,c[,v] с DatetimeIndex} → общая ось времени (объединение)."""
+        tickers = list(frames)
+        index = pd.DatetimeIndex([])
+        for df in frames.values():
+            index = index.union(df.index)
+        data = np.full((len(tickers), len(index), len(FIELDS)), np.nan)
+        for i, t in enumerate(tickers):
+            df = frames[t]
+            pos = index.get_indexer(df.index)
+            for j, f in enumerate(FIELDS):
+                if f in df.columns:
+                    data[i, pos, j] = df[f].to_numpy(dtype=float)
+        return cls(tickers, index, data)
+
+    def field(self, name: str) -> np.ndarray:
+        """[тикер × время] — view без копирования."""
+        return self.data[:, :, FIELDS.index(name)]
+
+    def frame(self, ticker: str) -> pd.DataFrame:
+        arr = self.data[self.tickers.index(ticker)]
+        return pd.DataFrame(arr, index=self.index, columns=list(FIELDS)).dropna(subset=["c"])
+
+
+# ------------------------- ядра [тикер × время] -------------------------
+
+def ema_panel(x: np.ndarray, span: int, wilder: bool = False) -> np.ndarray:
+    """Построчно как _ema (ewm adjust=False) по не-NaN значениям; на пропуске держим прошлое значение."""
+    alpha = (1.0 / span) if wilder else (2.0 / (span + 1.0))
+    out = np.empty_like(x, dtype=float)
+    y = np.full(x.shape[0], np.nan)
+    for t in range(x.shape[1]):
+        xt = x[:, t]
+        y = np.where(np.isnan(y), xt, np.where(np.isnan(xt), y, (1.0 - alpha) * y + alpha * xt))
+        out[:, t] = y
+    return out
+
+def _prev_valid(x: np.ndarray) -> np.ndarray:
+    """Предыдущее не-NaN значение строки (NaN, если его нет) — аналог shift(1) по барам тикера."""
+    valid = ~np.isnan(x)
+    pos = np.where(valid, np.arange(x.shape[1]), -1)
+    np.maximum.accumulate(pos, axis=1, out=pos)
+    prev = np.full_like(x, np.nan)
+    prev_pos = pos[:, :-1]
+    prev[:, 1:] = np.where(prev_pos >= 0, np.take_along_axis(x, np.maximum(prev_pos, 0), axis=1), np.nan)
+    return prev
+
+def rsi_wilder_panel(close: np.ndarray, n: int = 14) -> np.ndarray:
+    d = close - _prev_valid(close)
+    au = ema_panel(np.where(np.isnan(d), np.nan, np.maximum(d, 0.0)), n, wilder=True)
+    ad = ema_panel(np.where(np.isnan(d), np.nan, np.maximum(-d, 0.0)), n, wilder=True)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rs = au / np.where(ad == 0, np.nan, ad)
+        rsi = 100.0 - 100.0 / (1.0 + rs)
+    return np.where(np.isnan(rsi), 50.0, rsi)
+
+def atr_wilder_panel(h: np.ndarray, l: np.ndarray, c: np.ndarray, n: int = 14) -> np.ndarray:
+    cs = _prev_valid(c)
+    tr = np.fmax(np.fmax(h - l, np.abs(h - cs)), np.abs(l - cs))
+    return ema_panel(tr, n, wilder=True)
+
+def macd_hist_panel(close: np.ndarray) -> np.ndarray:
+    macd = ema_panel(close, 12) - ema_panel(close, 26)
+    return macd - ema_panel(macd, 9)
+
+def heikin_ashi_panel(o: np.ndarray, h: np.ndarray, l: np.ndarray, c: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    ha_close = (o + h + l + c) / 4.0
+    ha_open = np.full_like(ha_close, np.nan)
+    po = np.full(o.shape[0], np.nan)
+    pc = np.full(o.shape[0], np.nan)
+    for t in range(o.shape[1]):
+        valid = ~np.isnan(ha_close[:, t])
+        cur = np.where(np.isnan(po), (o[:, t] + c[:, t]) / 2.0, (po + pc) / 2.0)
+        ha_open[:, t] = np.where(valid, cur, np.nan)
+        po = np.where(valid, cur, po)
+        pc = np.where(valid, ha_close[:, t], pc)
+    return ha_open, ha_close
+
+def last_streak_panel(values: np.ndarray, positive: bool = True) -> np.ndarray:
+    """Длина последней серии знака по барам каждого тикера (ноль рвёт серию) — как _last_streak_length."""
+    packed, _ = _last_valid(values, values.shape[1])
+    cond = (packed > 0) if positive else (packed < 0)
+    rev = cond[:, ::-1]
+    return np.where(rev.all(axis=1), rev.shape[1], rev.argmin(axis=1)).astype(int)
+
+def _last_valid(values: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Последние k не-NaN значений каждой строки (слева NaN, если их меньше) и число валидных."""
+    valid = ~np.isnan(values)
+    order = np.argsort(valid, axis=1, kind="stable")     # NaN в начало, порядок валидных сохраняется
+    packed = np.take_along_axis(values, order, axis=1)
+    return packed[:, -k:], valid.sum(axis=1)
+
+def deceleration_panel(values: np.ndarray, lookback: int = 3) -> np.ndarray:
+    """Убывание |values| на последних lookback валидных барах — как _deceleration_abs."""
+    tail, n_valid = _last_valid(values, lookback)
+    tail = np.abs(tail)
+    with np.errstate(invalid="ignore"):
+        ok = np.all(tail[:, 1:] <= tail[:, :-1], axis=1)
+    return ok & (n_valid >= lookback + 3)
+
+
+def last_bar_features(panel: BarPanel, rsi_window: int = 200) -> Dict[str, np.ndarray]:
+    """Признаки стратегии на последнем баре для всех тикеров сразу (см. generate_signal_core)."""
+    o, h, l, c = (panel.field(f) for f in ("o", "h", "l", "c"))
+    ha_o, ha_c = heikin_ashi_panel(o, h, l, c)
+    ha_d = ha_c - ha_o
+    gap = np.isnan(c)                             # значения — только на реальных барах тикера
+    hist = np.where(gap, np.nan, macd_hist_panel(c))
+    rsi = np.where(gap, np.nan, rsi_wilder_panel(c, 14))
+    atr = np.where(gap, np.nan, atr_wilder_panel(h, l, c, 14))
+    rsi_tail, n_bars = _last_valid(rsi, rsi_window)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)   # тикеры без баров
+        q20, q80 = np.nanpercentile(rsi_tail, [20, 80], axis=1)
+    enough = n_bars >= 50
+    last = lambda x: _last_valid(x, 1)[0][:, 0]
+    return {
+        "n_bars": n_bars,
+        "ha_green_streak": last_streak_panel(ha_d, True), "ha_red_streak": last_streak_panel(ha_d, False),
+        "ha_last": last(ha_d),
+        "macd_pos_streak": last_streak_panel(hist, True), "macd_neg_streak": last_streak_panel(hist, False),
+        "macd_decel_pos": deceleration_panel(np.where(np.isnan(hist), np.nan, np.maximum(hist, 0.0))),
+        "macd_decel_neg": deceleration_panel(np.where(np.isnan(hist), np.nan, np.maximum(-hist, 0.0))),
+        "rsi_last": last(rsi),
+        "rsi_q20": np.where(enough, q20, 30.0), "rsi_q80": np.where(enough, q80, 70.0),
+        "atr_last": last(atr),
+    }
@@ -0,0 +1,257 @@
+# capintel/sweep.py
+"""
+Перебор порогов стратегии (ha, macd, tol, rsi_hi, rsi_lo) по сетке.
+Индикаторы и пивоты от порогов не зависят: один проход replay-логики на тикер (features) даёт
+по каждому бару серии HA/MACD, RSI и его квантили, пивоты. Дальше правила decide считаются
+сразу для всей сетки матрицами [бар × набор], выходы из сделок — окнами [сигнал × max_hold].
+Модель исполнения та же, что у replay (вход по close, стоп раньше цели, timeout через max_hold,
+exclusive=True — новый вход только после выхода), поэтому итог по набору совпадает с replay(params=набор).
+
+    g = grid("swing", ha=[3, 4, 5, 6], macd=[4, 6, 8], tol=np.linspace(0.005, 0.02, 8), rsi_hi=[65, 70, 75])
+    res = sweep(frames, g, horizon="swing", workers=None)
+    res["summary"].sort_values("total_pnl", ascending=False).head()
+
+    python -m capintel.sweep AAPL MSFT --horizon swing --ha 3 4 5 6 --tol 0.006 0.009 0.012 --out sweep.csv
+"""
+
+import argparse
+import itertools
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from capintel.replay import PeriodTracker, _period_ids, load_history
+from capintel.strategy import my_strategy as ms
+from capintel.strategy.indicators import IndicatorSet
+
+PARAMS = ("ha", "macd", "tol", "rsi_hi", "rsi_lo")
+METRICS = ("trades", "hit_rate", "stop_rate", "win_rate", "mean_pnl", "total_pnl", "avg_bars_held")
+_PIV = ("P", "R1", "R2", "R3", "S1", "S2", "S3")
+_SUMS = 6   # trades, tp, stop, wins, pnl, bars
+
+
+def grid(horizon: str = "swing", **axes: Iterable[float]) -> pd.DataFrame:
+    """Декартово произведение осей; не заданные оси — значения горизонта из _horizon_params."""
+    base = ms._horizon_params(horizon)
+    unknown = set(axes) - set(PARAMS)
+    if unknown:
+        raise ValueError(f"Неизвестные параметры: {sorted(unknown)}")
+    values = [list(axes[p]) if p in axes else [base[p]] for p in PARAMS]
+    return pd.DataFrame(list(itertools.product(*values)), columns=list(PARAMS))
+
+
+def features(daily: pd.DataFrame, horizon: str = "swing", bars: Optional[pd.DataFrame] = None,
+             warmup: int = 50) -> Dict[str, np.ndarray]:
+    """По бару рабочего ТФ: всё, от чего зависят вход и уровни decide() в replay (valid — бар, где replay ищет вход)."""
+    work = ms._standardize_bars(daily if bars is None else bars)
+    d = ms._standardize_bars(daily)
+    p = ms._PIVOT_PERIODS[horizon][0]   # старший ТФ влияет только на confidence — не нужен
+    tracker, pids = PeriodTracker(p), _period_ids(d.index, p)
+    dt, dh, dl, dc = d.index.asi8, d["h"].to_numpy(), d["l"].to_numpy(), d["c"].to_numpy()
+    wt = work.index.asi8
+    wo, wh, wl, wc = (work[k].to_numpy() for k in ("o", "h", "l", "c"))
+
+    n = len(work)
+    cols = ("ha_green_streak", "ha_red_streak", "macd_pos_streak", "macd_neg_streak",
+            "macd_decel_pos", "macd_decel_neg", "rsi", "rsi_q20", "rsi_q80")
+    out = {k: np.zeros(n) for k in cols + _PIV}
+    valid = np.zeros(n, dtype=bool)
+    ind = IndicatorSet()
+    j = 0
+    for i in range(n):
+        while j < len(d) and dt[j] <= wt[i]:
+            tracker.update(int(pids[j]), dh[j], dl[j], dc[j])
+            j += 1
+        ind.update(float(wo[i]), float(wh[i]), float(wl[i]), float(wc[i]))
+        if ind.n < warmup or j == 0:
+            continue
+        valid[i] = True
+        f = ind.features(lazy=False)   # квантили нужны при любых rsi_hi/rsi_lo сетки
+        for k in cols:
+            out[k][i] = f[k]
+        piv = tracker.pivots()
+        for k in _PIV:
+            out[k][i] = piv[k]
+    out.update(valid=valid, h=wh.astype(float), l=wl.astype(float), c=wc.astype(float))
+    return out
+
+
+def _near(price: np.ndarray, level: np.ndarray, tol: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (level > 0) & (np.abs(price - level) / level <= tol)
+
+def evaluate(f: Dict[str, np.ndarray], params: pd.DataFrame, max_hold: int = 20, target: str = "tp1",
+             fee_bp: float = 2.0, exclusive: bool = True) -> np.ndarray:
+    """
+    Суммы по наборам сетки для одного тикера: [len(params), 6] — trades, tp, stop, wins, sum pnl, sum bars_held
+    (закрытые сделки; незакрытая к концу данных не считается, как в replay.summarize).
+    """
+    rows = np.flatnonzero(f["valid"])
+    out = np.zeros((len(params), _SUMS))
+    if not len(rows) or not len(params):
+        return out
+    col = lambda k: f[k][rows][:, None]                                  # noqa: E731 — [бар, 1]
+    prm = lambda k: params[k].to_numpy(dtype=float)[None, :]             # noqa: E731 — [1, набор]
+    c, tol = col("c"), prm("tol")
+    P, R1, R2, R3, S1, S2, S3 = (col(k) for k in _PIV)
+
+    near_R2, near_R3, near_S2, near_S3 = _near(c, R2, tol), _near(c, R3, tol), _near(c, S2, tol), _near(c, S3, tol)
+    ha_g, ha_r = col("ha_green_streak") >= prm("ha"), col("ha_red_streak") >= prm("ha")
+    mps, mns, macd = col("macd_pos_streak"), col("macd_neg_streak"), prm("macd")
+    rsi = col("rsi")
+    rsi_high = rsi > np.maximum(prm("rsi_hi"), col("rsi_q80"))
+    rsi_low = rsi < np.minimum(prm("rsi_lo"), col("rsi_q20"))
+    overheat = (near_R2 | near_R3) & ((ha_g | (mps >= macd)) & (col("macd_decel_pos").astype(bool) | rsi_high))
+    oversold = (near_S2 | near_S3) & ((ha_r | (mns >= macd)) & (col("macd_decel_neg").astype(bool) | rsi_low))
+    short = overheat & (near_R3 | ((mps >= macd + 2) & rsi_high))
+    buy = ~overheat & oversold & (near_S3 | ((mns >= macd + 2) & rsi_low))
+
+    bi, si = np.nonzero(short | buy)                # сигналы: (строка rows, набор)
+    if not len(bi):
+        return out
+    is_buy = buy[bi, si]
+    b3, r3 = near_S3[bi, si], near_R3[bi, si]
+    t = tol[0, si]
+    g = lambda a: a[bi, 0]                          # noqa: E731
+    if target == "tp1":
+        tp = np.where(is_buy, np.where(b3, g(S2), (g(P) + g(R1)) / 2.0), np.where(r3, g(R2), (g(P) + g(S1)) / 2.0))
+    else:
+        tp = np.where(is_buy, np.where(b3, g(P), g(R2)), np.where(r3, g(P), g(S2)))
+    stop = np.where(is_buy, np.where(b3, g(S3) * (1.0 - t), g(S2) * (1.0 - t)),
+                    np.where(r3, g(R3) * (1.0 + t), g(R2) * (1.0 + t)))
+    entry = g(c)
+
+    # выход: первый бар из (i, i + max_hold] со стопом/целью, иначе close бара i + max_hold, иначе «open»
+    H, L, C = f["h"], f["l"], f["c"]
+    n = len(C)
+    i0 = rows[bi]
+    idx = i0[:, None] + np.arange(1, max_hold + 1)[None, :]
+    inside = idx < n
+    idc = np.minimum(idx, n - 1)
+    hh, ll = H[idc], L[idc]
+    b = is_buy[:, None]
+    stop_hit = np.where(b, ll <= stop[:, None], hh >= stop[:, None]) & inside
+    tp_hit = np.where(b, hh >= tp[:, None], ll <= tp[:, None]) & inside
+    hit = stop_hit | tp_hit
+    any_hit = hit.any(axis=1)
+    k = hit.argmax(axis=1)
+    by_stop = stop_hit[np.arange(len(k)), k]
+    timeout = ~any_hit & (i0 + max_hold < n)
+    closed = any_hit | timeout
+    exit_i = np.where(any_hit, i0 + k + 1, np.where(timeout, i0 + max_hold, n))
+    px = np.where(any_hit, np.where(by_stop, stop, tp), C[np.minimum(i0 + max_hold, n - 1)])
+    pnl = np.where(is_buy, (px - entry) / entry, (entry - px) / entry) - fee_bp / 10000.0
+
+    take = np.ones(len(bi), dtype=bool)
+    if exclusive:   # как replay: пока позиция открыта (до бара выхода включительно), входов нет
+        take[:] = False
+        order = np.lexsort((i0, si))
+        cur, free = -1, -1
+        for q, s, i, e in zip(order.tolist(), si[order].tolist(), i0[order].tolist(), exit_i[order].tolist()):
+            if s != cur:
+                cur, free = s, -1
+            if i > free:
+                take[q] = True
+                free = e
+    m = take & closed
+    tp_out = m & any_hit & ~by_stop
+    st_out = m & any_hit & by_stop
+    cnt = lambda mask, w=None: np.bincount(si[mask], weights=None if w is None else w[mask], minlength=len(params))  # noqa: E731
+    out[:, 0] = cnt(m)
+    out[:, 1] = cnt(tp_out)
+    out[:, 2] = cnt(st_out)
+    out[:, 3] = cnt(m & (pnl > 0))
+    out[:, 4] = cnt(m, pnl)
+    out[:, 5] = cnt(m, (exit_i - i0).astype(float))
+    return out
+
+
+def _sweep_one(args):
+    ticker, daily, params, kw, chunk = args
+    try:
+        f = features(daily, kw["horizon"], warmup=kw.pop("warmup", 50))
+        ev = {k: v for k, v in kw.items() if k != "horizon"}
+        parts = [evaluate(f, params.iloc[a:a + chunk], **ev) for a in range(0, len(params), chunk)]
+        return ticker, np.vstack(parts)
+    except Exception as e:  # noqa — один тикер не роняет прогон
+        return ticker, f"{type(e).__name__}: {e}"
+
+
+def sweep(
+    frames: Dict[str, pd.DataFrame],
+    params: pd.DataFrame,
+    horizon: str = "swing",
+    workers: Optional[int] = 0,
+    grid_chunk: int = 1000,
+    **kw,
+) -> Dict[str, Any]:
+    """
+    frames: {тикер: дневные бары}; params — сетка (grid()). workers=0 — последовательно, None — пул по числу ядер.
+    kw: max_hold, target, fee_bp, exclusive, warmup.
+    Возвращает {"summary": сетка + метрики replay.summarize по всей вселенной, "errors": {тикер: ошибка}}.
+    """
+    params = params.reset_index(drop=True)
+    missing = set(PARAMS) - set(params.columns)
+    if missing:
+        params = params.assign(**{p: ms._horizon_params(horizon)[p] for p in missing})
+    jobs = [(t, df, params, dict(kw, horizon=horizon), grid_chunk) for t, df in frames.items()]
+    if workers == 0:
+        results = [_sweep_one(j) for j in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            results = list(ex.map(_sweep_one, jobs, chunksize=max(1, len(jobs) // 64)))
+
+    total, errors = np.zeros((len(params), _SUMS)), {}
+    for t, r in results:
+        if isinstance(r, str):
+            errors[t] = r
+        else:
+            total += r
+    n = total[:, 0]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rate = lambda x: np.where(n > 0, x / n, 0.0)   # noqa: E731
+        summary = params.assign(
+            trades=n.astype(int), hit_rate=rate(total[:, 1]), stop_rate=rate(total[:, 2]),
+            win_rate=rate(total[:, 3]), mean_pnl=rate(total[:, 4]), total_pnl=total[:, 4],
+            avg_bars_held=rate(total[:, 5]),
+        )
+    return {"summary": summary, "errors": errors}
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m capintel.sweep", description="Перебор порогов my_strategy по сетке.")
+    ap.add_argument("tickers", nargs="*")
+    ap.add_argument("--file", help="файл с тикерами (по одному в строке)")
+    ap.add_argument("--asset-class", default="equity", choices=["equity", "crypto"])
+    ap.add_argument("--horizon", default="swing", choices=["intraday", "swing", "position"])
+    for p in PARAMS:
+        ap.add_argument(f"--{p.replace('_', '-')}", dest=p, type=float, nargs="+", help=f"значения {p}")
+    ap.add_argument("--max-hold", type=int, default=20)
+    ap.add_argument("--target", default="tp1", choices=["tp1", "tp2"])
+    ap.add_argument("--workers", type=int, default=None, help="процессов (по умолчанию — по числу ядер)")
+    ap.add_argument("--out", help="CSV/Parquet с итогами (иначе — топ-20 в stdout)")
+    args = ap.parse_args(argv)
+
+    tickers = list(args.tickers)
+    if args.file:
+        with open(args.file, encoding="utf-8") as fh:
+            tickers += [ln.strip() for ln in fh if ln.strip() and not ln.startswith("#")]
+    if not tickers:
+        ap.error("нужны тикеры (аргументы или --file)")
+    g = grid(args.horizon, **{p: getattr(args, p) for p in PARAMS if getattr(args, p)})
+    frames = load_history((t, args.asset_class) for t in tickers)
+    res = sweep(frames, g, args.horizon, workers=args.workers, max_hold=args.max_hold, target=args.target)
+    out = res["summary"].sort_values("total_pnl", ascending=False)
+    if args.out:
+        (out.to_parquet if args.out.endswith(".parquet") else out.to_csv)(args.out, index=False)
+    else:
+        sys.stdout.write(out.head(20).to_string(index=False) + "\n")
+    for t, err in sorted(res["errors"].items()):
+        sys.stderr.write(f"{t}: {err}\n")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,18 @@
+import io
+import threading
+from functools import lru_cache
+
 import numpy as np
 import matplotlib
 import matplotlib.pyplot as plt
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import PatchCollection
+from matplotlib.figure import Figure
 from matplotlib.patches import Wedge
 from matplotlib import patheffects
 
+from .visuals_svg import quantize_score, _status
+
 # Цветовые опорные точки (слева→право): оранжевый → светло-жёлтый → бирюзовый → салатовый
 STOPS = ["#FFA500", "#FFFACD", "#40E0D0", "#7CFC00"]
 BOUNDS_DEG = np.linspace(-180, 0, 401)  # 400 тонких секторов для гладкого градиента
@@ -18,45 +27,100 @@ def _interp_color(t: float):
     c = (1 - f) * c0 + f * c1
     return c
 
-def render_sentiment_gauge(score: float, theme_bg: str = "#0E1117"):
-    """Полукруг [-2..+2], тёмная тема, градиент, сглаженные края, минимум текста."""
-    score = float(np.clip(score, -2.0, 2.0))
-
-    fig, ax = plt.subplots(figsize=(7.2, 4.0), dpi=300)  # Retina-чётко
-    fig.patch.set_facecolor(theme_bg)
-    ax.set_facecolor(theme_bg)
+@lru_cache(maxsize=1)
+def _gradient_colors() -> np.ndarray:
+    """Цвета всех секторов разом (то же, что _interp_color по каждому), [400, 3]."""
+    n = len(BOUNDS_DEG) - 1
+    t = np.arange(n) / (n - 1)
+    j = np.minimum(2, (t * 3).astype(int))
+    f = (t * 3 - j)[:, None]
+    stops = np.array([matplotlib.colors.to_rgb(s) for s in STOPS])
+    return (1 - f) * stops[j] + f * stops[j + 1]
 
-    # Градиентная дуга
-    for i in range(len(BOUNDS_DEG) - 1):
-        t = i / (len(BOUNDS_DEG) - 2)
-        color = _interp_color(t)
-        ax.add_patch(Wedge((0, 0), 1.0, BOUNDS_DEG[i], BOUNDS_DEG[i + 1], width=0.18,
-                           facecolor=color, edgecolor="none"))
+def _draw_static(fig, ax):
+    """Всё, что не зависит от оценки: дуга-градиент одной коллекцией, обводка, заголовок."""
+    wedges = [Wedge((0, 0), 1.0, BOUNDS_DEG[i], BOUNDS_DEG[i + 1], width=0.18)
+              for i in range(len(BOUNDS_DEG) - 1)]
+    ax.add_collection(PatchCollection(wedges, facecolors=_gradient_colors(), edgecolors="none"))
 
     # Внешняя белая обводка
     theta = np.linspace(-np.pi, 0, 512)
     ax.plot(np.cos(theta), np.sin(theta), color="white", lw=2.2, alpha=0.95)
 
-    # Стрелка
+    ax.text(0, 1.07, "Общая оценка", ha="center", va="bottom", color="white",
+            fontsize=14, weight="bold")
+
+def _draw_needle(ax, score: float, animated: bool = False):
     angle = (score + 2.0) / 4.0 * np.pi - np.pi
     line, = ax.plot([0, 0.86 * np.cos(angle)], [0, 0.86 * np.sin(angle)],
-                    color="white", lw=5, solid_capstyle="round", zorder=5)
+                    color="white", lw=5, solid_capstyle="round", zorder=5, animated=animated)
     line.set_path_effects([patheffects.Stroke(linewidth=7, foreground="#000000", alpha=0.25),
                            patheffects.Normal()])
-    ax.scatter([0], [0], s=30, c="white", zorder=6, edgecolors="#000000", linewidths=0.3)
-
-    # Подписи (минимум)
-    ax.text(0, 1.07, "Общая оценка", ha="center", va="bottom", color="white",
-            fontsize=14, weight="bold")
-    label = "Нейтрально"
-    if score > 1.0:   label = "Активно покупать"
-    elif score > 0.15:label = "Покупать"
-    elif score < -1.0:label = "Активно продавать"
-    elif score < -0.15:label = "Продавать"
-    ax.text(0, -0.21, label, ha="center", va="center", color="white",
-            fontsize=12, weight="bold")
+    hub = ax.scatter([0], [0], s=30, c="white", zorder=6, edgecolors="#000000", linewidths=0.3,
+                     animated=animated)
+    label = ax.text(0, -0.21, _status(score), ha="center", va="center", color="white",
+                    fontsize=12, weight="bold", animated=animated)
+    return line, hub, label
 
+def _finish(fig, ax):
     ax.set_aspect("equal")
     ax.axis("off")
     fig.tight_layout()
+
+def render_sentiment_gauge(score: float, theme_bg: str = "#0E1117"):
+    """Полукруг [-2..+2], тёмная тема, градиент, сглаженные края, минимум текста."""
+    score = float(np.clip(score, -2.0, 2.0))
+
+    fig, ax = plt.subplots(figsize=(7.2, 4.0), dpi=300)  # Retina-чётко
+    fig.patch.set_facecolor(theme_bg)
+    ax.set_facecolor(theme_bg)
+    _draw_static(fig, ax)
+    _draw_needle(ax, score)
+    _finish(fig, ax)
     return fig
+
+# ------------------------- быстрый PNG (блиттинг на кэшированный фон) -------------------------
+
+class _GaugeCanvas:
+    """Agg-холст с отрисованным фоном; на вызов — restore_region + стрелка и подпись."""
+
+    def __init__(self, theme_bg: str, dpi: int):
+        self.fig = Figure(figsize=(7.2, 4.0), dpi=dpi)
+        self.canvas = FigureCanvasAgg(self.fig)
+        self.ax = self.fig.add_subplot()
+        self.fig.patch.set_facecolor(theme_bg)
+        self.ax.set_facecolor(theme_bg)
+        _draw_static(self.fig, self.ax)
+        self.line, self.hub, self.label = _draw_needle(self.ax, 0.0, animated=True)
+        _finish(self.fig, self.ax)
+        self.canvas.draw()
+        self.background = self.canvas.copy_from_bbox(self.fig.bbox)
+        self.lock = threading.Lock()
+
+    def png(self, score: float) -> bytes:
+        from PIL import Image   # Pillow — зависимость matplotlib
+
+        angle = (score + 2.0) / 4.0 * np.pi - np.pi
+        with self.lock:
+            self.canvas.restore_region(self.background)
+            self.line.set_data([0, 0.86 * np.cos(angle)], [0, 0.86 * np.sin(angle)])
+            self.label.set_text(_status(score))
+            for artist in (self.line, self.hub, self.label):
+                self.ax.draw_artist(artist)
+            w, h = self.canvas.get_width_height()
+            img = Image.frombuffer("RGBA", (w, h), bytes(self.canvas.buffer_rgba()), "raw", "RGBA", 0, 1)
+        buf = io.BytesIO()
+        img.save(buf, format="PNG", compress_level=1)
+        return buf.getvalue()
+
+@lru_cache(maxsize=8)
+def _gauge_canvas(theme_bg: str, dpi: int) -> _GaugeCanvas:
+    return _GaugeCanvas(theme_bg, dpi)
+
+@lru_cache(maxsize=512)
+def _gauge_png(score: float, theme_bg: str, dpi: int) -> bytes:
+    return _gauge_canvas(theme_bg, dpi).png(score)
+
+def render_sentiment_gauge_png(score: float, theme_bg: str = "#0E1117", dpi: int = 300, step: float = 0.05) -> bytes:
+    """PNG прибора: фон рисуется один раз на (тему, dpi), байты кэшируются по квантованной оценке."""
+    return _gauge_png(quantize_score(score, step), theme_bg, int(dpi))
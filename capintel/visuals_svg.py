@@ -1,5 +1,8 @@
 # capintel/visuals_svg.py
+import hashlib
 import math
+from functools import lru_cache
+from typing import Tuple
 
 STOPS = ["#FFA500", "#FFFACD", "#40E0D0", "#7CFC00"]
 
@@ -10,23 +13,25 @@ def _arc_path(cx, cy, r, start_deg, end_deg):
     large_arc = 1 if abs(end_deg - start_deg) > 180 else 0
     return f"M {x1:.2f},{y1:.2f} A {r:.2f},{r:.2f} 0 {large_arc} 1 {x2:.2f},{y2:.2f}"
 
-def render_gauge_svg(
-    score: float,
-    prev_score: float | None = None,
-    max_width: int = 660,       # «потолок» ширины
-    scale: float = 0.85,        # ↓ общий размер прибора (0.70–1.00)
-    font_scale: float = 0.88,   # ↓ шрифты (0.70–1.10)
-    dark_bg: str = "#0E1117",
-    animate: bool = True,
-    duration_ms: int = 900,
-) -> str:
-    score = max(-2.0, min(2.0, float(score)))
-    if prev_score is None:
-        animate = False
-        prev_score = score
-    else:
-        prev_score = max(-2.0, min(2.0, float(prev_score)))
+_NEEDLE, _STATUS = "\x00needle\x00", "\x00status\x00"
+
+def _status(score: float) -> str:
+    status = "Нейтрально"
+    if score > 1.0:   status = "Активно покупать"
+    elif score > 0.15:status = "Покупать"
+    elif score < -1.0:status = "Активно продавать"
+    elif score < -0.15:status = "Продавать"
+    return status
+
+def _to_angle(s: float) -> float:
+    return -180 + 180 * (s + 2.0) / 4.0
 
+@lru_cache(maxsize=64)
+def _gauge_template(max_width: int, scale: float, font_scale: float, dark_bg: str, standalone: bool = False):
+    """
+    Статичная часть прибора (defs, градиент, засечки, стили) — один раз на набор параметров.
+    Возвращает (части шаблона вокруг стрелки и статуса, геометрия стрелки).
+    """
     # Геометрия (компактнее)
     W = int(max_width * scale)
     H = int(W * 0.60)
@@ -35,18 +40,6 @@ def render_gauge_svg(
     outline_w   = 2
     tick_in, tick_out, tick_txt = R - 10, R + 3, R + 38
 
-    def to_angle(s: float) -> float:
-        return -180 + 180 * (s + 2.0) / 4.0
-
-    start_ang = to_angle(prev_score)
-    end_ang   = to_angle(score)
-
-    status = "Нейтрально"
-    if score > 1.0:   status = "Активно покупать"
-    elif score > 0.15:status = "Покупать"
-    elif score < -1.0:status = "Активно продавать"
-    elif score < -0.15:status = "Продавать"
-
     # Засечки и числа (вернули 0)
     ticks = [(-180, "−2"), (-135, "−1"), (-90, "0"), (-45, "+1"), (0, "+2")]
     tick_lines, tick_texts = [], []
@@ -86,22 +79,18 @@ def render_gauge_svg(
     needle_w   = max(2, int(W * 0.012))   # тоньше стрелка
     hub_r      = max(2, int(W * 0.010))
 
-    needle = f"""
-    <g transform="rotate({start_ang:.2f} {cx:.1f} {cy:.1f})">
-      <line x1="{cx:.1f}" y1="{cy:.1f}" x2="{cx + needle_len:.1f}" y2="{cy:.1f}"
-            stroke="#FFFFFF" stroke-width="{needle_w}" stroke-linecap="round" />
-      <circle cx="{cx:.1f}" cy="{cy:.1f}" r="{hub_r}" fill="#FFFFFF"/>
-      {f'<animateTransform attributeName="transform" attributeType="XML" type="rotate" from="{start_ang:.2f} {cx:.1f} {cy:.1f}" to="{end_ang:.2f} {cx:.1f} {cy:.1f}" dur="{duration_ms}ms" fill="freeze"/>' if animate else ''}
-    </g>
-    """
-
     title_y  = H * 0.06   # выше нуля
     status_y = H * 0.95
 
-    return f"""
-<div style="max-width:{W}px;width:100%;margin:0 auto;">
-  <svg viewBox="0 0 {W} {H}" width="100%" height="auto" preserveAspectRatio="xMidYMid meet"
-       xmlns="http://www.w3.org/2000/svg" style="background:{dark_bg}; border-radius:12px">
+    if standalone:
+        # самостоятельный SVG-файл (для <img> / CDN): явные размеры, без обёртки-div
+        svg_open = (f'<svg viewBox="0 0 {W} {H}" width="{W}" height="{H}" '
+                    f'xmlns="http://www.w3.org/2000/svg" style="background:{dark_bg}; border-radius:12px">')
+    else:
+        svg_open = f"""<svg viewBox="0 0 {W} {H}" width="100%" height="auto" preserveAspectRatio="xMidYMid meet"
+       xmlns="http://www.w3.org/2000/svg" style="background:{dark_bg}; border-radius:12px">"""
+
+    body = f"""{svg_open}
     <style>
       .t {{ fill:#FFFFFF; font-family:-apple-system, Segoe UI, Roboto, Helvetica, Arial, sans-serif; }}
       .h1 {{ font-weight:700; font-size:{fs_title}px; letter-spacing:0.3px; }}
@@ -120,11 +109,68 @@ def render_gauge_svg(
     {''.join(tick_texts)}
 
     <!-- Стрелка -->
-    {needle}
+    {_NEEDLE}
 
     <!-- Заголовок и статус -->
     <text x="{W/2}" y="{title_y}"  text-anchor="middle" class="t h1 halo">Общая оценка</text>
-    <text x="{W/2}" y="{status_y}" text-anchor="middle" class="t h2 halo">{status}</text>
-  </svg>
+    <text x="{W/2}" y="{status_y}" text-anchor="middle" class="t h2 halo">{_STATUS}</text>
+  </svg>"""
+
+    doc = body + "\n" if standalone else f"""
+<div style="max-width:{W}px;width:100%;margin:0 auto;">
+  {body}
 </div>
 """
+    head, rest = doc.split(_NEEDLE)
+    mid, tail = rest.split(_STATUS)
+    return (head, mid, tail), (f"{cx:.1f}", f"{cy:.1f}", f"{cx + needle_len:.1f}", needle_w, hub_r)
+
+def render_gauge_svg(
+    score: float,
+    prev_score: float | None = None,
+    max_width: int = 660,       # «потолок» ширины
+    scale: float = 0.85,        # ↓ общий размер прибора (0.70–1.00)
+    font_scale: float = 0.88,   # ↓ шрифты (0.70–1.10)
+    dark_bg: str = "#0E1117",
+    animate: bool = True,
+    duration_ms: int = 900,
+    standalone: bool = False,   # True — чистый SVG-документ без HTML-обёртки
+) -> str:
+    score = max(-2.0, min(2.0, float(score)))
+    if prev_score is None:
+        animate = False
+        prev_score = score
+    else:
+        prev_score = max(-2.0, min(2.0, float(prev_score)))
+
+    # статичная часть — из кэша; меняются только стрелка и подпись
+    (head, mid, tail), (cx, cy, x2, needle_w, hub_r) = _gauge_template(
+        int(max_width), float(scale), float(font_scale), dark_bg, bool(standalone))
+
+    start_ang = _to_angle(prev_score)
+    end_ang   = _to_angle(score)
+
+    needle = f"""
+    <g transform="rotate({start_ang:.2f} {cx} {cy})">
+      <line x1="{cx}" y1="{cy}" x2="{x2}" y2="{cy}"
+            stroke="#FFFFFF" stroke-width="{needle_w}" stroke-linecap="round" />
+      <circle cx="{cx}" cy="{cy}" r="{hub_r}" fill="#FFFFFF"/>
+      {f'<animateTransform attributeName="transform" attributeType="XML" type="rotate" from="{start_ang:.2f} {cx} {cy}" to="{end_ang:.2f} {cx} {cy}" dur="{duration_ms}ms" fill="freeze"/>' if animate else ''}
+    </g>
+    """
+
+    return head + needle + mid + _status(score) + tail
+
+def quantize_score(score: float, step: float = 0.05) -> float:
+    score = max(-2.0, min(2.0, float(score)))
+    return round(round(score / step) * step, 4)
+
+def gauge_svg_document(score: float, step: float = 0.05) -> Tuple[bytes, str]:
+    """Готовый SVG-файл для квантованной оценки + сильный ETag (кэш на процесс)."""
+    return _gauge_svg_document(quantize_score(score, step))
+
+@lru_cache(maxsize=1024)
+def _gauge_svg_document(q: float) -> Tuple[bytes, str]:
+    # ключ — уже квантованная оценка: произвольные ?score= не вытесняют кэш (не больше 81 записи при шаге 0.05)
+    body = render_gauge_svg(q, animate=False, standalone=True).encode("utf-8")
+    return body, '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
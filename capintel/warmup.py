@@ -0,0 +1,37 @@
+# capintel/warmup.py
+"""
+Прогрев тяжёлых зависимостей по требованию. API грузит numpy/pandas (стратегия, SSE, бэктест) и httpx
+лениво — при первом обращении, чтобы короткоживущий воркер стартовал быстро. warmup() импортирует их
+заранее и открывает HTTP-клиент Polygon, чтобы за импорт не платил первый запрос.
+
+    CAPINTEL_WARMUP=1 uvicorn api.main:app        # прогрев в lifespan, до приёма запросов
+    warmup.warmup()                               # {модуль: секунды}
+"""
+
+import importlib
+import time
+from typing import Dict, Iterable
+
+HEAVY = (
+    "numpy",
+    "pandas",
+    "httpx",
+    "capintel.strategy.my_strategy",
+    "capintel.signal_stream",
+    "capintel.backtest",
+)
+
+
+def warmup(modules: Iterable[str] = HEAVY, http_client: bool = True) -> Dict[str, float]:
+    """Импортировать modules (уже загруженные — ~0 c) и создать клиент Polygon; вернуть время по шагам."""
+    took: Dict[str, float] = {}
+    for name in modules:
+        t0 = time.perf_counter()
+        importlib.import_module(name)
+        took[name] = time.perf_counter() - t0
+    if http_client:
+        from capintel.providers import polygon_client as poly
+        t0 = time.perf_counter()
+        poly.get_client()
+        took["polygon_client"] = time.perf_counter() - t0
+    return took
@@ -0,0 +1,126 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic import synthetic_daily
+
+make_daily = synthetic_daily   # синтетические дневные бары (общие с бенчмарками)
+
+@pytest.fixture
+def offline_bars(monkeypatch):
+    """_fetch_daily_bars без сети — offline_daily."""
+    from capintel.strategy import my_strategy as ms
+
+    monkeypatch.setattr(ms, "_fetch_daily_bars", offline_daily)
+    return offline_daily
+
+def offline_daily(asset_class, ticker, days=500):
+    """Дневные бары без сети: тикер 'BAD' — ошибка, остальные — синтетика (seed по тикеру).
+    Функция уровня модуля — её можно передать воркерам пула (scan_universe(fetch_daily=...))."""
+    from capintel.providers.polygon_client import PolygonError
+
+    if ticker.upper() == "BAD":
+        raise PolygonError("upstream 404")
+    return make_daily(seed=sum(map(ord, ticker.upper())))
+
+class FixtureServer:
+    """Локальный HTTP-сервер вместо Polygon: routes {путь: (статус, json)}; все запросы — в requests."""
+
+    def __init__(self):
+        import json
+        import threading
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        from urllib.parse import urlsplit
+
+        self.routes = {}
+        self.requests = []
+        srv = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = urlsplit(self.path).path
+                srv.requests.append(path)
+                status, payload = srv.routes.get(path, (404, {"status": "NOT_FOUND"}))
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+@pytest.fixture
+def polygon_server(monkeypatch):
+    """Polygon на localhost: poly.BASE указывает на FixtureServer, ключ — тестовый."""
+    from capintel.providers import polygon_client as poly
+    srv = FixtureServer()
+    monkeypatch.setattr(poly, "BASE", srv.url)
+    monkeypatch.setattr(poly, "POLYGON_API_KEY", "test")
+    poly.close_clients()
+    try:
+        yield srv
+    finally:
+        poly.close_clients()
+        srv.close()
+
+class WsFixtureServer:
+    """
+    Стенд WebSocket Polygon: connected → auth → auth_success → subscribe → отправка scripts[i] для i-го подключения.
+    close_after=True — после скрипта соединение рвётся (кроме последнего скрипта).
+    """
+
+    def __init__(self, scripts, close_after=True, api_key="test"):
+        import asyncio
+        import json
+        import threading
+        import websockets
+
+        self.scripts, self.close_after, self.api_key = scripts, close_after, api_key
+        self.connections = 0
+        self.subscriptions = []
+        srv = self
+
+        async def handler(ws):
+            i = srv.connections
+            srv.connections += 1
+            await ws.send(json.dumps([{"ev": "status", "status": "connected"}]))
+            auth = json.loads(await ws.recv())
+            if auth.get("params") != srv.api_key:
+                await ws.send(json.dumps([{"ev": "status", "status": "auth_failed", "message": "bad key"}]))
+                return
+            await ws.send(json.dumps([{"ev": "status", "status": "auth_success"}]))
+            srv.subscriptions.append(json.loads(await ws.recv())["params"])
+            script = srv.scripts[min(i, len(srv.scripts) - 1)]
+            for batch in script:
+                await ws.send(json.dumps(batch))
+            if srv.close_after and i < len(srv.scripts) - 1:
+                return
+            await ws.wait_closed()
+
+        self._loop = asyncio.new_event_loop()
+        started = threading.Event()
+
+        async def main():
+            self._server = await websockets.serve(handler, "127.0.0.1", 0)
+            self.url = f"ws://127.0.0.1:{self._server.sockets[0].getsockname()[1]}"
+            started.set()
+            await self._server.wait_closed()
+
+        self._thread = threading.Thread(target=self._loop.run_until_complete, args=(main(),), daemon=True)
+        self._thread.start()
+        started.wait(5)
+
+    def close(self):
+        self._loop.call_soon_threadsafe(self._server.close)
+        self._thread.join(5)
@@ -0,0 +1,37 @@
+from fastapi.testclient import TestClient
+import api.main as main
+
+client = TestClient(main.app)
+
+def test_signals_batch_partial(monkeypatch):
+    from capintel.providers.polygon_client import PolygonError
+    async def fake_prices(items):
+        return {(ac, t.upper()): (PolygonError("нет цены") if t == "BAD" else 50.0) for ac, t in items}
+    monkeypatch.setattr(main, "aget_last_prices", fake_prices)
+    r = client.post("/signals/batch", json={"items": [
+        {"ticker": "aapl", "asset_class": "equity", "horizon": "swing"},
+        {"ticker": "BAD", "asset_class": "equity", "horizon": "swing"},
+        {"ticker": "BTCUSDT", "asset_class": "crypto", "horizon": "intraday", "last_price": 65000.0},
+    ]})
+    assert r.status_code == 200
+    body = r.json()
+    assert (body["ok"], body["errors"]) == (2, 1)
+    assert body["results"][0]["signal"]["ticker"] == "AAPL"
+    assert body["results"][1]["error"] == "нет цены"
+
+def test_gauge_svg_etag():
+    r = client.get("/gauge.svg", params={"score": 0.51})
+    assert r.status_code == 200 and r.headers["content-type"].startswith("image/svg+xml")
+    assert r.content.startswith(b"<svg") and "Покупать" in r.text
+    etag = r.headers["etag"]
+    assert client.get("/gauge.svg", params={"score": 0.49}).headers["etag"] == etag   # тот же квант
+    r304 = client.get("/gauge.svg", params={"score": 0.5}, headers={"If-None-Match": f'W/{etag}, "x"'})
+    assert r304.status_code == 304 and r304.content == b""
+    assert client.get("/gauge.svg", params={"score": 1.5}).headers["etag"] != etag
+
+def test_gauge_svg_cache_keyed_by_quantized_score():
+    from capintel import visuals_svg
+    visuals_svg._gauge_svg_document.cache_clear()
+    for i in range(50):
+        client.get("/gauge.svg", params={"score": 0.5 + i * 1e-4})
+    assert visuals_svg._gauge_svg_document.cache_info().currsize == 1
@@ -0,0 +1,34 @@
+from capintel.signal_engine import build_signal
+from capintel.backtest import toy_backtest, toy_backtest_mc
+
+def _sig(action):
+    sig = build_signal("AAPL", "equity", "swing", 230.0)
+    while sig.action != action:
+        sig = build_signal(sig.ticker + "X", "equity", "swing", 230.0)
+    return sig
+
+def test_mc_single_path_matches_loop():
+    for action in ("BUY", "SHORT"):
+        sig = _sig(action)
+        one = toy_backtest(sig)
+        mc = toy_backtest_mc(sig, n_paths=1)
+        if mc["unhit_paths"]:
+            assert mc["median_steps"] is None and one["exit_price"] == sig.entry
+        else:
+            assert mc["median_steps"] == one["steps"]
+        assert abs(mc["mean_pnl"] - one["pnl"]) < 1e-12
+
+def test_mc_stats_shape():
+    res = toy_backtest_mc(_sig("BUY"), n_paths=2000)
+    hr = res["hit_rates"]
+    assert abs(sum(hr.values()) - 1.0) < 1e-9
+    q = res["quantiles"]
+    assert q["p05"] <= q["p50"] <= q["p95"]
+    assert toy_backtest_mc(_sig("WAIT"))["hit_rates"]["none"] == 1.0
+
+def test_mc_chunks_match_single_array_and_count_unhit():
+    sig = _sig("BUY")
+    a = toy_backtest_mc(sig, n_paths=1500, n_steps=30)
+    b = toy_backtest_mc(sig, n_paths=1500, n_steps=30, chunk=7)
+    assert a == b
+    assert a["unhit_paths"] == round(a["hit_rates"]["none"] * 1500) > 0   # 30 шагов — часть путей без касания
@@ -0,0 +1,77 @@
+from datetime import date
+import numpy as np
+from capintel.providers.bar_store import BarStore, BAR_DTYPE, _day_ts
+
+def _bars(d0: date, n: int) -> np.ndarray:
+    t0 = _day_ts(d0)
+    out = np.zeros(n, dtype=BAR_DTYPE)
+    out["t"] = t0 + 86400 * np.arange(n)
+    out["c"] = 100 + np.arange(n)
+    out["o"], out["h"], out["l"] = out["c"], out["c"] + 1, out["c"] - 1
+    return out
+
+def test_incremental_topup(tmp_path):
+    full = _bars(date(2024, 1, 1), 40)
+    calls = []
+    def fetch(fr, to):
+        calls.append((fr, to))
+        lo, hi = _day_ts(fr), _day_ts(to)
+        return full[(full["t"] >= lo) & (full["t"] <= hi)]
+
+    store = BarStore(str(tmp_path), refresh_s=60)
+    now = _day_ts(date(2024, 1, 31)) + 3600.0      # 31-е ещё не завершено
+    got = store.daily("X:BTCUSD", date(2024, 1, 1), date(2024, 1, 31), fetch, now=now)
+    assert len(got) == 31 and got["c"][-1] == 130
+    assert len(store._complete("X:BTCUSD")) == 30   # незавершённый бар — в хвосте метаданных
+
+    store.daily("X:BTCUSD", date(2024, 1, 1), date(2024, 1, 31), fetch, now=now + 10)
+    assert len(calls) == 1                          # в пределах refresh_s — без запросов
+
+    now2 = _day_ts(date(2024, 2, 3)) + 3600.0
+    got = store.daily("X:BTCUSD", date(2024, 1, 1), date(2024, 2, 3), fetch, now=now2)
+    assert calls[-1][0] == date(2024, 1, 26)        # докачка хвоста + 5 сохранённых баров для сверки
+    assert np.array_equal(got["t"], full["t"][:34])
+
+def test_merge_backfill(tmp_path):
+    store = BarStore(str(tmp_path))
+    b = _bars(date(2024, 1, 1), 10)
+    store.merge("AAPL", b[5:], now=1e10)
+    store.merge("AAPL", b[:6], now=1e10)
+    assert np.array_equal(store.load("AAPL")["t"], b["t"])
+
+def test_split_in_overlap_triggers_full_refetch(tmp_path):
+    data = {"bars": _bars(date(2024, 1, 1), 40)}
+    calls = []
+    def fetch(fr, to):
+        calls.append((fr, to))
+        full, lo, hi = data["bars"], _day_ts(fr), _day_ts(to)
+        return full[(full["t"] >= lo) & (full["t"] <= hi)]
+
+    store = BarStore(str(tmp_path), refresh_s=60, max_age_s=30 * 86400)
+    now = _day_ts(date(2024, 1, 31)) + 3600.0
+    store.daily("AAPL", date(2024, 1, 1), date(2024, 1, 31), fetch, now=now)
+
+    split = data["bars"].copy()                      # сплит 2:1 — Polygon пересчитал всю историю
+    for k in ("o", "h", "l", "c"):
+        split[k] /= 2
+    data["bars"] = split
+    now2 = _day_ts(date(2024, 2, 3)) + 3600.0
+    got = store.daily("AAPL", date(2024, 1, 1), date(2024, 2, 3), fetch, now=now2)
+    assert calls[-1][0] == date(2024, 1, 1)         # расхождение в перекрытии → перекачка целиком
+    assert np.array_equal(got, split[:34])
+    assert np.array_equal(store._complete("AAPL"), split[:33])
+
+def test_max_age_forces_full_refresh(tmp_path):
+    full = _bars(date(2024, 1, 1), 40)
+    calls = []
+    def fetch(fr, to):
+        calls.append((fr, to))
+        return full[(full["t"] >= _day_ts(fr)) & (full["t"] <= _day_ts(to))]
+
+    store = BarStore(str(tmp_path), refresh_s=60, max_age_s=86400)
+    now = _day_ts(date(2024, 1, 20)) + 3600.0
+    store.daily("AAPL", date(2024, 1, 1), date(2024, 1, 20), fetch, now=now)
+    store.daily("AAPL", date(2024, 1, 1), date(2024, 1, 20), fetch, now=now + 120)
+    assert calls[-1][0] == date(2024, 1, 15)         # обычная докачка
+    store.daily("AAPL", date(2024, 1, 1), date(2024, 1, 21), fetch, now=now + 86400)
+    assert calls[-1][0] == date(2024, 1, 1)          # история старше max_age — целиком
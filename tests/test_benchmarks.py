@@ -0,0 +1,34 @@
+from benchmarks import run as bench
+
+def test_cases_run_offline():
+    names = ["signal.generate_signal_core.warm", "indicator.rsi_wilder", "backtest.toy_backtest", "api.health"]
+    report = bench.run(names, repeats=2, min_time=0.001)
+    for n in names:
+        res = report["results"][n]
+        assert res["median_s"] > 0 and res["loops"] >= 1, (n, res)
+    assert report["meta"]["repeats"] == 2
+
+def test_compare_threshold():
+    base = {"results": {"a": {"median_s": 1.0}, "b": {"median_s": 1.0}, "c": {"median_s": 1.0}, "gone": {"median_s": 1.0}}}
+    cur = {"results": {"a": {"median_s": 1.05}, "b": {"median_s": 1.3}, "c": {"median_s": 0.5},
+                       "new": {"median_s": 1.0}, "err": {"error": "boom"}}}
+    st = {r["name"]: r["status"] for r in bench.compare(cur, base, threshold=0.10)}
+    assert st == {"a": "ok", "b": "regression", "c": "improved", "new": "new", "err": "failed"}
+
+def test_cli_exit_code_on_regression(tmp_path):
+    import json
+    base = tmp_path / "base.json"
+    base.write_text(json.dumps({"results": {"indicator.fibo_pivots": {"median_s": 1e-12}}}))
+    code = bench.main(["-k", "indicator.fibo_pivots", "--repeats", "2", "--min-time", "0.001",
+                       "--baseline", str(base), "--out", str(tmp_path / "cur.json")])
+    assert code == 1
+    assert json.loads((tmp_path / "cur.json").read_text())["compare"]["rows"][0]["status"] == "regression"
+
+def test_cli_exit_code_on_failed_case(tmp_path, monkeypatch):
+    import json
+    def broken():
+        yield lambda: 1 / 0
+    monkeypatch.setitem(bench.CASES, "broken.case", bench.contextmanager(broken))
+    code = bench.main(["-k", "broken.case", "--repeats", "1", "--min-time", "0.001", "--out", str(tmp_path / "cur.json")])
+    assert code == 1
+    assert "ZeroDivisionError" in json.loads((tmp_path / "cur.json").read_text())["results"]["broken.case"]["error"]
@@ -0,0 +1,53 @@
+import asyncio, threading, time
+from capintel.cache import TTLCache
+
+def test_ttl_and_lru():
+    now = [0.0]
+    c = TTLCache(maxsize=2, ttl=1.0, clock=lambda: now[0])
+    c.set("a", 1); c.set("b", 2)
+    assert c.get("a") == 1
+    c.set("c", 3)                      # вытесняет b (LRU)
+    assert c.get("b") is None and c.get("c") == 3
+    now[0] = 1.5
+    assert c.get("a") is None
+    assert c.stats()["evictions"] == 1
+
+def test_single_flight_threads():
+    c = TTLCache(ttl=10)
+    calls = []
+    def loader():
+        calls.append(1); time.sleep(0.05); return 42
+    out = []
+    ts = [threading.Thread(target=lambda: out.append(c.get_or_load("k", loader))) for _ in range(8)]
+    [t.start() for t in ts]; [t.join() for t in ts]
+    assert out == [42] * 8 and len(calls) == 1
+    st = c.stats()
+    assert st["misses"] == 1 and st["coalesced"] + st["hits"] == 7
+
+def test_single_flight_async_errors_not_cached():
+    c = TTLCache(ttl=10)
+    calls = []
+    async def loader():
+        calls.append(1); await asyncio.sleep(0.01); raise ValueError("upstream")
+    async def main():
+        return await asyncio.gather(*[c.aget_or_load("k", loader) for _ in range(5)], return_exceptions=True)
+    res = asyncio.run(main())
+    assert all(isinstance(r, ValueError) for r in res) and len(calls) == 1
+    assert c.get("k") is None
+
+def test_async_leader_cancel_does_not_cancel_waiters():
+    c = TTLCache(ttl=10)
+    calls = []
+    async def loader():
+        calls.append(1); await asyncio.sleep(0.02); return 42
+    async def main():
+        leader = asyncio.create_task(c.aget_or_load("k", loader))
+        await asyncio.sleep(0)
+        waiters = [asyncio.create_task(c.aget_or_load("k", loader)) for _ in range(3)]
+        await asyncio.sleep(0)
+        leader.cancel()
+        res = await asyncio.gather(*waiters)
+        assert leader.cancelled()
+        return res
+    assert asyncio.run(main()) == [42, 42, 42] and len(calls) == 1
+    assert c.get("k") == 42 and c.coalesced == 3
@@ -0,0 +1,31 @@
+import json
+import subprocess
+import sys
+
+from benchmarks import coldstart
+
+SAMPLE = """import time: self [us] | cumulative | imported package
+import time:       120 |        120 |   _io
+import time:      3000 |      50000 |     numpy
+import time:       900 |      61000 |   capintel.backtest
+import time:        80 |         80 |     numpy
+"""
+
+def test_parse_importtime():
+    t = coldstart.parse_importtime(SAMPLE + "Traceback: не строка importtime\n")
+    assert t == {"_io": (120, 120), "numpy": (3000, 50000), "capintel.backtest": (900, 61000)}
+
+def test_api_import_is_lazy_and_budget_gates(tmp_path):
+    out = tmp_path / "cold.json"
+    assert coldstart.main(["-m", "api.main", "--repeats", "1", "--budget", "1e6", "--out", str(out)]) == 0
+    res = json.loads(out.read_text())["results"]["api.main"]
+    assert res["lazy_loaded"] == [] and res["median_ms"] > 0
+    assert coldstart.main(["-m", "api.main", "--repeats", "1", "--budget", "0.001", "--out", str(out)]) == 1
+    assert "бюджета" in json.loads(out.read_text())["problems"][0]
+
+def test_warmup_preloads_heavy_modules():
+    code = ("import sys, api.main; from capintel import warmup; "
+            "assert 'pandas' not in sys.modules; took = warmup.warmup(); "
+            "assert all(m in sys.modules for m in warmup.HEAVY) and 'polygon_client' in took")
+    r = subprocess.run([sys.executable, "-c", code], cwd=coldstart.ROOT, capture_output=True, text=True)
+    assert r.returncode == 0, r.stderr
@@ -0,0 +1,51 @@
+import io
+import json
+
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+from capintel import export
+from capintel.providers.polygon_client import PolygonError
+
+
+def _price(asset_class, ticker):
+    if ticker == "BAD":
+        raise PolygonError("нет цены")
+    return 100.0
+
+ITEMS = [(f"T{i}", "equity", "swing", None) for i in range(25)] + [("BAD", "equity", "swing", None)]
+
+def test_ndjson_flat_columns_in_chunks():
+    parts = list(export.export_signals(ITEMS, "ndjson", chunk_rows=10, price=_price))
+    assert len(parts) == 3
+    df = pd.read_json(io.BytesIO(b"".join(parts)), lines=True)
+    assert list(df.columns) == [c for c, _ in export.COLUMNS]
+    assert len(df) == 26 and df["error"].notna().sum() == 1
+    ok = df[df["error"].isna()]
+    assert (ok["tp1"] <= ok["tp2"]).all() and ok["alt_action"].notna().all()
+    assert df.loc[df["ticker"] == "BAD", "error"].item() == "нет цены"
+
+def test_arrow_stream_roundtrip():
+    pa = pytest.importorskip("pyarrow", exc_type=ImportError)   # в т.ч. сборка под другой numpy
+    data = b"".join(export.export_signals(ITEMS, "arrow", chunk_rows=10, price=_price))
+    reader = pa.ipc.open_stream(data)
+    batches = list(reader)
+    assert [b.num_rows for b in batches] == [10, 10, 6]
+    df = pa.Table.from_batches(batches).to_pandas()
+    assert list(df.columns) == [c for c, _ in export.COLUMNS]
+    assert str(df["created_at"].dt.tz) == "UTC"
+
+def test_export_endpoint_streams_ndjson(monkeypatch):
+    import api.main as main
+
+    async def fake_prices(items):
+        return {(ac, t.upper()): (PolygonError("нет цены") if t == "BAD" else 50.0) for ac, t in items}
+
+    monkeypatch.setattr(main, "aget_last_prices", fake_prices)
+    items = [{"ticker": t, "asset_class": "equity", "horizon": "swing"} for t in ("AAPL", "BAD", "MSFT")]
+    r = TestClient(main.app).post("/signals/export", params={"chunk": 2}, json={"items": items})
+    assert r.status_code == 200 and r.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in r.text.splitlines()]
+    assert [row["ticker"] for row in rows] == ["AAPL", "BAD", "MSFT"]
+    assert rows[1]["error"] == "нет цены" and rows[0]["entry"] is not None
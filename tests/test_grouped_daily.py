@@ -0,0 +1,66 @@
+from datetime import date, datetime, timezone
+
+import numpy as np
+
+from capintel.providers import grouped_daily as gd
+from capintel.providers.bar_store import BAR_DTYPE, BarStore
+
+NOW = datetime(2024, 3, 7, 12, tzinfo=timezone.utc).timestamp()
+
+def _day(px):
+    return {"results": [{"T": "AAPL", "o": px, "h": px + 1, "l": px - 1, "c": px + 0.5, "v": 1e6, "t": 0},
+                        {"T": "MSFT", "o": 2 * px, "h": 2 * px + 1, "l": 2 * px - 1, "c": 2 * px, "v": 5e5, "t": 0}]}
+
+def test_grouped_ingest_backfills_missing_days(polygon_server, tmp_path):
+    base = "/v2/aggs/grouped/locale/us/market/stocks/"
+    polygon_server.routes.update({
+        base + "2024-03-01": (200, _day(100.0)),
+        base + "2024-03-04": (200, {"resultsCount": 0}),   # «праздник»
+        base + "2024-03-05": (200, _day(102.0)),
+        base + "2024-03-06": (500, {"error": "boom"}),
+    })
+    store = BarStore(str(tmp_path))
+    # бар AAPL за 1 марта уже есть (range aggs) — тот же t, без дубля
+    store.merge("AAPL", np.array([(gd.bar_time("stocks", date(2024, 3, 1)), 1, 1, 1, 1, 1)], dtype=BAR_DTYPE), now=NOW)
+
+    res = gd.ingest("stocks", date(2024, 3, 1), date(2024, 3, 6), store=store, now=NOW)
+    assert sorted(polygon_server.requests) == [base + d for d in ("2024-03-01", "2024-03-04", "2024-03-05", "2024-03-06")]
+    assert res["tickers"] == 2 and list(res["failed"]) == ["2024-03-06"]
+    aapl = store.load("AAPL")
+    assert list(aapl["t"]) == [1709269200, 1709614800]     # полночь Нью-Йорка, как у range aggs
+    assert list(aapl["c"]) == [100.5, 102.5]
+    assert store.meta("AAPL").get("from") is None           # есть дыра (6 марта) — историю не отмечаем
+
+    polygon_server.requests.clear()
+    polygon_server.routes[base + "2024-03-06"] = (200, _day(104.0))
+    res = gd.ingest("stocks", date(2024, 3, 1), date(2024, 3, 6), store=store, now=NOW)
+    assert polygon_server.requests == [base + "2024-03-06"]  # сб/вс не запрашиваются, загруженное — тоже
+    assert list(store.load("MSFT")["c"]) == [200.0, 204.0, 208.0]
+    assert store.meta("MSFT")["from"] == "2024-03-01"
+
+    polygon_server.requests.clear()
+    assert gd.ingest("stocks", date(2024, 3, 1), date(2024, 3, 6), store=store, now=NOW)["requested"] == 0
+    assert polygon_server.requests == []
+
+def test_pivot_grouped_universe_and_crypto_time():
+    by_day = {date(2024, 3, 2): [{"T": "X:BTCUSD", "o": 1, "h": 2, "l": 0.5, "c": 1.5},
+                                 {"T": "X:ETHUSD", "o": 1, "h": 2, "l": 0.5, "c": 1.5}],
+              date(2024, 3, 1): [{"T": "X:BTCUSD", "o": 1, "h": 2, "l": 0.5, "c": 1.2}]}
+    out = gd.pivot_grouped("crypto", by_day, tickers=["x:btcusd"])
+    assert list(out) == ["X:BTCUSD"]
+    assert list(out["X:BTCUSD"]["t"]) == [1709251200, 1709337600]   # 00:00 UTC, по возрастанию
+
+def test_filtered_ingest_keeps_manifest_for_full_universe(polygon_server, tmp_path):
+    base = "/v2/aggs/grouped/locale/us/market/stocks/"
+    polygon_server.routes.update({base + "2024-03-05": (200, _day(102.0)), base + "2024-03-06": (200, _day(104.0))})
+    store = BarStore(str(tmp_path))
+
+    res = gd.ingest("stocks", date(2024, 3, 5), date(2024, 3, 6), store=store, tickers=["AAPL"], now=NOW)
+    assert res["tickers"] == 1 and len(store.load("MSFT")) == 0
+    assert gd.loaded_days(store, "stocks") == set()          # фильтр — манифест не трогаем
+
+    polygon_server.requests.clear()
+    res = gd.ingest("stocks", date(2024, 3, 5), date(2024, 3, 6), store=store, now=NOW)
+    assert res["requested"] == 2 and len(polygon_server.requests) == 2
+    assert list(store.load("MSFT")["c"]) == [204.0, 208.0]
+    assert list(store.load("AAPL")["c"]) == [102.5, 104.5]   # повторная дата слита без дубля
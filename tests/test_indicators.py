@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+from conftest import make_daily
+from capintel.strategy import my_strategy as ms
+from capintel.strategy.indicators import IndicatorSet
+
+def test_streaming_matches_batch():
+    b = make_daily(300, seed=7)
+    ind = IndicatorSet().seed(b.iloc[:200])
+    for i in range(200, len(b)):
+        r = b.iloc[i]
+        ind.update(r.o, r.h, r.l, r.c)
+    ind = IndicatorSet.from_json(ind.to_json())     # состояние переживает сериализацию
+    r = b.iloc[-1]
+    last = ind.update(r.o * 1.01, r.h * 1.01, r.l * 1.01, r.c * 1.01)
+
+    b2 = pd.concat([b, (b.iloc[[-1]] * 1.01).set_axis([b.index[-1] + pd.Timedelta(days=1)])])
+    ha_o, ha_c = ms._heikin_ashi(b2)
+    hist = ms._macd_hist(b2["c"])
+    assert np.isclose(last["ha_open"], ha_o.iloc[-1]) and np.isclose(last["ha_close"], ha_c.iloc[-1])
+    assert np.isclose(last["hist"], hist.iloc[-1])
+    assert np.isclose(last["rsi"], ms._rsi_wilder(b2["c"]).iloc[-1])
+    assert np.isclose(last["atr"], ms._atr_wilder(b2).iloc[-1])
+    assert ind.macd_streak == (ms._last_streak_length(hist, True), ms._last_streak_length(hist, False))
+    assert ind.ha_streak[0] == ms._last_streak_length(ha_c - ha_o, True)
+
+def test_features_match_batch():
+    b = make_daily(260, seed=11)
+    ind = IndicatorSet().seed(b.iloc[:100])
+    for r in b.iloc[100:].itertuples():
+        ind.update(r.o, r.h, r.l, r.c)
+    f, ref = ind.features(), ms._bar_features(b)
+    assert {k: v for k, v in f.items() if not isinstance(v, float)} == {k: v for k, v in ref.items() if not isinstance(v, float)}
+    assert all(np.isclose(f[k], ref[k]) for k in ("rsi", "rsi_q20", "rsi_q80", "atr"))
@@ -0,0 +1,57 @@
+import httpx
+from fastapi.testclient import TestClient
+
+from conftest import make_daily
+from capintel import metrics
+from capintel.providers import polygon_client as poly
+from capintel.strategy import my_strategy as ms
+
+def test_render_prometheus_text():
+    reg = metrics.Registry()
+    c = metrics.Counter("t_total", "тест", ["kind"], registry=reg)
+    h = metrics.Histogram("t_seconds", "тест", buckets=(0.1, 1.0), registry=reg)
+    c.inc(kind='a"b')
+    c.inc(2, kind='a"b')
+    for v in (0.05, 0.5, 3.0):
+        h.observe(v)
+    text = reg.render()
+    assert '# TYPE t_total counter\nt_total{kind="a\\"b"} 3.0' in text
+    assert 't_seconds_bucket{le="0.1"} 1\nt_seconds_bucket{le="1.0"} 2\nt_seconds_bucket{le="+Inf"} 3' in text
+    assert "t_seconds_count 3" in text
+
+def test_signal_stages_recorded():
+    metrics.REGISTRY.clear()
+    ms.pivot_index.invalidate(); ms.bands_cache.invalidate(); ms.spec_cache.invalidate()
+    ms.generate_signal_core("AAPL", "equity", "swing", 100.0, daily=make_daily())
+    assert metrics.SIGNAL_STAGE.labels(stage="period_hlc").count == 2   # M и Y
+    for stage in ("pivots", "heikin_ashi", "macd", "rsi", "atr", "decision"):
+        assert metrics.SIGNAL_STAGE.labels(stage=stage).count == 1, stage
+
+def test_disabled_records_nothing(monkeypatch):
+    metrics.REGISTRY.clear()
+    monkeypatch.setattr(metrics, "ENABLED", False)
+    ms.generate_signal_core("AAPL", "equity", "swing", 100.0, daily=make_daily())
+    assert metrics.SIGNAL_STAGE.labels(stage="decision").count == 0
+
+def test_metrics_endpoint_polygon_and_routes(monkeypatch):
+    import api.main as main
+
+    def handler(request: httpx.Request):
+        if "/v2/last/trade/" in request.url.path:
+            return httpx.Response(404, json={})
+        return httpx.Response(200, json={"results": [{"c": 42.0}]})
+
+    metrics.REGISTRY.clear()
+    poly.price_cache.invalidate()
+    monkeypatch.setattr(poly, "POLYGON_API_KEY", "test")
+    poly.configure_http(transport=httpx.MockTransport(handler))
+    try:
+        client = TestClient(main.app)
+        assert client.get("/price", params={"asset_class": "equity", "ticker": "MSFT"}).json()["last_price"] == 42.0
+        text = client.get("/metrics").text
+    finally:
+        poly.configure_http(transport=None)
+    assert 'capintel_polygon_requests_total{endpoint="last_trade",status="404"} 1.0' in text
+    assert 'capintel_polygon_requests_total{endpoint="aggs_minute",status="200"} 1.0' in text
+    assert 'capintel_polygon_fallback_total{asset_class="equity"} 1.0' in text
+    assert 'capintel_http_requests_total{method="GET",route="/price",status="200"} 1.0' in text
@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from capintel.providers import minute_bars as mb
+from capintel.providers.bar_store import BAR_DTYPE
+
+T0 = 1_700_000_000 // 60 * 60
+
+
+def _minutes(n, seed=0, start=T0, gap_every=97):
+    rng = np.random.default_rng(seed)
+    t = start + 60 * np.arange(n)
+    t = t[np.arange(n) % gap_every != 5]          # пропуски (нет сделок в минуту)
+    c = 100 * np.exp(np.cumsum(rng.normal(0, 0.001, len(t))))
+    o = np.r_[c[0], c[:-1]]
+    rows = np.empty(len(t), dtype=BAR_DTYPE)
+    rows["t"], rows["o"], rows["c"] = t, o, c
+    rows["h"], rows["l"], rows["v"] = np.maximum(o, c) * 1.001, np.minimum(o, c) * 0.999, rng.integers(1, 100, len(t))
+    return rows
+
+@pytest.mark.parametrize("tf", ["5min", "15min", "1h", "4h"])
+def test_aggregate_matches_pandas_resample(tf):
+    m = _minutes(3000)
+    df = mb._frame(m)
+    ref = df.resample(tf.replace("min", "min"), origin="epoch").agg(
+        {"o": "first", "h": "max", "l": "min", "c": "last", "v": "sum"}).dropna()
+    got = mb._frame(mb.aggregate(m, mb.TIMEFRAMES[tf]))
+    pd.testing.assert_frame_equal(got, ref, check_freq=False)
+
+def test_extend_recomputes_only_trailing_bucket():
+    m = _minutes(2000, seed=1)
+    s = mb.MinuteSeries(keep_s=0)
+    s.extend(m[:1500])
+    s.resample("15min"); s.resample("1h")
+    before = s.aggregated
+    upd = m[1499:1503].copy()
+    upd["c"][0] *= 1.01                              # незавершённая минута обновилась + 3 новых
+    assert s.extend(upd) == 4
+    assert s.aggregated - before < 2 * 60 + 10       # пересчитан хвост, а не 1500 минут
+    full = np.concatenate([m[:1499], upd])
+    for tf in ("15min", "1h"):
+        np.testing.assert_array_equal(s.resample(tf), mb.aggregate(full, mb.TIMEFRAMES[tf]))
+    assert s.extend(upd) == 0                        # повтор — ничего не меняется
+
+def test_frame_not_stale_after_concurrent_extend(monkeypatch):
+    import threading
+    m = _minutes(600, seed=2)
+    s = mb.MinuteSeries(keep_s=0)
+    s.extend(m[:500])
+    build, ext = mb._frame, []
+    def slow_frame(agg):                             # extend() приходит, пока кадр строится
+        th = threading.Thread(target=s.extend, args=(m[500:],))
+        th.start(); th.join(0.1); ext.append(th)
+        return build(agg)
+    monkeypatch.setattr(mb, "_frame", slow_frame)
+    s.frame("15min")
+    ext[0].join()
+    monkeypatch.setattr(mb, "_frame", build)
+    assert s.frame("15min").index[-1] == pd.Timestamp(mb.aggregate(m, 900)["t"][-1], unit="s", tz="UTC")
+
+def test_registry_fetches_once_then_tail():
+    calls = []
+    m = _minutes(6000, seed=2)
+
+    def fetch(symbol, fr, to):
+        calls.append((symbol, fr, to))
+        return m[(m["t"] >= fr) & (m["t"] <= to)]
+
+    clock, wall = [0.0], [float(m["t"][4000])]
+    reg = mb.MinuteBars(fetch=fetch, lookback_days=2, refresh_s=60, clock=lambda: clock[0], wall=lambda: wall[0])
+    a = reg.bars("crypto", "BTC-USD", "15min")
+    b = reg.bars("crypto", "BTCUSD", "1h")           # тот же символ, другой ТФ — без запроса
+    assert len(calls) == 1 and calls[0][0] == "X:BTCUSD" and len(a) > 50 and len(b) > 10
+    clock[0], wall[0] = 61.0, float(m["t"][4100])
+    reg.bars("crypto", "BTCUSD", "15min")
+    assert len(calls) == 2 and calls[1][1] == int(m["t"][4000])   # докачка с последней минуты
+    s = reg.series("crypto", "BTCUSD")
+    np.testing.assert_array_equal(s.resample("15min"), mb.aggregate(s.rows, 900))
+
+def test_download_follows_next_url(polygon_server):
+    page = lambda rows: [{"t": int(r["t"]) * 1000, "o": r["o"], "h": r["h"], "l": r["l"], "c": r["c"], "v": r["v"]} for r in rows]
+    m = _minutes(10)
+    path = f"/v2/aggs/ticker/AAPL/range/1/minute/{T0 * 1000}/{(T0 + 600) * 1000}"
+    polygon_server.routes[path] = (200, {"results": page(m[:5]), "next_url": polygon_server.url + "/page2"})
+    polygon_server.routes["/page2"] = (200, {"results": page(m[5:])})
+    got = mb.download_minutes("AAPL", T0, T0 + 600)
+    np.testing.assert_array_equal(got, m)
+    assert polygon_server.requests == [path, "/page2"]
+
+def test_failed_fetch_backs_off_for_refresh_s():
+    calls, clock = [], [0.0]
+
+    def fetch(symbol, fr, to):
+        calls.append(fr)
+        raise RuntimeError("403: нет доступа к минуткам")
+
+    reg = mb.MinuteBars(fetch=fetch, refresh_s=60, clock=lambda: clock[0], wall=lambda: float(T0))
+    for _ in range(5):
+        with pytest.raises(RuntimeError):
+            reg.bars("equity", "AAPL", "15min")
+    assert len(calls) == 1                           # ошибка запоминается до refresh_s
+    clock[0] = 61.0
+    with pytest.raises(RuntimeError):
+        reg.bars("equity", "AAPL", "15min")
+    assert len(calls) == 2
+
+def test_failed_tail_fetch_serves_loaded_minutes():
+    m, clock, fail = _minutes(500), [0.0], [False]
+
+    def fetch(symbol, fr, to):
+        if fail[0]:
+            raise RuntimeError("сеть")
+        return m
+
+    reg = mb.MinuteBars(fetch=fetch, refresh_s=60, clock=lambda: clock[0], wall=lambda: float(m["t"][-1]))
+    n = len(reg.bars("equity", "AAPL", "15min"))
+    fail[0], clock[0] = True, 61.0
+    assert len(reg.bars("equity", "AAPL", "15min")) == n
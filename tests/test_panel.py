@@ -0,0 +1,25 @@
+import numpy as np
+from conftest import make_daily
+from capintel.strategy import my_strategy as ms
+from capintel.strategy.panel import BarPanel, last_bar_features
+
+def test_panel_matches_per_ticker():
+    frames = {"A": make_daily(300, seed=1), "B": make_daily(200, seed=2, start="2024-03-01"),
+              "C": make_daily(260, seed=3, freq="B")}
+    panel = BarPanel.from_frames(frames)
+    assert panel.data.shape == (3, len(panel.index), 5) and panel.data.flags.c_contiguous
+    f = last_bar_features(panel)
+    for i, t in enumerate(panel.tickers):
+        b = frames[t]
+        ha_o, ha_c = ms._heikin_ashi(b)
+        hist = ms._macd_hist(b["c"])
+        rsi = ms._rsi_wilder(b["c"])
+        assert f["ha_green_streak"][i] == ms._last_streak_length(ha_c - ha_o, True)
+        assert f["ha_red_streak"][i] == ms._last_streak_length(ha_c - ha_o, False)
+        assert f["macd_pos_streak"][i] == ms._last_streak_length(hist, True)
+        assert f["macd_neg_streak"][i] == ms._last_streak_length(hist, False)
+        assert f["macd_decel_pos"][i] == ms._deceleration_abs(hist.clip(lower=0))
+        assert f["macd_decel_neg"][i] == ms._deceleration_abs((-hist).clip(lower=0))
+        assert np.isclose(f["rsi_last"][i], rsi.iloc[-1])
+        assert np.isclose(f["rsi_q80"][i], np.nanpercentile(rsi.tail(200), 80))
+        assert np.isclose(f["atr_last"][i], ms._atr_wilder(b).iloc[-1])
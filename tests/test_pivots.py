@@ -0,0 +1,46 @@
+import warnings
+import pandas as pd
+from conftest import make_daily
+from capintel.strategy import my_strategy as ms
+
+def _groupby_hlc(df, period):
+    freq = {"W": "W-MON", "M": "M", "Y": "Y"}[period]
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", FutureWarning)
+        agg = df.groupby(pd.Grouper(freq=freq, label="right")).agg({"h": "max", "l": "min", "c": "last"}).dropna()
+    if len(agg) < 2:
+        tail = df.tail({"W": 5, "M": 22, "Y": 252}[period])
+        return float(tail["h"].max()), float(tail["l"].min()), float(tail["c"].iloc[-1])
+    r = agg.iloc[-2]
+    return float(r["h"]), float(r["l"]), float(r["c"])
+
+def test_hlc_matches_groupby():
+    for freq, hour in (("B", 5), ("D", 0)):
+        df = make_daily(520, start="2023-01-02", freq=freq, hour=hour)
+        for end in (200, 333, 519, 520):
+            for period in ("W", "M", "Y"):
+                assert ms._last_complete_period_hlc(df.iloc[:end], period) == _groupby_hlc(df.iloc[:end], period)
+
+def test_pivot_index_invalidates_on_new_period():
+    df = make_daily(300, start="2023-01-02")
+    idx = ms.PivotIndex()
+    # последние бары одного месяца → один расчёт
+    month_end = df.index[df.index.is_month_end][-1]
+    k = df.index.get_loc(month_end)
+    a = idx.pivots("T", df.iloc[:k], "M")
+    assert idx.pivots("T", df.iloc[:k - 3], "M") is a
+    assert idx.stats()["hits"] == 1
+    b = idx.pivots("T", df.iloc[:k + 2], "M")        # начался новый месяц
+    assert b == ms._fibo_pivots(*_groupby_hlc(df.iloc[:k + 2], "M")) and b != a
+
+def test_pivot_index_detects_revised_or_shorter_history():
+    df = make_daily(300, start="2023-01-02")
+    idx = ms.PivotIndex()
+    k = df.index.get_loc(df.index[df.index.is_month_end][-1])
+    a = idx.pivots("T", df.iloc[:k], "M")
+    split = df.iloc[:k].copy()
+    split[["o", "h", "l", "c"]] /= 2                  # сплит: та же история, пересчитанные цены
+    b = idx.pivots("T", split, "M")
+    assert b == ms._fibo_pivots(*_groupby_hlc(split, "M")) and b != a
+    short = df.iloc[k - 40:k]                         # окно начинается внутри прошлого месяца
+    assert idx.pivots("T", short, "M") == ms._fibo_pivots(*_groupby_hlc(short, "M"))
@@ -5,3 +5,60 @@ def test_norm():
     assert _norm_crypto_pair("BTC/USDT")==("BTC","USDT")
     assert _norm_crypto_pair("ethusdt")==("ETH","USDT")
     assert _norm_crypto_pair("X:BTCUSD")==("BTC","USD")
+
+def test_get_last_prices_partial(monkeypatch):
+    from capintel.providers import polygon_client as poly
+    calls = []
+    def fake(asset_class, ticker):
+        calls.append((asset_class, ticker))
+        if ticker == "BAD":
+            raise poly.PolygonError("нет цены")
+        return 100.0
+    monkeypatch.setattr(poly, "get_last_price", fake)
+    out = poly.get_last_prices([("equity", "aapl"), ("equity", "AAPL"), ("equity", "bad")])
+    assert out[("equity", "AAPL")] == 100.0
+    assert isinstance(out[("equity", "BAD")], poly.PolygonError)
+    assert sorted(calls) == [("equity", "AAPL"), ("equity", "BAD")]
+
+def test_shared_client_reuses_pool(monkeypatch):
+    import asyncio, httpx
+    from capintel.providers import polygon_client as poly
+    seen = []
+    def handler(request):
+        seen.append(request.url.path)
+        if request.url.path.startswith("/v2/last/trade/"):
+            return httpx.Response(404, json={})
+        return httpx.Response(200, json={"results": [{"c": 101.5}]})
+    monkeypatch.setattr(poly, "POLYGON_API_KEY", "test")
+    poly.configure_http(transport=httpx.MockTransport(handler))
+    try:
+        assert poly.get_client() is poly.get_client()
+        assert poly.last_trade_equity("aapl") == 101.5
+        assert asyncio.run(poly.alast_trade_equity("aapl")) == 101.5
+        assert seen[0] == "/v2/last/trade/AAPL" and len(seen) == 4
+    finally:
+        poly.configure_http(transport=None)
+
+def test_close_clients_closes_async_clients_in_their_loops():
+    import asyncio, threading
+    from capintel.providers import polygon_client as poly
+    loop = asyncio.new_event_loop()
+    t = threading.Thread(target=loop.run_forever, daemon=True)
+    t.start()
+    idle = asyncio.new_event_loop()
+    try:
+        async def make():
+            return poly.get_async_client()
+        running = asyncio.run_coroutine_threadsafe(make(), loop).result(5)
+        stopped = idle.run_until_complete(make())
+        poly.configure_http(timeout=5.0)          # сбрасывает пул — AsyncClient'ы закрываются, а не забываются
+        assert stopped.is_closed
+        assert asyncio.run_coroutine_threadsafe(asyncio.sleep(0.05), loop).result(5) is None and running.is_closed
+        assert asyncio.run_coroutine_threadsafe(make(), loop).result(5) is not running
+    finally:
+        asyncio.run_coroutine_threadsafe(poly.aclose_clients(), loop).result(5)
+        poly.configure_http(timeout=10.0)
+        loop.call_soon_threadsafe(loop.stop)
+        t.join(5)
+        loop.close()
+        idle.close()
@@ -0,0 +1,69 @@
+import asyncio
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from capintel import ratelimit
+from capintel.ratelimit import AsyncRateLimiter, RateLimitExceeded
+
+def test_concurrency_bounded():
+    lim = AsyncRateLimiter(max_concurrency=3, name="t-conc")
+    state = {"now": 0, "peak": 0}
+
+    async def job():
+        async with lim:
+            state["now"] += 1
+            state["peak"] = max(state["peak"], state["now"])
+            await asyncio.sleep(0.01)
+            state["now"] -= 1
+
+    async def main():
+        await asyncio.gather(*(job() for _ in range(20)))
+
+    asyncio.run(main())
+    assert state["peak"] == 3
+
+def test_token_bucket_paces_and_rejects():
+    lim = AsyncRateLimiter(rate=50.0, burst=1, max_wait=0.2, name="t-rate")
+    before = ratelimit.REJECTED.value(limiter="t-rate", reason="rate")
+
+    async def main():
+        t0 = time.monotonic()
+        for _ in range(4):
+            async with lim:
+                pass
+        paced = time.monotonic() - t0
+        with pytest.raises(RateLimitExceeded) as ei:
+            await asyncio.gather(*(lim.acquire() for _ in range(20)))
+        return paced, ei.value
+
+    paced, err = asyncio.run(main())
+    assert paced >= 0.055            # 1 токен сразу, ещё 3 по 20 мс
+    assert err.retry_after > 0.2
+    assert ratelimit.REJECTED.value(limiter="t-rate", reason="rate") > before
+
+def test_concurrency_timeout_rejects():
+    lim = AsyncRateLimiter(max_concurrency=1, max_wait=0.05, name="t-wait")
+
+    async def main():
+        await lim.acquire()
+        try:
+            with pytest.raises(RateLimitExceeded):
+                await lim.acquire()
+        finally:
+            lim.release()
+        async with lim:   # слот вернулся
+            pass
+
+    asyncio.run(main())
+
+def test_price_route_returns_429(monkeypatch):
+    import api.main as main
+
+    async def limited(asset_class, ticker):
+        raise RateLimitExceeded("limit", retry_after=1.2)
+
+    monkeypatch.setattr(main, "aget_last_price", limited)
+    r = TestClient(main.app).get("/price", params={"asset_class": "equity", "ticker": "AAPL"})
+    assert r.status_code == 429 and r.headers["retry-after"] == "2"
@@ -0,0 +1,40 @@
+import threading
+
+from capintel.providers.refresher import PriceRefresher
+
+
+def test_refresh_polls_watched_and_drops_idle():
+    clock, calls = [0.0], []
+
+    def fetch(keys):
+        calls.append(list(keys))
+        return {k: (RuntimeError("нет цены") if k[1] == "BAD" else 100.0 + len(calls)) for k in keys}
+
+    r = PriceRefresher(interval=5, idle_s=60, fetch=fetch, clock=lambda: clock[0])
+    assert r.price("equity", "aapl") is None                      # ещё не пришла, но тикер на наблюдении
+    r.watch("equity", "BAD")
+    assert r.refresh() == 1
+    assert calls[-1] == [("equity", "AAPL"), ("equity", "BAD")]
+    assert r.price("equity", "AAPL") == 101.0 and "нет цены" in r.errors[("equity", "BAD")]
+    clock[0] = 30.0
+    r.price("equity", "AAPL")                                     # AAPL спрашивают, BAD — нет
+    clock[0] = 70.0
+    r.refresh()
+    assert calls[-1] == [("equity", "AAPL")] and r.age("equity", "AAPL") == 0.0
+    assert r.price("equity", "AAPL", max_age=1.0) == 102.0
+
+def test_thread_refreshes_new_ticker_immediately():
+    got = threading.Event()
+
+    def fetch(keys):
+        if keys:
+            got.set()
+        return {k: 42.0 for k in keys}
+
+    r = PriceRefresher(interval=3600, fetch=fetch).start()       # без watch — следующий проход через час
+    try:
+        r.watch("crypto", "BTC-USD")
+        assert got.wait(5)
+    finally:
+        r.stop()
+    assert r.price("crypto", "BTCUSD") == 42.0 and r.rounds >= 1
@@ -0,0 +1,22 @@
+from conftest import make_daily
+from capintel import replay as rp
+from capintel.strategy import my_strategy as ms
+
+def test_replay_matches_generate_signal_core():
+    daily = make_daily(420, seed=5)
+    for horizon in ("intraday", "swing", "position"):
+        sig = rp.replay(daily, horizon, record_all=True, trade=False)["signals"].set_index("time")
+        for i in (60, 200, 333, len(daily) - 1):
+            ref = ms.generate_signal_core("T", "equity", horizon, float(daily["c"].iloc[i]), daily=daily.iloc[:i + 1])
+            row = sig.loc[daily.index[i]]
+            assert row["action"] == ref["action"]
+            assert abs(row["confidence"] - ref["confidence"]) < 1e-9
+            assert abs(row["stop"] - ref["stop"]) < 1e-6 * ref["stop"]
+
+def test_replay_universe_trades():
+    frames = {f"T{s}": make_daily(520, seed=s) for s in range(6)}
+    res = rp.replay_universe(frames, "intraday", workers=0, max_hold=10)
+    tr = res["trades"]
+    assert set(tr["outcome"]) <= {"tp", "stop", "timeout", "open"}
+    assert (tr["bars_held"] <= 10).all() and len(res["summary"]) == 6
+    assert (tr["exit_time"] >= tr["entry_time"]).all()
@@ -0,0 +1,21 @@
+from conftest import offline_daily
+from capintel import scan
+
+def test_scan_universe_partial(offline_bars, tmp_path):
+    items = [("AAPL", "equity"), ("BAD", "equity"), ("BTCUSDT", "crypto")]
+    seen = []
+    df = scan.scan_universe(items, "swing", workers=0, progress=lambda k, n, r: seen.append(k))
+    assert list(df["ticker"]) == ["AAPL", "BAD", "BTCUSDT"] and seen == [1, 2, 3]
+    assert df["error"].notna().tolist() == [False, True, False]
+    assert set(df["action"].dropna()) <= {"BUY", "SHORT", "WAIT", "CLOSE"}
+    # пул: на monkeypatch в воркерах не полагаемся (spawn его не увидит) — загрузчик передаётся явно
+    seen.clear()
+    pooled = scan.scan_universe(items, "swing", workers=2, max_fetch=1, progress=lambda k, n, r: seen.append(k),
+                                fetch_daily=offline_daily)
+    assert pooled.equals(df) and sorted(seen) == [1, 2, 3]
+
+    wl = tmp_path / "wl.txt"
+    wl.write_text("AAPL\nBTCUSDT, crypto  # comment\n\n")
+    out = tmp_path / "scan.csv"
+    assert scan.main(["--file", str(wl), "--workers", "0", "--out", str(out), "--quiet"]) == 0
+    assert out.read_text().splitlines()[0].startswith("ticker,asset_class")
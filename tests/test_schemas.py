@@ -0,0 +1,28 @@
+import json
+
+import pytest
+
+from capintel.jsonfast import dumps
+from capintel.schemas import Signal
+from capintel.signal_engine import _build_record, build_signal
+
+
+def test_record_matches_validated_model():
+    for t in ("AAPL", "MSFT", "TSLA", "NVDA", "AMZN"):
+        rec = _build_record(t, "equity", "swing", 230.0)
+        sig = rec.to_model()
+        assert sig.dict() == rec.to_dict()
+        assert json.loads(dumps(rec)) == json.loads(sig.json())
+
+def test_record_is_immutable_and_build_signal_is_pydantic():
+    rec = _build_record("AAPL", "equity", "swing", 230.0)
+    with pytest.raises(AttributeError):
+        rec.entry = 1.0
+    assert isinstance(build_signal("AAPL", "equity", "swing", 230.0), Signal)
+
+def test_dumps_stdlib_fallback(monkeypatch):
+    import capintel.jsonfast as jf
+    rec = _build_record("AAPL", "equity", "swing", 230.0)
+    fast = json.loads(jf.dumps(rec))
+    monkeypatch.setattr(jf, "orjson", None)
+    assert json.loads(jf.dumps(rec)) == fast
@@ -0,0 +1,49 @@
+from conftest import make_daily
+
+from capintel import signal_engine as se
+from capintel.cache import price_bucket
+from capintel.strategy import my_strategy as ms
+
+
+def _fresh():
+    for c in (se.signal_cache, ms.bands_cache, ms.spec_cache):
+        c.invalidate()
+        c.hits = c.misses = c.coalesced = 0
+
+def test_price_bucket():
+    assert price_bucket(100.0) == 100.0
+    assert price_bucket(100.0, 10) == price_bucket(100.05, 10)
+    assert price_bucket(100.0, 10) != price_bucket(100.2, 10)
+
+def test_build_signal_memoized_per_day_and_price(monkeypatch):
+    _fresh()
+    a = se.build_record("AAPL", "equity", "swing", 190.0)
+    again = se.build_record("AAPL", "equity", "swing", 190.0)
+    assert again.to_dict() | {"id": a.id, "created_at": a.created_at, "expires_at": a.expires_at} == a.to_dict()
+    assert again.created_at >= a.created_at and again.expires_at - again.created_at == a.expires_at - a.created_at
+    assert se.build_record("AAPL", "equity", "swing", 191.0).entry != a.entry
+    monkeypatch.setattr(se, "_seed_day", lambda: "2099-01-01")   # новый день сида → новый ключ
+    b = se.build_record("AAPL", "equity", "swing", 190.0)
+    assert b.entry == se._build_record("AAPL", "equity", "swing", 190.0, "2099-01-01").entry
+    st = se.signal_cache.stats()
+    assert (st["hits"], st["misses"]) == (1, 3)
+
+def test_signal_core_cache_follows_bar_version():
+    _fresh()
+    daily = make_daily(seed=11)
+    px = float(daily["c"].iloc[-1])
+    ref = ms.decision_bands("AAPL", "equity", "swing", daily=daily).decide(px)
+    specs = [ms.generate_signal_core("AAPL", "equity", "swing", px, daily=daily) for _ in range(20)]
+    assert all(s == ref for s in specs)
+    assert ms.spec_cache.stats()["hits"] == 19
+    assert ms.bands_cache.stats()["misses"] == 1
+
+    specs[0]["take_profit"].append(0.0)   # копия — кэш не портится
+    specs[1]["alt"]["take_profit"].append(0.0)
+    specs[1]["alt"]["stop"] = -1.0
+    assert ms.generate_signal_core("AAPL", "equity", "swing", px, daily=daily) == ref
+
+    newer = make_daily(n=521, seed=11)   # новый бар → новая версия → пересчёт
+    ms.generate_signal_core("AAPL", "equity", "swing", px, daily=newer)
+    assert ms.bands_cache.stats()["misses"] == 2
+    assert ms.bands_cache.get(("AAPL", "swing", ms.bars_version(newer), None)).version == ms.bars_version(newer)
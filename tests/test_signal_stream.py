@@ -0,0 +1,62 @@
+import json
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+from conftest import make_daily
+from capintel.signal_stream import BandWatcher
+from capintel.strategy import my_strategy as ms
+
+def test_zone_constant_means_same_decision():
+    d = make_daily(seed=3)
+    for h in ("intraday", "swing", "position"):
+        b = ms.decision_bands("Z", "equity", h, daily=d)
+        prices = np.sort(np.r_[np.linspace(b.piv["S3"] * 0.97, b.piv["R3"] * 1.03, 400), b.edges])
+        prev = None
+        for i, p in enumerate(prices):
+            spec = b.decide(float(p))
+            if i % 50 == 0:
+                assert spec == ms.generate_signal_core("Z", "equity", h, float(p), daily=d)
+            key = (b.zone(float(p)), spec["action"], spec["confidence"])
+            if prev is not None and prev[0] == key[0]:
+                assert prev[1:] == key[1:]   # та же полоса → то же решение
+            prev = key
+
+def test_watcher_pushes_only_on_band_cross():
+    d = make_daily(seed=5)
+    clock = [0.0]
+    w = BandWatcher("equity", "swing", ["abc"], loader=lambda ac, t: d, clock=lambda: clock[0])
+    w.refresh_all()
+    b = w.bands["ABC"]
+    lo, hi = b.neighbours(b.piv["P"])
+    mid = (lo + hi) / 2
+    assert w.on_price("ABC", mid) is not None            # первый тик
+    assert w.on_price("ABC", (mid + hi) / 2) is None      # та же полоса
+    sig = w.on_price("ABC", hi * 1.0001)                  # пересекли границу
+    assert sig is not None and sig.ticker == "ABC"
+    # новый бар → полосы перестраиваются (после refresh_s) и следующий тик снова даёт сигнал
+    d2 = d.copy(); d2.iloc[-1, d2.columns.get_loc("c")] *= 1.01
+    w._loader = lambda ac, t: d2
+    assert w.refresh("ABC") is False                      # ещё рано
+    clock[0] = 61.0
+    assert w.refresh("ABC") is True
+    assert w.on_price("ABC", hi * 1.0001) is not None
+
+def test_sse_endpoint(offline_bars, monkeypatch):
+    import api.main as main
+    prices = iter([100.0, 100.0, 500.0, 500.0, 1.0] + [1.0] * 50)
+
+    async def fake_prices(items):
+        px = next(prices)
+        return {(ac, t.upper()): px for ac, t in items}
+
+    monkeypatch.setattr(main, "aget_last_prices", fake_prices)
+    client = TestClient(main.app)
+    with client.stream("GET", "/signals/stream", params={"tickers": "AAPL,BAD", "interval": 0.05, "max_events": 3}) as r:
+        assert r.headers["content-type"].startswith("text/event-stream")
+        body = "".join(r.iter_text())
+    events = [blk for blk in body.split("\n\n") if blk.startswith("event:")]
+    kinds = [e.split("\n")[0][7:] for e in events]
+    assert kinds.count("signal") == 3 and kinds.count("error") == 1   # ошибка BAD — один раз
+    sig = json.loads(events[kinds.index("signal")].split("data: ", 1)[1])
+    assert sig["ticker"] == "AAPL" and sig["entry"] == 100.0
@@ -0,0 +1,70 @@
+import time
+
+import httpx
+import pytest
+
+pytest.importorskip("websockets")
+
+from conftest import WsFixtureServer
+from capintel.providers import polygon_client as poly
+from capintel.providers.stream import PriceStream
+
+def _wait(cond, timeout=5.0):
+    t0 = time.monotonic()
+    while not cond():
+        if time.monotonic() - t0 > timeout:
+            raise AssertionError("timeout")
+        time.sleep(0.01)
+
+@pytest.fixture
+def table(monkeypatch):
+    t = poly.LastPriceTable()
+    monkeypatch.setattr(poly, "live_prices", t)
+    monkeypatch.setattr(poly, "POLYGON_API_KEY", "test")
+    return t
+
+def test_stream_reconnects_and_serves_prices(table):
+    srv = WsFixtureServer([
+        [[{"ev": "T", "sym": "AAPL", "p": 190.5, "t": 1}]],                            # затем обрыв
+        [[{"ev": "T", "sym": "AAPL", "p": 191.0, "t": 2}, {"ev": "T", "sym": "MSFT", "p": 410.0, "t": 2}]],
+    ])
+    s = PriceStream("equity", ["aapl", "MSFT"], url=srv.url, backoff=(0.01, 0.05)).start()
+    try:
+        _wait(lambda: table.get("equity", "MSFT", 60) is not None)
+        assert s.reconnects >= 1 and srv.connections >= 2
+        assert srv.subscriptions[0] == "T.AAPL,T.MSFT"
+        poly.configure_http(transport=httpx.MockTransport(lambda r: pytest.fail("REST не нужен")))
+        assert poly.get_last_price("equity", "aapl") == 191.0
+    finally:
+        poly.configure_http(transport=None)
+        s.stop()
+        srv.close()
+
+def test_crypto_pairs_and_stale_fallback(table, monkeypatch):
+    srv = WsFixtureServer([[[{"ev": "XT", "pair": "BTC-USD", "p": 65000.0, "t": 1}]]], close_after=False)
+    s = PriceStream("crypto", ["BTCUSD"], url=srv.url).start()
+    try:
+        _wait(lambda: table.get("crypto", "X:BTC-USD", 60) is not None)
+        assert srv.subscriptions == ["XT.BTC-USD"]
+        assert poly.get_last_price("crypto", "BTC/USD") == 65000.0
+        # цена устарела → REST
+        monkeypatch.setattr(poly, "STREAM_MAX_AGE", -1.0)
+        poly.price_cache.invalidate()
+        poly.configure_http(transport=httpx.MockTransport(lambda r: httpx.Response(200, json={"last": {"price": 64000.0}})))
+        assert poly.get_last_price("crypto", "BTCUSD") == 64000.0
+    finally:
+        poly.configure_http(transport=None)
+        s.stop()
+        srv.close()
+
+def test_auth_failure_keeps_retrying(table, monkeypatch):
+    monkeypatch.setattr(poly, "POLYGON_API_KEY", "wrong")
+    srv = WsFixtureServer([[]])
+    s = PriceStream("equity", ["AAPL"], url=srv.url, backoff=(0.01, 0.02)).start()
+    try:
+        _wait(lambda: s.reconnects >= 2)
+        assert "auth_failed" in s.last_error or "bad key" in s.last_error
+        assert not s.connected
+    finally:
+        s.stop()
+        srv.close()
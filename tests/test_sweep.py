@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+
+from conftest import make_daily
+from capintel import replay as rp
+from capintel import sweep as sw
+
+
+@pytest.mark.parametrize("horizon", ["intraday", "swing"])
+def test_sweep_matches_replay_per_param_set(horizon):
+    frames = {f"T{s}": make_daily(520, seed=s) for s in range(2)}
+    g = sw.grid(horizon, ha=[2, 5], macd=[2, 6], tol=[0.006, 0.02], rsi_hi=[60, 70])
+    summary = sw.sweep(frames, g, horizon, max_hold=15)["summary"]
+    assert summary["trades"].sum() > 0
+    for _, row in summary.iterrows():
+        params = dict(ha=int(row["ha"]), macd=int(row["macd"]), tol=row["tol"], rsi_hi=row["rsi_hi"], rsi_lo=row["rsi_lo"])
+        ref = [rp.replay(df, horizon, max_hold=15, params=params)["trades"] for df in frames.values()]
+        closed = [t[t["outcome"] != "open"] for t in ref]
+        assert row["trades"] == sum(len(t) for t in closed)
+        assert row["total_pnl"] == pytest.approx(sum(t["pnl"].sum() for t in closed), abs=1e-12)
+        assert row["trades"] * row["hit_rate"] == pytest.approx(sum((t["outcome"] == "tp").sum() for t in closed))
+
+def test_grid_defaults_and_errors():
+    g = sw.grid("swing", tol=np.linspace(0.005, 0.02, 4), ha=[3, 4])
+    assert len(g) == 8 and set(g["macd"]) == {6} and set(g["rsi_hi"]) == {70.0}
+    with pytest.raises(ValueError):
+        sw.grid("swing", foo=[1])
+    res = sw.sweep({"X": make_daily(520, seed=1).drop(columns="c")}, g)
+    assert "X" in res["errors"] and (res["summary"]["trades"] == 0).all()
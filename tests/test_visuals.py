@@ -0,0 +1,25 @@
+import io
+import pytest
+
+pytest.importorskip("matplotlib")
+import matplotlib
+matplotlib.use("Agg")
+import numpy as np
+from PIL import Image
+
+from capintel import visuals as vis
+
+def test_gradient_colors_match_interp():
+    cols = vis._gradient_colors()
+    n = len(vis.BOUNDS_DEG) - 1
+    ref = np.array([vis._interp_color(i / (n - 1)) for i in range(n)])
+    assert np.allclose(cols, ref)
+
+def test_png_cached_per_quantum():
+    a = vis.render_sentiment_gauge_png(0.51, dpi=60)
+    assert a.startswith(b"\x89PNG")
+    assert vis.render_sentiment_gauge_png(0.49, dpi=60) is a          # тот же квант — те же байты
+    b = vis.render_sentiment_gauge_png(-1.5, dpi=60)
+    assert b != a
+    img = Image.open(io.BytesIO(b))
+    assert img.size == (int(7.2 * 60), int(4.0 * 60))